@@ -0,0 +1,445 @@
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ward_planner.engine import plan_ward  # noqa: E402
+from ward_planner.export import export_csv  # noqa: E402
+from ward_planner.incremental import replan  # noqa: E402
+from ward_planner.report import render_report  # noqa: E402
+from ward_planner.roster import RosterReader  # noqa: E402
+from ward_planner.synthetic import synthetic_site, write_synthetic_roster  # noqa: E402
+
+# Benchmarks planning, reporting, export and roster import at several site
+# sizes, headlessly, plus the Tk list, import and report paths under a
+# hidden root, and startup: CLI import in a fresh interpreter and GUI window
+# creation to first paint. Each phase is timed as the best of --repeat runs and its peak
+# Python memory taken from one extra run under tracemalloc. Results can be
+# saved as a JSON baseline and later runs compared against it.
+#
+#   python benchmarks/bench.py                 # compare with baseline.json
+#   python benchmarks/bench.py --save          # record a new baseline
+#   xvfb-run python benchmarks/bench.py        # include the GUI phases on a
+#                                              # box without a display
+
+SCALES = {"ward": 30, "floor": 240, "hospital": 750, "site": 2000}
+ROSTER_ROWS_PER_BED = 10
+NOW = datetime(2026, 1, 1, 7, 0)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+TIME_THRESHOLD = 0.25
+MEMORY_THRESHOLD = 0.25
+# Differences below this are timer noise, whatever the percentage
+MIN_SECONDS = 0.002
+
+GUI_SCRIPT = os.path.join(ROOT, "ward shift planner.py")
+
+
+class Workload:
+    def __init__(self, scale, beds, tmp):
+        self.scale = scale
+        self.beds = beds
+        self.tmp = tmp
+        self.specs = synthetic_site(beds, seed=beds)
+        self.roster_path = os.path.join(tmp, f"roster_{scale}.csv")
+        write_synthetic_roster(self.roster_path, beds * ROSTER_ROWS_PER_BED, seed=beds)
+        self.roster = list(RosterReader(self.roster_path))
+        # The GUI shows one ward, so its phases plan the whole site as one
+        self.merged = {
+            "ward": scale,
+            "nurses": [n for spec in self.specs for n in spec["nurses"]],
+            "total_patients": beds,
+            "ratio": self.specs[0]["ratio"],
+        }
+
+    def plans(self, mode="balanced"):
+        return [plan_ward(mode=mode, **spec) for spec in self.specs]
+
+
+# Headless phases: setup(workload) -> state is untimed, run(state) is timed
+
+def setup_specs(work):
+    return work.specs
+
+
+def run_plan(specs):
+    for spec in specs:
+        plan_ward(**spec)
+
+
+def run_plan_optimal(specs):
+    for spec in specs:
+        plan_ward(mode="optimal", **spec)
+
+
+def run_plan_contiguous(specs):
+    for spec in specs:
+        plan_ward(mode="contiguous", **spec)
+
+
+def setup_replan(work):
+    return [(plan, spec) for plan, spec in zip(work.plans(), work.specs)]
+
+
+def run_replan(pairs):
+    # One nurse off sick and two admissions per ward
+    for plan, spec in pairs:
+        acuity = dict(spec["acuity_counts"])
+        acuity["Moderate"] += 2
+        replan(plan, spec["nurses"][:-1] or spec["nurses"], spec["total_patients"] + 2,
+               spec["ratio"], acuity, spec["tasks"])
+
+
+def run_render(plans):
+    for plan in plans:
+        render_report(plan, NOW)
+
+
+def setup_export(work):
+    return work.plans(), os.path.join(work.tmp, f"history_{work.scale}.csv")
+
+
+def run_export(state):
+    plans, path = state
+    export_csv(plans, path, planned_at=NOW)
+
+
+def setup_import(work):
+    return work.roster_path
+
+
+def run_import(path):
+    for _ in RosterReader(path):
+        pass
+
+
+def setup_sweep(work):
+    # Needs NumPy, like plan_optimal
+    from ward_planner.scenarios import simplex_grid, sweep
+    return sweep, range(work.beds + 1), simplex_grid(0.1)
+
+
+def run_sweep(state):
+    # Every census up to the site's beds over every 10% acuity mix and three
+    # ratio sets, then the staffing curve
+    sweep, census, mixes = state
+    sweep(census, mixes, [(4, 6, 8), (3, 5, 8), (4, 4, 4)]).curve()
+
+
+HEADLESS_PHASES = {
+    "plan": (setup_specs, run_plan),
+    "plan_optimal": (setup_specs, run_plan_optimal),
+    "plan_contiguous": (setup_specs, run_plan_contiguous),
+    "replan": (setup_replan, run_replan),
+    "render": (lambda work: work.plans(), run_render),
+    "export": (setup_export, run_export),
+    "import": (setup_import, run_import),
+    "sweep": (setup_sweep, run_sweep),
+}
+
+
+# GUI phases, each on a fresh app under a withdrawn root
+
+class QuietMessages:
+    # Stands in for tkinter.messagebox so finished imports don't block on a
+    # dialog; questions are answered yes
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: True
+
+
+def load_gui():
+    spec = importlib.util.spec_from_file_location("ward_shift_planner", GUI_SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.messagebox = QuietMessages()
+    return module
+
+
+def gui_error():
+    # Why the GUI phases can't run here, or None if they can
+    try:
+        import tkinter
+        root = tkinter.Tk()
+        root.destroy()
+    except Exception as e:
+        return str(e)
+    return None
+
+
+class GuiState:
+    def __init__(self, gui, work):
+        self.gui = gui
+        self.work = work
+        self.root = gui.tk.Tk()
+        self.root.withdraw()
+        self.app = gui.WardShiftPlanner(self.root)
+        self.root.update()
+
+    def pump(self, done):
+        while not done():
+            self.root.update()
+
+    def close(self):
+        self.root.destroy()
+
+
+def setup_gui_nurses(state):
+    state.app.build_tab(state.app.nurse_tab)
+    return state
+
+
+def run_gui_roster(state):
+    # Filling and drawing the virtual nurse list with a whole roster
+    app = state.app
+    app.nurses = [n for batch in state.work.roster for n in batch]
+    app.nurse_view.set_store(app.nurses)
+    app.nurse_list.scroll_to(0)
+    state.root.update()
+
+
+def run_gui_import(state):
+    app = state.app
+    app.start_import(state.work.roster_path)
+    state.pump(lambda: app.import_thread is None)
+
+
+def setup_gui_report(state):
+    state.plan = plan_ward(**state.work.merged)
+    state.plan.allocation
+    return state
+
+
+def run_gui_report(state):
+    app = state.app
+    done = []
+    app.plan = state.plan
+    app.report_time = NOW
+    app.report_token += 1
+    app.output_text.delete(1.0, "end")
+    app.stream_report(app.output_text, app.report_sections(), on_done=lambda: done.append(True),
+                      token=app.report_token)
+    state.pump(lambda: done)
+
+
+GUI_PHASES = {
+    "gui_roster": (setup_gui_nurses, run_gui_roster),
+    "gui_import": (setup_gui_nurses, run_gui_import),
+    "gui_report": (setup_gui_report, run_gui_report),
+}
+
+
+# Startup phases don't depend on the scale and run once, as "startup/..."
+
+class Startup:
+    def __init__(self, gui=None):
+        self.gui = gui
+        self.root = None
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+
+
+def run_cli_import(state):
+    # A fresh interpreter importing the headless package and its CLI
+    subprocess.run([sys.executable, "-c", "import ward_planner, ward_planner.cli"],
+                   cwd=ROOT, check=True)
+
+
+def run_gui_startup(state):
+    # Window creation to first paint, in this process (the GUI module is
+    # already imported)
+    state.root = state.gui.tk.Tk()
+    state.root.withdraw()
+    state.gui.WardShiftPlanner(state.root)
+    state.root.update()
+
+
+STARTUP_PHASES = {
+    "cli_import": run_cli_import,
+    "gui_startup": run_gui_startup,
+}
+
+
+def measure(setup, run, repeat):
+    # One untimed warm-up (lazy imports, caches), the best wall time over
+    # repeat runs, then peak traced memory of one more
+    state = setup()
+    run(state)
+    teardown(state)
+
+    best = None
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        started = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        teardown(state)
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    teardown(state)
+    return {"seconds": best, "peak_kib": peak / 1024}
+
+
+def teardown(state):
+    if isinstance(state, (GuiState, Startup)):
+        state.close()
+
+
+def run_benchmarks(scales, phases, repeat, gui=True, log=print):
+    results = {}
+    gui_module = None
+    if gui and any(p.startswith("gui") for p in phases):
+        reason = gui_error()
+        if reason:
+            log(f"Skipping GUI phases: {reason}")
+        else:
+            gui_module = load_gui()
+
+    for phase in phases:
+        if phase not in STARTUP_PHASES:
+            continue
+        if phase.startswith("gui") and gui_module is None:
+            continue
+        result = measure(lambda: Startup(gui_module), STARTUP_PHASES[phase], repeat)
+        results[f"startup/{phase}"] = result
+        log(f"{'startup':<9} {phase:<13} {result['seconds'] * 1000:10.1f} ms "
+            f"{result['peak_kib']:10.0f} KiB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            work = Workload(scale, SCALES[scale], tmp)
+            for phase in phases:
+                if phase in STARTUP_PHASES:
+                    continue
+                if phase in HEADLESS_PHASES:
+                    setup, run = HEADLESS_PHASES[phase]
+                    prepare = lambda: setup(work)  # noqa: E731
+                elif gui_module is not None:
+                    setup, run = GUI_PHASES[phase]
+
+                    def prepare(setup=setup):
+                        state = GuiState(gui_module, work)
+                        return setup(state) if setup else state
+                else:
+                    continue
+
+                try:
+                    result = measure(prepare, run, repeat)
+                except ImportError as e:
+                    log(f"{scale:<9} {phase:<13} skipped: {e}")
+                    continue
+                results[f"{scale}/{phase}"] = result
+                log(f"{scale:<9} {phase:<13} {result['seconds'] * 1000:10.1f} ms "
+                    f"{result['peak_kib']:10.0f} KiB")
+    return results
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD,
+            memory_threshold=MEMORY_THRESHOLD):
+    # Returns one message per phase that got slower or bigger than allowed
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        slower = result["seconds"] - base["seconds"]
+        if slower > MIN_SECONDS and result["seconds"] > base["seconds"] * (1 + time_threshold):
+            regressions.append(f"{key}: {result['seconds'] * 1000:.1f} ms vs "
+                               f"{base['seconds'] * 1000:.1f} ms baseline "
+                               f"(+{slower / base['seconds']:.0%})")
+        if result["peak_kib"] > base["peak_kib"] * (1 + memory_threshold) + 64:
+            regressions.append(f"{key}: {result['peak_kib']:.0f} KiB vs "
+                               f"{base['peak_kib']:.0f} KiB baseline peak memory")
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, 'r') as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path, results):
+    data = {
+        "recorded_at": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def build_parser():
+    phases = list(STARTUP_PHASES) + list(HEADLESS_PHASES) + list(GUI_PHASES)
+    parser = argparse.ArgumentParser(description="Ward planner benchmarks")
+    parser.add_argument("--scales", default=",".join(SCALES),
+                        help=f"comma-separated scales (default: {','.join(SCALES)})")
+    parser.add_argument("--phases", default=",".join(phases),
+                        help=f"comma-separated phases (default: all of {','.join(phases)})")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per phase (default: 3)")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk phases")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true",
+                        help="write this run as the new baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=TIME_THRESHOLD,
+                        help="allowed slowdown before failing, as a fraction (default: 0.25)")
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                        help="allowed peak memory growth, as a fraction (default: 0.25)")
+    parser.add_argument("--json", help="also write this run's results here")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    scales = [s for s in args.scales.split(",") if s]
+    phases = [p for p in args.phases.split(",") if p]
+    for name in scales:
+        if name not in SCALES:
+            raise SystemExit(f"Unknown scale: {name}")
+    for name in phases:
+        if name not in HEADLESS_PHASES and name not in GUI_PHASES and name not in STARTUP_PHASES:
+            raise SystemExit(f"Unknown phase: {name}")
+
+    results = run_benchmarks(scales, phases, args.repeat, gui=not args.no_gui)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        return 0
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold,
+                          args.memory_threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print("No regressions against baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ward_planner.synthetic import synthetic_ward  # noqa: E402
+
+# Load generator for the allocation service (python -m ward_planner serve).
+# Many concurrent clients, each on its own keep-alive connection, POST
+# synthetic wards to /plan as fast as the service answers. Reports
+# throughput, latency percentiles and the status codes seen; 503s from the
+# service's back-pressure are retried after a short backoff. Without --url
+# it starts a service on a free port and stops it afterwards.
+#
+#   python benchmarks/load.py                          # every ward different
+#   python benchmarks/load.py --distinct 20            # 20 wards, repeated
+#   python benchmarks/load.py --mode optimal --clients 50
+#   python benchmarks/load.py --url http://127.0.0.1:8765
+
+PERCENTILES = (50, 90, 99)
+
+
+def ward_bodies(count, distinct, beds, mode, seed):
+    # count request bodies; with distinct, only that many different wards
+    # (each ward's name is unique either way, which the service doesn't key)
+    rng = random.Random(seed)
+    wards = []
+    for i in range(distinct or count):
+        spec = synthetic_ward(f"L{i:05d}", beds, rng=rng)
+        wards.append({"ward": spec["ward"], "nurses": spec["nurses"],
+                      "total_patients": spec["total_patients"], "ratio": spec["ratio"],
+                      "acuity": spec["acuity_counts"], "tasks": spec["tasks"], "mode": mode})
+    return [json.dumps(wards[i % len(wards)]).encode('utf-8') for i in range(count)]
+
+
+async def post(reader, writer, host, body):
+    writer.write((f"POST /plan HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+                 .encode('latin-1') + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+    status = int(head[0].split(" ", 2)[1])
+    length = 0
+    closing = False
+    for line in head[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            closing = value.strip().lower() == "close"
+    await reader.readexactly(length)
+    return status, closing
+
+
+async def client(host, port, queue, latencies, statuses, backoff):
+    # A 503 is counted, then retried after backoff seconds (if given) the
+    # way a ward terminal would; latency runs from the first attempt
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while queue:
+            body = queue.pop()
+            started = time.perf_counter()
+            while True:
+                status, closing = await post(reader, writer, host, body)
+                statuses[status] = statuses.get(status, 0) + 1
+                if closing:
+                    writer.close()
+                    reader, writer = await asyncio.open_connection(host, port)
+                if status != 503 or not backoff:
+                    break
+                await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, bodies, clients, backoff):
+    queue = list(reversed(bodies))
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, queue, latencies, statuses, backoff)
+                           for _ in range(min(clients, len(bodies)))))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def start_service(workers):
+    command = [sys.executable, "-m", "ward_planner", "serve", "--port", "0"]
+    if workers is not None:
+        command += ["--workers", str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline()
+    if "http://" not in banner:
+        process.kill()
+        raise SystemExit(f"Service didn't start: {banner.strip()}")
+    return process, banner.split("http://", 1)[1].split()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allocation service load generator")
+    parser.add_argument("--url", help="service to load (default: start one on a free port)")
+    parser.add_argument("--clients", type=int, default=200,
+                        help="concurrent connections (default: 200)")
+    parser.add_argument("--requests", type=int, default=5000,
+                        help="requests in all (default: 5000)")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="different wards to cycle through (default: 0, every ward different)")
+    parser.add_argument("--beds", type=int, default=30, help="beds per ward (default: 30)")
+    parser.add_argument("--mode", default="balanced", help="allocation mode (default: balanced)")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes for a service started here (default: one per CPU)")
+    parser.add_argument("--backoff", type=float, default=0.05,
+                        help="seconds before retrying a 503, 0 to not retry (default: 0.05)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    bodies = ward_bodies(args.requests, args.distinct, args.beds, args.mode, args.seed)
+    process = None
+    if args.url:
+        address = urlsplit(args.url).netloc
+    else:
+        process, address = start_service(args.workers)
+    host, _, port = address.rpartition(":")
+    try:
+        elapsed, latencies, statuses = asyncio.run(
+            run_load(host, int(port), bodies, args.clients, args.backoff))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    results = {
+        "requests": len(latencies),
+        "clients": args.clients,
+        "distinct": args.distinct or args.requests,
+        "mode": args.mode,
+        "seconds": elapsed,
+        "per_second": len(latencies) / elapsed,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        **{f"p{p}_ms": percentile(latencies, p) * 1000 for p in PERCENTILES},
+        "max_ms": latencies[-1] * 1000,
+    }
+    print(f"{results['requests']} requests from {args.clients} clients in {elapsed:.2f}s: "
+          f"{results['per_second']:.0f}/s")
+    print("latency " + ", ".join(f"p{p} {results[f'p{p}_ms']:.1f} ms" for p in PERCENTILES)
+          + f", max {results['max_ms']:.1f} ms")
+    print("responses " + ", ".join(f"{s}: {n}" for s, n in results["statuses"].items()))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if set(statuses) <= {200, 503} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+from ward_planner.synthetic import synthetic_site
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_bench():
+    spec = importlib.util.spec_from_file_location(
+        "bench", os.path.join(ROOT, "benchmarks", "bench.py"))
+    bench = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench)
+    return bench
+
+
+def test_synthetic_site_is_seeded_and_adds_up():
+    site = synthetic_site(100, ward_beds=30, seed=3)
+    assert [w["total_patients"] for w in site] == [30, 30, 30, 10]
+    assert all(sum(w["acuity_counts"].values()) == w["total_patients"] for w in site)
+    assert site == synthetic_site(100, ward_beds=30, seed=3)
+    assert site != synthetic_site(100, ward_beds=30, seed=4)
+
+
+def test_compare_flags_only_real_regressions():
+    bench = load_bench()
+    baseline = {"ward/plan": {"seconds": 0.010, "peak_kib": 100.0},
+                "site/plan": {"seconds": 0.0001, "peak_kib": 100.0}}
+    results = {"ward/plan": {"seconds": 0.020, "peak_kib": 400.0},
+               # Doubled, but by less than the noise floor
+               "site/plan": {"seconds": 0.0002, "peak_kib": 100.0}}
+    regressions = bench.compare(results, baseline)
+    assert len(regressions) == 2
+    assert all(r.startswith("ward/plan") for r in regressions)
+
+
+def test_headless_phases_run_at_ward_scale():
+    bench = load_bench()
+    results = bench.run_benchmarks(["ward"], ["plan", "render", "export"], repeat=1,
+                                   gui=False, log=lambda line: None)
+    assert set(results) == {"ward/plan", "ward/render", "ward/export"}
+    assert all(r["seconds"] > 0 for r in results.values())
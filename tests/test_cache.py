@@ -0,0 +1,46 @@
+import os
+
+from ward_planner.cache import PlanCache, plan_key
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"}]
+
+
+def test_key_ignores_equivalent_spellings_but_not_order():
+    assert plan_key(NURSES, 8, 4) == plan_key([("Ann", "Senior"), ("Ben", "Junior")], "8", 4.0)
+    assert plan_key(NURSES, 8, 4) != plan_key(NURSES[::-1], 8, 4)
+    assert plan_key(NURSES, 8, 4) != plan_key(NURSES, 8, 4, mode="contiguous")
+
+
+def test_cached_plan_is_a_copy_with_its_own_labels():
+    cache = PlanCache()
+    first = cache.plan(NURSES, 8, 4, ward="A1")
+    first.allocation["Ann"]['patients'].clear()
+    second = cache.plan(NURSES, 8, 4, ward="A2")
+    assert cache.hits == 1 and cache.misses == 1
+    assert second.ward == "A2"
+    assert len(second.allocation["Ann"]['patients']) == 4
+
+
+def test_least_recently_used_plan_is_evicted():
+    cache = PlanCache(max_entries=2)
+    for total in (4, 6, 4, 8):
+        cache.plan(NURSES, total, 4)
+    assert cache.stats()["evictions"] == 1
+    cache.plan(NURSES, 4, 4)
+    cache.plan(NURSES, 6, 4)
+    assert cache.hits == 2 and cache.misses == 4
+
+
+def test_disk_cache_survives_a_restart_and_drops_damaged_files(tmp_path):
+    directory = str(tmp_path / "cache")
+    PlanCache(directory=directory).plan(NURSES, 8, 4)
+    cache = PlanCache(directory=directory)
+    assert cache.plan(NURSES, 8, 4).total_patients == 8
+    assert cache.disk_hits == 1
+
+    (name,) = os.listdir(directory)
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(b"not a pickle")
+    cache = PlanCache(directory=directory)
+    assert cache.plan(NURSES, 8, 4).total_patients == 8
+    assert cache.misses == 1
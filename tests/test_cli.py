@@ -0,0 +1,30 @@
+import json
+import os
+import subprocess
+import sys
+
+from ward_planner.cli import main
+
+EXAMPLES = "examples/wards"
+
+
+def test_plan_writes_one_report_per_ward(tmp_path, capsys):
+    out = tmp_path / "plans"
+    summary = tmp_path / "summary.json"
+    assert main(["plan", EXAMPLES, "--serial", "--out", str(out), "--format", "json",
+                 "--summary", str(summary)]) == 0
+    assert sorted(os.listdir(out)) == ["A1.json", "B2.json"]
+    with open(out / "A1.json") as f:
+        plan = json.load(f)
+    assert sum(len(n["patients"]) for n in plan["allocation"]) == 28
+    with open(summary) as f:
+        assert json.load(f)["wards"] == 2
+    assert "A1: 5 nurses, 28 patients, safe" in capsys.readouterr().out
+
+
+def test_cli_runs_as_a_module_without_a_display():
+    env = {**os.environ, "DISPLAY": ""}
+    result = subprocess.run([sys.executable, "-m", "ward_planner", "plan", EXAMPLES, "--serial"],
+                            capture_output=True, text=True, env=env)
+    assert result.returncode == 0, result.stderr
+    assert "B2: 4 nurses, 20 patients, safe" in result.stdout
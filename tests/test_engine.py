@@ -0,0 +1,49 @@
+import json
+
+from ward_planner.engine import plan_ward
+
+SENIOR = {"name": "Ann", "skill": "Senior"}
+
+
+def load_example(name):
+    with open(f"examples/wards/{name}.json") as f:
+        return json.load(f)
+
+
+def patient_counts(plan):
+    return {name: len(entry['patients']) for name, entry in plan.allocation.items()}
+
+
+def test_balanced_plan_keeps_every_nurse_within_the_ratio():
+    for name in ("ward_a", "ward_b"):
+        data = load_example(name)
+        plan = plan_ward(data["nurses"], data["total_patients"], data["ratio"],
+                         data.get("acuity"))
+        assert plan.safe
+        assert max(patient_counts(plan).values()) <= data["ratio"]
+        assert sum(patient_counts(plan).values()) == data["total_patients"]
+        assert plan.warnings == []
+
+
+def test_balanced_plan_spreads_high_acuity_before_filling_with_low():
+    nurses = [SENIOR, {"name": "Ben", "skill": "Intermediate"},
+              {"name": "Cat", "skill": "Junior"}]
+    plan = plan_ward(nurses, 9, 4, {"High": 2, "Moderate": 4, "Low": 3})
+    high = {name: sum(p['acuity'] == "High" for p in entry['patients'])
+            for name, entry in plan.allocation.items()}
+    assert high == {"Ann": 1, "Ben": 1, "Cat": 0}
+
+
+def test_understaffed_plan_warns_about_nurses_over_the_ratio():
+    nurses = [SENIOR, {"name": "Ben", "skill": "Junior"}]
+    plan = plan_ward(nurses, 12, 4)
+    assert not plan.safe
+    assert patient_counts(plan) == {"Ann": 6, "Ben": 6}
+    assert any("over the 1:4 ratio" in w for w in plan.warnings)
+
+
+def test_full_eligible_nurses_overflow_with_a_warning():
+    nurses = [SENIOR, {"name": "Ben", "skill": "Junior"}]
+    plan = plan_ward(nurses, 8, 4, {"High": 6, "Moderate": 2, "Low": 0})
+    assert patient_counts(plan) == {"Ann": 4, "Ben": 4}
+    assert any("Ben (Junior) has 2 high acuity patients" in w for w in plan.warnings)
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pytest
+
+from ward_planner.engine import plan_ward
+from ward_planner.export import export_plans, read_history
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"},
+          {"name": "Cat", "skill": "Junior"}]
+AT = datetime(2026, 11, 2, 7, 30)
+
+
+@pytest.mark.parametrize("name", ["history.csv", "history.jsonl"])
+def test_export_appends_and_reads_back(tmp_path, name):
+    # Two patients for three nurses: one nurse has no bed but still a row
+    plan = plan_ward(NURSES, 2, 4, tasks=["Bed baths"], ward="A1")
+    path = str(tmp_path / name)
+    assert export_plans([plan], path, planned_at=AT) == 3
+    assert export_plans([plan], path, append=True, planned_at=AT) == 3
+    rows = list(read_history(path))
+    assert len(rows) == 6
+    assert sorted(r["bed"] for r in rows[:3] if r["bed"] is not None) == [1, 2]
+    assert any(r["bed"] is None and r["acuity"] is None for r in rows[:3])
+    assert [r["tasks"] for r in rows[:3]].count(["Bed baths"]) == 1
+    assert rows[0]["planned_at"] == "2026-11-02T07:30:00"
+
+
+def test_csv_header_written_once(tmp_path):
+    plan = plan_ward(NURSES, 3, 4)
+    path = str(tmp_path / "history.csv")
+    export_plans([plan], path, append=True)
+    export_plans([plan], path, append=True)
+    with open(path) as f:
+        assert sum(line.startswith("planned_at,") for line in f) == 1
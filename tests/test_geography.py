@@ -0,0 +1,85 @@
+import itertools
+import random
+
+import pytest
+
+from ward_planner.constants import ACUITY_ELIGIBILITY, ACUITY_WEIGHTS, SKILL_FACTORS
+from ward_planner.engine import plan_ward
+from ward_planner.geography import layout_metrics, normalize_layout
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+          {"name": "Cat", "skill": "Junior"}]
+LAYOUT = [[1, 2, 3, 4], [5, 6, 7, 8]]
+
+
+def peak(allocation):
+    return max(entry['load'] / SKILL_FACTORS[entry['nurse']['skill']]
+               for entry in allocation.values())
+
+
+def best_peak(beds, nurses, cap):
+    # Every way to cut the walk into one run of at most cap beds per nurse,
+    # in every nurse order
+    acuities = [beds[bed] for bed in sorted(beds)]
+    n = len(acuities)
+    best = None
+    for order in itertools.permutations(nurses):
+        for cuts in itertools.combinations_with_replacement(range(n + 1), len(nurses) - 1):
+            bounds = (0,) + cuts + (n,)
+            worst = 0.0
+            for nurse, start, end in zip(order, bounds, bounds[1:]):
+                run = acuities[start:end]
+                if len(run) > cap or any(nurse['skill'] not in ACUITY_ELIGIBILITY[a] for a in run):
+                    break
+                load = sum(ACUITY_WEIGHTS[a] for a in run)
+                worst = max(worst, load / SKILL_FACTORS[nurse['skill']])
+            else:
+                best = worst if best is None else min(best, worst)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_contiguous_runs_are_optimal_and_eligible(seed):
+    rng = random.Random(seed)
+    beds = {bed: rng.choice(["High", "Moderate", "Low"]) for bed in range(1, 9)}
+    plan = plan_ward(NURSES, 8, 4, mode="contiguous", layout=LAYOUT, beds=beds)
+    metrics = plan.bed_metrics()
+    assert all(m["runs"] <= 1 for m in metrics["nurses"].values())
+    for entry in plan.allocation.values():
+        assert all(entry['nurse']['skill'] in ACUITY_ELIGIBILITY[p['acuity']]
+                   for p in entry['patients'])
+    assert sum(len(e['patients']) for e in plan.allocation.values()) == 8
+    assert peak(plan.allocation) <= best_peak(beds, NURSES, 4) * (1 + 1e-6)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_contiguous_runs_stay_within_the_ratio(seed):
+    rng = random.Random(seed)
+    nurses = [{"name": f"N{i}", "skill": skill}
+              for i, skill in enumerate(["Senior"] * 3 + ["Intermediate"] * 3 + ["Junior"] * 2)]
+    beds = {bed: rng.choice(["High", "Moderate", "Low", "Low"]) for bed in range(1, 41)}
+    plan = plan_ward(nurses, 40, 6, mode="contiguous", beds=beds)
+    assert max(len(e['patients']) for e in plan.allocation.values()) <= 6
+    assert all(m["runs"] <= 1 for m in plan.bed_metrics()["nurses"].values())
+    assert not any("over the 1:6 ratio" in w for w in plan.warnings)
+
+
+def test_layout_metrics_for_a_scattered_allocation():
+    allocation = {
+        "Ann": {'nurse': NURSES[0], 'patients': [{"id": 1, "acuity": "Low"},
+                                                 {"id": 8, "acuity": "Low"}]},
+        "Ben": {'nurse': NURSES[1], 'patients': [{"id": 2, "acuity": "Low"}]},
+        "Cat": {'nurse': NURSES[2], 'patients': []},
+    }
+    metrics = layout_metrics(allocation, LAYOUT)
+    # Beds 1 and 8 are the ends of the walk: 3 steps + a bay walk of 4 + 3
+    assert metrics["nurses"]["Ann"] == {"runs": 2, "bays": 2, "walk": 10}
+    assert metrics["nurses"]["Cat"] == {"runs": 0, "bays": 0, "walk": 0}
+    assert metrics["runs_per_nurse"] == 1.5
+
+
+def test_layout_rejects_repeated_beds_and_walks_unlisted_ones_last():
+    with pytest.raises(ValueError):
+        normalize_layout([[1, 2], [2, 3]], [1, 2, 3])
+    assert normalize_layout({"Bay A": [2, 1]}, [1, 2, 3]) == [("Bay A", [2, 1]),
+                                                               ("Unlisted", [3])]
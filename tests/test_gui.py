@@ -0,0 +1,98 @@
+import importlib.util
+import os
+import pstats
+import queue
+import threading
+import types
+
+import pytest
+
+from ward_planner import instrument
+from ward_planner.cache import PlanCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"}]
+
+
+@pytest.fixture(scope="module")
+def gui():
+    # Importing the GUI module needs tkinter but not a display
+    pytest.importorskip("tkinter")
+    spec = importlib.util.spec_from_file_location(
+        "ward_shift_planner", os.path.join(ROOT, "ward shift planner.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_generate_worker_is_profiled_into_the_tk_threads_run(gui, tmp_path):
+    instrument.enable(profile_dir=str(tmp_path))
+    try:
+        run = instrument.start_run("generate")
+        app = types.SimpleNamespace(plan_cache=PlanCache(), generate_queue=queue.Queue())
+        inputs = dict(nurses=NURSES, total_patients=8, ratio=4, acuity_counts=None,
+                      tasks=[], notes="")
+        worker = threading.Thread(target=gui.WardShiftPlanner.plan_in_background,
+                                  args=(app, 1, "balanced", inputs, None, None, run))
+        worker.start()
+        worker.join()
+        job, mode, plan, error = app.generate_queue.get_nowait()
+        record = run.finish()
+    finally:
+        instrument.disable()
+    assert error is None and plan.total_patients == 8
+    assert "plan_ward" in {name for _, _, name in pstats.Stats(record["profile"]).stats}
+
+
+def test_generate_worker_posts_unexpected_errors(gui):
+    def broken(**inputs):
+        raise AttributeError("boom")
+    app = types.SimpleNamespace(plan_cache=types.SimpleNamespace(plan=broken),
+                                generate_queue=queue.Queue())
+    inputs = dict(nurses=NURSES, total_patients=8, ratio=4, acuity_counts=None,
+                  tasks=[], notes="")
+    worker = threading.Thread(target=gui.WardShiftPlanner.plan_in_background,
+                              args=(app, 1, "balanced", inputs, None))
+    worker.start()
+    worker.join()
+    job, mode, plan, error = app.generate_queue.get_nowait()
+    assert plan is None and isinstance(error, AttributeError)
+
+
+def display_error():
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def test_headless_import_loads_no_gui_or_heavy_modules():
+    import subprocess
+    import sys
+
+    code = ("import sys, ward_planner.cli, ward_planner.hospital; "
+            "print(','.join(m for m in ('tkinter', 'numpy', 'sqlite3', 'asyncio', "
+            "'concurrent.futures', 'dataclasses', 'cProfile') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    assert result.stdout.strip() == ""
+
+
+def test_tabs_are_built_when_first_opened(gui):
+    reason = display_error()
+    if reason:
+        pytest.skip(reason)
+    root = gui.tk.Tk()
+    root.withdraw()
+    try:
+        app = gui.WardShiftPlanner(root)
+        unbuilt = list(app.tab_builders.values())
+        assert unbuilt
+        tab, _ = unbuilt[0]
+        app.build_tab(tab)
+        assert str(tab) not in app.tab_builders
+        assert tab.winfo_children()
+    finally:
+        root.destroy()
@@ -0,0 +1,62 @@
+import json
+import shutil
+
+import pytest
+
+from ward_planner.hospital import plan_wards, summarize
+from ward_planner.wardfile import ward_spec
+
+EXAMPLES = "examples/wards"
+
+
+def write_ward(path, **data):
+    path.write_text(json.dumps({"total_patients": 6, "ratio": 6,
+                                "nurses": [{"name": "Ann", "skill": "Senior"}], **data}))
+    return str(path)
+
+
+def test_batch_keeps_other_wards_when_one_is_malformed(tmp_path):
+    shutil.copy(f"{EXAMPLES}/ward_a.json", tmp_path / "ward_a.json")
+    shutil.copy(f"{EXAMPLES}/ward_b.json", tmp_path / "ward_b.json")
+    bad = write_ward(tmp_path / "ward_c.json", weights=[])
+
+    paths = sorted(str(p) for p in tmp_path.iterdir())
+    results = list(plan_wards(paths, serial=True))
+    summary = summarize(results)
+
+    assert summary["wards"] == 2
+    assert summary["failed"] == 1
+    assert summary["errors"][0]["source"] == bad
+    assert "weights" in summary["errors"][0]["error"]
+    assert "ward_c.json" in summary["errors"][0]["error"]
+
+
+def test_batch_on_a_pool_matches_serial():
+    paths = [f"{EXAMPLES}/ward_a.json", f"{EXAMPLES}/ward_b.json"]
+    serial = [r.plan.to_dict() for r in plan_wards(paths, serial=True)]
+    pooled = [r.plan.to_dict() for r in plan_wards(paths, workers=2)]
+    assert pooled == serial
+
+
+@pytest.mark.parametrize("key, value", [
+    ("weights", []), ("beds", "x"), ("acuity", [5, 14, 9]), ("nurses", {"Ann": "Senior"}),
+    ("weights", {"acuity": ["High"]}),
+])
+def test_ward_spec_rejects_wrong_types(key, value):
+    data = {"total_patients": 6, "ratio": 6, "nurses": [{"name": "Ann", "skill": "Senior"}]}
+    with pytest.raises(ValueError, match=key.split(".")[0]):
+        ward_spec({**data, key: value}, "wards/bad.json")
+
+
+@pytest.mark.parametrize("serial", [True, False])
+def test_bad_task_only_fails_its_own_ward(tmp_path, serial):
+    shutil.copy(f"{EXAMPLES}/ward_a.json", tmp_path / "ward_a.json")
+    bad = write_ward(tmp_path / "ward_c.json", tasks=[5])
+
+    paths = sorted(str(p) for p in tmp_path.iterdir())
+    summary = summarize(list(plan_wards(paths, serial=serial, workers=2)))
+
+    assert summary["wards"] == 1
+    assert summary["failed"] == 1
+    assert summary["errors"][0]["source"] == bad
+    assert "task" in summary["errors"][0]["error"]
@@ -0,0 +1,77 @@
+import copy
+import json
+
+import pytest
+
+from ward_planner.engine import plan_ward
+from ward_planner.incremental import IncrementalAllocator, replan
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+          {"name": "Cat", "skill": "Junior"}]
+ACUITY = {"High": 3, "Moderate": 6, "Low": 3}
+
+
+def owners(plan):
+    return {p['id']: name for name, entry in plan.allocation.items() for p in entry['patients']}
+
+
+def test_replan_keeps_patients_with_their_nurse():
+    plan = plan_ward(NURSES, 12, 4, ACUITY)
+    before = owners(plan)
+    new_plan = replan(copy.deepcopy(plan), NURSES, 13, 4,
+                      {**ACUITY, "Low": ACUITY["Low"] + 1})
+    after = owners(new_plan)
+    assert all(after[p] == name for p, name in before.items())
+    assert [m["to"] for m in new_plan.moves if m["from"] is None] == [after[13]]
+
+
+def test_replan_moves_only_a_leavers_patients():
+    plan = plan_ward(NURSES, 12, 4, ACUITY)
+    before = owners(plan)
+    new_plan = replan(copy.deepcopy(plan), NURSES[:2], 12, 6, ACUITY)
+    moved = {m["patient"] for m in new_plan.moves}
+    assert moved == {p for p, name in before.items() if name == "Cat"}
+    assert set(new_plan.allocation) == {"Ann", "Ben"}
+
+
+@pytest.mark.parametrize("mode", ["optimal", "contiguous"])
+def test_replan_refuses_plans_it_would_mislabel(mode):
+    if mode == "optimal":
+        pytest.importorskip("numpy")
+    plan = plan_ward(NURSES, 12, 4, ACUITY, mode=mode)
+    with pytest.raises(ValueError, match="balanced"):
+        replan(plan, NURSES, 12, 4, ACUITY)
+
+
+def test_allocator_discharge_and_admit():
+    plan = plan_ward(NURSES, 12, 4, ACUITY)
+    allocator = IncrementalAllocator(plan.allocation)
+    owner = owners(plan)[1]
+    moves = allocator.discharge(1)
+    assert moves[0] == {"patient": 1, "acuity": "High", "from": owner, "to": None}
+    moves = allocator.admit({"id": 1, "acuity": "High"})
+    assert moves[0]["to"] in ("Ann", "Ben")
+
+
+def ward_a():
+    with open("examples/wards/ward_a.json") as f:
+        return json.load(f)
+
+
+def test_admissions_stay_within_the_ratio():
+    data = ward_a()
+    plan = plan_ward(data["nurses"], 28, 6, data["acuity"])
+    new_plan = replan(plan, data["nurses"], 29, 6, {**data["acuity"], "Low": 10})
+    assert max(len(e['patients']) for e in new_plan.allocation.values()) <= 6
+    assert new_plan.warnings == []
+
+
+def test_leaver_overflow_is_capped_and_warned_like_a_fresh_plan():
+    data = ward_a()
+    plan = plan_ward(data["nurses"], 28, 6, data["acuity"])
+    new_plan = replan(plan, data["nurses"][:4], 28, 6, data["acuity"])
+    fresh = plan_ward(data["nurses"][:4], 28, 6, data["acuity"])
+    counts = [len(e['patients']) for e in new_plan.allocation.values()]
+    assert max(counts) == max(len(e['patients']) for e in fresh.allocation.values()) == 7
+    over = [w for w in new_plan.warnings if "over the 1:6 ratio" in w]
+    assert len(over) == counts.count(7) == 4
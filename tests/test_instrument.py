@@ -0,0 +1,76 @@
+import json
+import pstats
+import threading
+
+import pytest
+
+from ward_planner import instrument
+from ward_planner.engine import plan_ward
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"}]
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    yield instrument.enable(str(tmp_path / "trace.jsonl"), str(tmp_path / "profiles"))
+    instrument.disable()
+
+
+def profiled_functions(path):
+    return {name for _, _, name in pstats.Stats(path).stats}
+
+
+def test_run_records_spans_and_counters(recorder, tmp_path):
+    with instrument.start_run("plan") as run:
+        plan_ward(NURSES, 8, 4)
+    record = run.record()
+    assert {"patients", "distribute", "tasks"} <= set(record["spans"])
+    assert record["counters"] == {"patients": 8, "nurses": 2}
+    with open(tmp_path / "trace.jsonl") as f:
+        assert json.loads(f.readline())["run"] == "plan"
+
+
+def test_profile_covers_planning_on_a_worker_thread(recorder):
+    # The GUI starts the run on the Tk thread and plans on another
+    run = instrument.start_run("generate")
+
+    def worker():
+        with run.profile_thread():
+            plan_ward(NURSES, 8, 4)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    record = run.finish()
+    assert "plan_ward" in profiled_functions(record["profile"])
+
+
+def test_disabled_instrumentation_records_nothing():
+    assert not instrument.enabled()
+    run = instrument.start_run("plan")
+    with run.profile_thread():
+        plan_ward(NURSES, 8, 4)
+    assert run.finish() is None
+
+
+def test_listeners_get_each_finished_run(recorder):
+    records = []
+    recorder.listeners.append(records.append)
+    with instrument.start_run("first"):
+        with instrument.span("work"):
+            instrument.count("items", 3)
+    # Starting a run finishes the one it replaces
+    instrument.start_run("second")
+    instrument.start_run("third").finish()
+    assert [r["run"] for r in records] == ["first", "second", "third"]
+    assert records[0]["counters"] == {"items": 3}
+    assert "work" in records[0]["spans"]
+
+
+def test_enable_keeps_the_existing_recorder(recorder, tmp_path):
+    assert instrument.enable(str(tmp_path / "other.jsonl")) is recorder
+    assert recorder.log_path == str(tmp_path / "trace.jsonl")
+
+
+def test_spans_outside_a_run_cost_nothing(recorder):
+    assert instrument.span("loose") is instrument.NULL_SPAN
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from ward_planner.cli import main
+from ward_planner.engine import plan_ward
+from ward_planner.live import FeedReader, LiveWard, follow, parse_event
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+          {"name": "Cat", "skill": "Junior"}]
+
+
+def live_ward():
+    return LiveWard(plan_ward(NURSES, 6, 4, {"High": 2, "Moderate": 2, "Low": 2}))
+
+
+def test_parse_event_validates_each_type():
+    assert parse_event('{"type": "admit", "bed": "7", "acuity": "Low", "at": 1}') == \
+        {"type": "admit", "bed": 7, "acuity": "Low"}
+    assert parse_event('{"type": "break", "nurse": " Ann "}') == {"type": "break", "nurse": "Ann"}
+    for line in ('not json', '{"type": "transfer"}', '{"type": "discharge"}',
+                 '{"type": "acuity", "bed": 1, "acuity": "Critical"}'):
+        with pytest.raises(ValueError):
+            parse_event(line)
+
+
+def test_a_burst_is_coalesced_into_its_net_effect():
+    live = live_ward()
+    moves, warnings = live.apply([
+        {"type": "admit", "bed": 7, "acuity": "High"},
+        {"type": "discharge", "bed": 7},
+        {"type": "acuity", "bed": 1, "acuity": "Moderate"},
+        {"type": "acuity", "bed": 1, "acuity": "Low"},
+        {"type": "discharge", "bed": 99},
+    ])
+    assert live.beds()[1] == "Low"
+    assert 7 not in live.beds()
+    assert live.plan.total_patients == 6
+    assert warnings == ["Ignored discharge of bed 99: not occupied"]
+    assert live.updates == 1
+
+
+def test_break_hands_patients_over_and_return_takes_them_back():
+    live = live_ward()
+    before = sorted(p['id'] for p in live.allocation["Ben"]['patients'])
+    live.apply([{"type": "break", "nurse": "Ben"}])
+    assert "Ben" not in live.allocation
+    assert sum(len(e['patients']) for e in live.allocation.values()) == 6
+    live.apply([{"type": "return", "nurse": "Ben"}])
+    assert sorted(p['id'] for p in live.allocation["Ben"]['patients']) == before
+
+
+def test_follow_reads_appended_lines_and_emits_one_update(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    path.write_text('{"type": "admit", "bed": 1, "acuity": "High"}\n')
+    reader = FeedReader(str(path))
+    with open(path, 'a') as f:
+        f.write(json.dumps({"type": "admit", "bed": 7, "acuity": "Low"}) + "\n")
+        f.write(json.dumps({"type": "admit", "bed": 8, "acuity": "Low"}) + "\n")
+        f.write('{"type": "discharge", "bed": 2')
+    live = live_ward()
+    updates = []
+    follow(live, reader, lambda snapshot, latencies: updates.append((snapshot, latencies)),
+           once=True)
+    reader.close()
+    snapshot, latencies = updates[0]
+    assert len(updates) == 1 and len(latencies) == 2
+    # The half-written discharge waits for its newline
+    assert snapshot["patients"] == 8
+
+
+def test_admissions_past_the_ratio_are_capped_and_warned():
+    live = live_ward()
+    _, warnings = live.apply([{"type": "admit", "bed": bed, "acuity": "Low"}
+                              for bed in range(7, 14)])
+    counts = [len(e['patients']) for e in live.allocation.values()]
+    assert sorted(counts) == [4, 4, 5]
+    assert sum("over the 1:4 ratio" in w for w in warnings) == 1
+
+
+def test_only_balanced_plans_are_followed(tmp_path, capsys):
+    plan = plan_ward(NURSES, 6, 4, mode="contiguous")
+    with pytest.raises(ValueError, match="balanced"):
+        LiveWard(plan)
+
+    ward = tmp_path / "ward.json"
+    ward.write_text(json.dumps({"total_patients": 6, "ratio": 4, "nurses": NURSES,
+                                "mode": "contiguous"}))
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text("")
+    assert main(["live", str(ward), str(feed), "--once"]) == 2
+    assert "live: error: Only balanced plans" in capsys.readouterr().err
@@ -0,0 +1,38 @@
+import pickle
+
+import pytest
+
+from ward_planner.engine import plan_ward
+from ward_planner.model import CompactAllocation, Nurse, PatientTable, order_nurses
+
+
+def test_patient_table_pads_or_trims_to_the_total():
+    table, warnings = PatientTable.from_counts(5, {"High": 1, "Low": 2})
+    assert list(table.ids) == [1, 2, 3, 4, 5]
+    assert table.counts() == {"High": 1, "Moderate": 2, "Low": 2}
+    assert warnings
+    table, _ = PatientTable.from_counts(2, {"High": 3})
+    assert table.to_dicts() == [{"id": 1, "acuity": "High"}, {"id": 2, "acuity": "High"}]
+
+
+def test_patient_table_rejects_unknown_acuity():
+    with pytest.raises(ValueError):
+        PatientTable.from_dicts([{"id": 1, "acuity": "Critical"}])
+
+
+def test_order_nurses_puts_seniors_first_and_keeps_one_per_name():
+    nurses = order_nurses([{"name": "Ben", "skill": "Junior"}, {"name": "Ann", "skill": "Senior"},
+                           {"name": "Cat", "skill": "Intermediate"},
+                           {"name": "Ann", "skill": "Intermediate"}])
+    assert nurses == [Nurse("Ann", "Intermediate"), Nurse("Cat", "Intermediate"),
+                      Nurse("Ben", "Junior")]
+
+
+def test_compact_allocation_round_trips_through_the_dict_shape():
+    plan = plan_ward([{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"}],
+                     8, 4, tasks=["Bed baths", "IV meds"])
+    assert isinstance(plan.compact, CompactAllocation)
+    allocation = plan.compact.to_allocation()
+    back = CompactAllocation.from_allocation(allocation)
+    assert back.to_allocation() == allocation
+    assert pickle.loads(pickle.dumps(plan)).to_dict() == plan.to_dict()
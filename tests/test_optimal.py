@@ -0,0 +1,43 @@
+import itertools
+import random
+
+import pytest
+
+from ward_planner.engine import plan_ward
+
+np = pytest.importorskip("numpy")
+from ward_planner.optimal import solve_transport  # noqa: E402
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+          {"name": "Cat", "skill": "Junior"}]
+
+
+def brute_force(cost, supply):
+    # Cheapest placement by trying every slot for every patient
+    patients = [i for i, n in enumerate(supply) for _ in range(n)]
+    return min(sum(cost[i, k] for i, k in zip(patients, slots))
+               for slots in itertools.permutations(range(cost.shape[1]), len(patients)))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_transport_solution_is_optimal(seed):
+    rng = random.Random(seed)
+    cost = np.array([[rng.uniform(0, 10) for _ in range(6)] for _ in range(3)])
+    supply = [2, 1, 2]
+    owner = solve_transport(cost, supply)
+    assert [int((owner == i).sum()) for i in range(3)] == supply
+    total = sum(cost[i, k] for k, i in enumerate(owner) if i >= 0)
+    assert total == pytest.approx(brute_force(cost, supply))
+
+
+def test_optimal_plan_keeps_high_acuity_off_juniors_and_within_ratio():
+    plan = plan_ward(NURSES, 12, 4, {"High": 4, "Moderate": 4, "Low": 4}, mode="optimal")
+    assert plan.objective is not None
+    for entry in plan.allocation.values():
+        assert len(entry['patients']) <= 4
+    assert not any(p['acuity'] == "High" for p in plan.allocation["Cat"]['patients'])
+
+
+def test_too_many_patients_for_the_slots_is_an_error():
+    with pytest.raises(ValueError):
+        solve_transport(np.zeros((3, 2)), [1, 1, 1])
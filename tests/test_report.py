@@ -0,0 +1,31 @@
+import io
+from datetime import datetime
+
+from ward_planner.engine import plan_ward
+from ward_planner.report import bed_ranges, iter_report, render_report, write_report
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Junior"}]
+NOW = datetime(2026, 11, 2, 7, 30)
+
+
+def test_bed_ranges_collapse_runs():
+    assert bed_ranges([7, 1, 2, 3, 5, 9, 8]) == "1-3, 5, 7-9"
+    assert bed_ranges([]) == ""
+
+
+def test_report_streams_one_section_per_nurse():
+    plan = plan_ward(NURSES, 8, 4, tasks=["Bed baths"], ward="A1", notes="Side room closed")
+    sections = list(iter_report(plan, NOW))
+    text = "".join(sections)
+    assert text == render_report(plan, NOW)
+    assert sum("NURSE:" in section for section in sections) == 2
+    assert "Ward: A1" in sections[0] and "Date: 2026-11-02 07:30" in sections[0]
+    assert "Side room closed" in text
+    assert "Bed baths" in text
+
+
+def test_write_report_matches_render():
+    plan = plan_ward(NURSES, 8, 4)
+    out = io.StringIO()
+    write_report(plan, out, NOW)
+    assert out.getvalue() == render_report(plan, NOW)
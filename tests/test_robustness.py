@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from ward_planner.engine import plan_ward
+from ward_planner.robustness import ScenarioModel, simulate
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+          {"name": "Cat", "skill": "Intermediate"}, {"name": "Dan", "skill": "Junior"},
+          {"name": "Eve", "skill": "Junior"}]
+
+
+def plan():
+    return plan_ward(NURSES, 16, 4, {"High": 4, "Moderate": 8, "Low": 4}, ward="A1")
+
+
+def test_results_depend_on_the_seed_not_the_workers():
+    serial = simulate(plan(), scenarios=600, seed=5, serial=True)
+    pooled = simulate(plan(), scenarios=600, seed=5, workers=2)
+    assert pooled.counts == serial.counts
+    assert simulate(plan(), scenarios=600, seed=6, serial=True).counts != serial.counts
+
+
+def test_nothing_happening_breaches_nothing():
+    model = ScenarioModel(discharge=0, deteriorate=0, improve=0, admit_rate=0, absence=0)
+    result = simulate(plan(), scenarios=50, model=model, serial=True)
+    assert result.probability() == 0.0
+    assert result.to_dict()["mean_patients"] == 16
+    assert result.to_dict()["mean_moves"] == 0
+
+
+def test_everyone_off_sick_breaches_everything():
+    model = ScenarioModel(absence=1.0)
+    result = simulate(plan(), scenarios=20, model=model, serial=True)
+    assert all(result.probability(b) == 1.0 for b in ("any", "ratio", "overload", "skill_mix"))
+
+
+def test_losing_the_senior_is_a_skill_mix_breach():
+    result = simulate(plan(), scenarios=2000, seed=1, serial=True)
+    absent = result.counts["absent"]["Ann"] / result.scenarios
+    assert result.probability("skill_mix") >= absent > 0
+    assert len(result.fragile(top=5)) == 5
+    assert "Breach probability" in result.format_text()
+
+
+def test_model_poisson_mean_and_validation():
+    model = ScenarioModel(admit_rate=2.0)
+    rng = random.Random(0)
+    draws = [model.poisson(rng) for _ in range(20000)]
+    assert sum(draws) / len(draws) == pytest.approx(2.0, rel=0.05)
+    with pytest.raises(ValueError):
+        ScenarioModel(deteriorate=0.7, improve=0.5)
+    with pytest.raises(ValueError):
+        simulate(plan(), scenarios=0)
@@ -0,0 +1,32 @@
+import json
+
+from ward_planner.roster import RosterReader, load_roster, save_roster
+
+
+def test_csv_roster_streams_in_batches_with_progress(tmp_path):
+    path = tmp_path / "roster.csv"
+    path.write_text("".join(f"Nurse {i},{'Senior' if i % 3 == 0 else 'Charge'}\n"
+                            for i in range(1200)) + "\n")
+    reader = RosterReader(str(path), batch_size=500)
+    batches = [len(batch) for batch in reader]
+    assert batches == [500, 500, 200]
+    assert reader.progress == 1.0
+    assert reader.loaded == 1200
+    # "Charge" isn't a skill level, so it falls back to Intermediate
+    assert reader.fixed_skills == 800
+
+
+def test_json_roster_accepts_a_wrapped_list(tmp_path):
+    path = tmp_path / "roster.json"
+    path.write_text(json.dumps({"nurses": [{"name": " Ann ", "skill": "Junior"}, "Ben",
+                                           {"name": ""}]}))
+    assert load_roster(str(path)) == [{"name": "Ann", "skill": "Junior"},
+                                      {"name": "Ben", "skill": "Intermediate"}]
+
+
+def test_saved_roster_loads_back(tmp_path):
+    nurses = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben, Jr", "skill": "Junior"}]
+    for name in ("roster.csv", "roster.json"):
+        path = str(tmp_path / name)
+        save_roster(path, nurses)
+        assert load_roster(path) == nurses
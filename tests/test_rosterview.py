@@ -0,0 +1,45 @@
+import pytest
+
+from ward_planner.rosterview import RosterView
+
+
+def roster():
+    return [{"name": "Cat", "skill": "Junior"}, {"name": "ann", "skill": "Senior"},
+            {"name": "Ben", "skill": "Intermediate"}, {"name": "Dan", "skill": "Senior"}]
+
+
+def names(view, start=0, count=100):
+    return [nurse['name'] for nurse in view.window(start, count)]
+
+
+def test_plain_view_is_the_roster_itself():
+    nurses = roster()
+    view = RosterView(nurses)
+    assert len(view) == 4
+    assert view.window(1, 2) == nurses[1:3]
+    nurses.append({"name": "Eve", "skill": "Junior"})
+    assert len(view) == 5
+
+
+def test_filter_and_sort():
+    view = RosterView(roster())
+    view.set_sort("name")
+    assert names(view) == ["ann", "Ben", "Cat", "Dan"]
+    view.set_filter("senior")
+    assert names(view) == ["ann", "Dan"]
+    view.set_sort("skill", reverse=True)
+    view.set_filter("")
+    assert names(view, 0, 2) == ["Cat", "Ben"]
+
+
+def test_sorted_view_follows_appends():
+    nurses = roster()
+    view = RosterView(nurses)
+    view.set_sort("name")
+    nurses.append({"name": "Abe", "skill": "Junior"})
+    assert names(view, 0, 1) == ["Abe"]
+
+
+def test_unknown_sort_column_is_rejected():
+    with pytest.raises(ValueError):
+        RosterView([]).set_sort("ward")
@@ -0,0 +1,77 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+from ward_planner.cli import main
+from ward_planner.engine import patient_cap
+from ward_planner.rota import (OFF, SHIFTS, RotaState, plan_rota_beds, schedule_rota,
+                               skill_minimum_counts)
+
+NURSES = ([{"name": f"S{i}", "skill": "Senior"} for i in range(6)]
+          + [{"name": f"I{i}", "skill": "Intermediate"} for i in range(8)]
+          + [{"name": f"J{i}", "skill": "Junior"} for i in range(6)])
+
+
+def weekly_counts(rota, n):
+    row = [rota.shift(n, d) for d in range(rota.days)]
+    return [sum(s is not None for s in row[w:w + 7]) for w in range(0, rota.days, 7)]
+
+
+def test_rota_respects_the_weekly_cap_and_rest():
+    rota = schedule_rota(NURSES, days=14, total_patients=20, seed=1,
+                         start=date(2026, 11, 2))
+    assert rota.breakdown["shortage"] == 0
+    assert rota.breakdown["rest"] == 0
+    assert rota.breakdown["overtime"] == 0
+    for n in range(len(NURSES)):
+        assert max(weekly_counts(rota, n)) <= 5
+
+
+def test_overtime_is_counted_per_week_not_per_period():
+    # Seven shifts in week one and three in week two: ten in a fortnight is
+    # within 2 * 5, but week one is two over
+    nurses = [{"name": "Ann", "skill": "Senior"}]
+    state = RotaState(nurses, 14, [0, 0, 0], [[0, 0, 0]] * 3, 5, 14)
+    for d in list(range(7)) + [7, 8, 9]:
+        state.change(0, d, 0)
+    assert state.breakdown()["overtime"] == 2
+    assert abs(state.cost - state.full_cost()) < 1e-9
+    assert state.week_full(0, 3) and not state.week_full(0, 10)
+
+
+def test_incremental_score_matches_full_rescoring():
+    rota_state = RotaState(NURSES, 10, [4, 4, 3], [[1, 0, 0]] * 3, 5, 5)
+    for n in range(len(NURSES)):
+        for d in range(10):
+            rota_state.change(n, d, (n + d) % (len(SHIFTS) + 1) - 1)
+    rota_state.change(3, 4, OFF)
+    assert abs(rota_state.cost - rota_state.full_cost()) < 1e-6
+
+
+def test_bed_plans_keep_nurses_on_their_beds_across_days():
+    rota = schedule_rota(NURSES, days=3, total_patients=20, seed=0, start=date(2026, 11, 2))
+    plans = plan_rota_beds(rota, 20)
+    assert len(plans) == 3 * len(SHIFTS)
+    assert all(sum(len(e['patients']) for e in p.allocation.values()) == 20 for p in plans)
+
+
+def test_bed_plans_stay_within_each_shifts_ratio():
+    rota = schedule_rota(NURSES, days=3, total_patients=20, seed=0, start=date(2026, 11, 2))
+    for plan in plan_rota_beds(rota, 20):
+        cap = patient_cap(20, len(plan.allocation), plan.ratio)
+        assert max(len(e['patients']) for e in plan.allocation.values()) <= cap
+
+
+def test_unknown_skill_minimum_is_a_usage_error(tmp_path, capsys):
+    with pytest.raises(ValueError, match="Charge"):
+        skill_minimum_counts({"Charge": 1})
+    with open("examples/rotas/ward_a.json") as f:
+        spec = json.load(f)
+    spec["roster"] = os.path.abspath("examples/rotas/ward_a_roster.csv")
+    spec["skill_minimums"] = {"Night": {"Charge": 1}}
+    path = tmp_path / "rota.json"
+    path.write_text(json.dumps(spec))
+    assert main(["rota", str(path), "--iterations", "10"]) == 2
+    assert "rota: error: Unknown skill level in skill_minimums: Charge" in capsys.readouterr().err
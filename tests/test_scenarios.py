@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+from ward_planner.scenarios import FIELDS, simplex_grid, sweep, write_sweep  # noqa: E402
+
+
+def test_one_scenario_by_hand():
+    result = sweep([30], [(20, 50, 30)], [(4, 6, 8)], [(1, 2, 1)])
+    row, = result.to_rows()
+    assert (row["patients_high"], row["patients_moderate"], row["patients_low"]) == (6, 15, 9)
+    # 6/4 + 15/6 + 9/8 = 5.125
+    assert row["required"] == 6
+    assert row["staff_senior"] + row["staff_intermediate"] + row["staff_junior"] == 6
+    assert row["load_mean"] == pytest.approx((6 * 3 + 15 * 2 + 9 * 1) / 6)
+    assert row["load_min"] <= row["load_mean"] <= row["load_max"]
+
+
+def test_grid_covers_every_combination_and_matches_a_scalar_loop():
+    mixes = simplex_grid(0.25)
+    ratios = [(3, 5, 8), (4, 6, 8)]
+    result = sweep(range(0, 41, 10), mixes, ratios)
+    assert len(result) == 5 * len(mixes) * len(ratios)
+    for row in result.to_rows():
+        patients = [row["patients_high"], row["patients_moderate"], row["patients_low"]]
+        assert sum(patients) == row["census"]
+        ratio = [row["ratio_high"], row["ratio_moderate"], row["ratio_low"]]
+        assert row["required"] == math.ceil(sum(p / r for p, r in zip(patients, ratio)) - 1e-9)
+
+
+def test_all_junior_roster_is_short_of_high_acuity_cover():
+    result = sweep([20], [(0.5, 0.5, 0)], [(4, 6, 8)], [(0, 0, 1)])
+    row, = result.to_rows()
+    assert row["shortfall_high"] == 3
+    assert row["under_minimum_senior"] == 1
+    assert row["short"]
+
+
+def test_curve_and_export(tmp_path):
+    result = sweep([10, 20], simplex_grid(0.5))
+    curve = result.curve()
+    assert [row["census"] for row in curve] == [10, 20]
+    assert all(row["scenarios"] == len(simplex_grid(0.5)) for row in curve)
+    path = str(tmp_path / "sweep.csv")
+    assert write_sweep(result, path) == len(result)
+    with open(path) as f:
+        assert f.readline().strip().split(",") == FIELDS
+
+
+def test_bad_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        sweep([])
+    with pytest.raises(ValueError):
+        sweep([10], ratios=[(0, 6, 8)])
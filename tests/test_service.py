@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+from ward_planner import service
+from ward_planner.service import PlanService
+
+WARD = {"ward": "A1", "total_patients": 12, "ratio": 4,
+        "nurses": [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Intermediate"},
+                   {"name": "Cat", "skill": "Junior"}]}
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = b"" if payload is None else json.dumps(payload).encode('utf-8')
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+    length = next(int(line.split(":")[1]) for line in head
+                  if line.lower().startswith("content-length"))
+    return int(head[0].split()[1]), json.loads(await reader.readexactly(length))
+
+
+def exchange(requests, **options):
+    # Sends each (method, path, payload) in turn on one keep-alive
+    # connection to a service on a free port; returns [(status, reply)]
+    async def run():
+        planner = PlanService(**options)
+        host, port = await planner.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            replies = [await request(reader, writer, *r) for r in requests]
+            writer.close()
+            return replies, planner.stats()
+        finally:
+            await planner.close()
+    return asyncio.run(run())
+
+
+def test_plan_returns_the_ward_plan():
+    (status, plan), = exchange([("POST", "/plan", WARD)], workers=0)[0]
+    assert status == 200
+    assert plan["ward"] == "A1"
+    assert sum(len(n["patients"]) for n in plan["allocation"]) == 12
+
+
+def test_repeated_ward_is_served_from_memory():
+    replies, stats = exchange([("POST", "/plan", WARD), ("POST", "/plan", {**WARD, "ward": "A2"})],
+                              workers=0)
+    assert [status for status, _ in replies] == [200, 200]
+    assert replies[1][1]["ward"] == "A2"
+    assert stats["cache_hits"] == 1 and stats["planned"] == 1
+
+
+def test_invalid_ward_is_a_bad_request_and_keeps_the_connection():
+    ward = {key: value for key, value in WARD.items() if key != "ratio"}
+    replies, _ = exchange([("POST", "/plan", ward), ("GET", "/health")], workers=0)
+    assert [status for status, _ in replies] == [400, 200]
+    assert "ratio" in replies[0][1]["error"]
+
+
+def test_wrongly_typed_body_is_a_bad_request_and_keeps_the_connection():
+    replies, _ = exchange([("POST", "/plan", {**WARD, "weights": []}),
+                           ("POST", "/plan", {**WARD, "beds": "x"}),
+                           ("GET", "/health")], workers=0)
+    assert [status for status, _ in replies] == [400, 400, 200]
+    assert "weights" in replies[0][1]["error"]
+    assert "beds" in replies[1][1]["error"]
+
+
+def test_unexpected_failure_is_a_json_500(monkeypatch):
+    def broken(data):
+        raise AttributeError("boom")
+    monkeypatch.setattr(service, "request_spec", broken)
+    replies, _ = exchange([("POST", "/plan", WARD), ("GET", "/health")], workers=0)
+    assert replies == [(500, {"error": "Request failed"}), (200, {"status": "ok"})]
+
+
+def test_heavy_plans_go_to_the_pool():
+    replies, stats = exchange([("POST", "/plan", {**WARD, "mode": "contiguous"})], workers=1)
+    assert replies[0][0] == 200
+    assert stats["offloaded"] == 1
@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from ward_planner.cli import main
+from ward_planner.engine import plan_ward
+from ward_planner.store import Store
+
+NURSES = [{"name": "Ann", "skill": "Senior"}, {"name": "Ben", "skill": "Senior"}]
+DAY = date(2026, 11, 2)
+
+
+def test_workload_and_recent_load_from_recorded_plans(tmp_path):
+    plan = plan_ward(NURSES, 4, 4, {"High": 2, "Moderate": 0, "Low": 2})
+    with Store(str(tmp_path / "history.db")) as store:
+        store.record_plans([plan, plan], DAY)
+        workload = store.workload(days=7, until=DAY)
+        recent = store.recent_load(NURSES + [{"name": "Cat"}], days=7, until=DAY)
+    assert workload["Ann"]["shifts"] == 2
+    assert workload["Ann"]["patients"] == {"High": 2, "Low": 2}
+    assert recent == {"Ann": 4.0, "Ben": 4.0, "Cat": 0.0}
+
+
+def test_history_gives_heavy_patients_to_whoever_had_fewer():
+    plan = plan_ward(NURSES, 2, 4, {"High": 1, "Moderate": 0, "Low": 1},
+                     history={"Ann": 9.0, "Ben": 1.0})
+    high = [name for name, entry in plan.allocation.items()
+            if any(p['acuity'] == "High" for p in entry['patients'])]
+    assert high == ["Ben"]
+
+
+def test_fair_days_needs_a_database(capsys):
+    with pytest.raises(SystemExit) as exit:
+        main(["plan", "examples/wards", "--fair-days", "7"])
+    assert exit.value.code == 2
+    assert "--fair-days requires --db" in capsys.readouterr().err
+
+
+def test_plan_records_into_the_database(tmp_path, capsys):
+    db = str(tmp_path / "history.db")
+    assert main(["plan", "examples/wards", "--serial", "--db", db, "--day", "2026-11-02",
+                 "--fair-days", "7"]) == 0
+    with Store(db) as store:
+        assert len(store.workload(days=1, until=DAY)) == 9
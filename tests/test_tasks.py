@@ -0,0 +1,40 @@
+import pytest
+
+from ward_planner.engine import plan_ward
+from ward_planner.tasks import expand_tasks, pack_tasks
+
+JUNIORS = [{"name": "Dev", "skill": "Junior"}, {"name": "Ella", "skill": "Junior"}]
+
+
+def test_expand_tasks_counts_per_patient_and_per_acuity():
+    instances = expand_tasks([{"name": "Obs round", "minutes": 5, "per": "patient"},
+                              {"name": "Neuro obs", "per": "High"}, "IV meds"],
+                             {"High": 2, "Moderate": 3, "Low": 1})
+    names = [name for name, _, _ in instances]
+    assert names.count("Obs round") == 6
+    assert names.count("Neuro obs") == 2
+    assert instances[-1] == ("IV meds", 15.0, ("Senior", "Intermediate"))
+
+
+def test_pack_tasks_fills_the_nurse_with_most_time_first():
+    assigned, minutes, spare, warnings = pack_tasks(
+        ["Intermediate", "Intermediate"], [10.0, 8.0],
+        [{"name": "Bed baths", "count": 3}])
+    assert assigned == {1: ["Bed baths", "Bed baths"], 0: ["Bed baths"]}
+    assert minutes == [30.0, 60.0]
+    assert spare == pytest.approx([150.0 - 30, 210.0 - 60])
+    assert warnings == []
+
+
+def test_pack_tasks_keeps_restricted_tasks_with_eligible_nurses():
+    assigned, _, _, warnings = pack_tasks(["Senior", "Junior"], [12.0, 0.0],
+                                          ["IV meds", "Post-ops"])
+    assert assigned == {0: ["Post-ops", "IV meds"]}
+    assert warnings == []
+
+
+def test_task_nobody_may_do_is_assigned_with_a_warning():
+    plan = plan_ward(JUNIORS, 6, 4, {"High": 0, "Moderate": 3, "Low": 3},
+                     tasks=[{"name": "IV meds", "count": 2}, "Bed baths"])
+    assert sum(len(e['tasks']) for e in plan.allocation.values()) == 3
+    assert any("IV meds ×2" in w and "Senior or Intermediate" in w for w in plan.warnings)
@@ -1,12 +1,111 @@
+import argparse
+import copy
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
-import csv
-import json
+from tkinter import ttk, messagebox, scrolledtext
+import os
 from datetime import datetime
-from typing import List, Dict, Tuple
-import math
-from collections import defaultdict
-import random
+import queue
+import threading
+
+from ward_planner import instrument
+from ward_planner.engine import (ACUITY_CATEGORIES, ALLOCATION_MODES, SKILL_LEVELS,
+                                 TASKS, check_ratio, split_acuity)
+from ward_planner.constants import DEFAULT_TASK_MINUTES, TASK_MINUTES
+from ward_planner.rosterview import RosterView
+
+# Only what the first paint needs is imported above. File dialogs, the
+# plan cache, the report renderer, exporters, the roster reader, the
+# incremental allocator, the history store and the what-if sweep are
+# imported where they are first used.
+
+# Roster import: how often the UI drains parsed rows, and how many rows it
+# adds to the list per drain so the window stays responsive
+IMPORT_POLL_MS = 50
+IMPORT_ROWS_PER_TICK = 20000
+# Report text inserted into a Text widget per event-loop turn
+REPORT_CHARS_PER_TICK = 20000
+# Generate: clicks closer together than this start one plan, not several;
+# and how often the UI checks for the worker's result
+GENERATE_DEBOUNCE_MS = 150
+GENERATE_POLL_MS = 30
+
+
+class VirtualNurseList:
+    # A Treeview that only ever holds one item per visible row. Scrolling,
+    # sorting and filtering rewrite those items from a RosterView, so redraw
+    # cost and widget memory stay flat however long the roster gets.
+    def __init__(self, parent, view, columns):
+        self.view = view
+        self.fields = [field for _, field in columns]
+        self.titles = {field: title for title, field in columns}
+        self.offset = 0
+        self.visible_rows = 8
+        self.items = []
+        
+        self.frame = tk.Frame(parent, bg='white')
+        self.tree = ttk.Treeview(self.frame, columns=self.fields, show='headings', height=8)
+        for title, field in columns:
+            self.tree.heading(field, text=title, command=lambda f=field: self.sort_by(f))
+            self.tree.column(field, width=150)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll)
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree.bind('<Configure>', self.on_resize)
+        self.tree.bind('<MouseWheel>', lambda e: self.scroll_to(self.offset + (-3 if e.delta > 0 else 3)))
+        self.tree.bind('<Button-4>', lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_to(self.offset + 3))
+        self.tree.bind('<Prior>', lambda e: self.scroll_to(self.offset - self.visible_rows))
+        self.tree.bind('<Next>', lambda e: self.scroll_to(self.offset + self.visible_rows))
+    
+    def on_resize(self, event):
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        # Leave room for the heading row
+        rows = max(1, (event.height - row_height - 5) // row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.refresh()
+    
+    def on_scroll(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.view)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.visible_rows
+            self.scroll_to(self.offset + step)
+    
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.refresh()
+    
+    def sort_by(self, field):
+        reverse = self.view.sort_column == field and not self.view.reverse
+        self.view.set_sort(field, reverse)
+        for f in self.fields:
+            arrow = (" ▼" if reverse else " ▲") if f == field else ""
+            self.tree.heading(f, text=self.titles[f] + arrow)
+        self.scroll_to(0)
+    
+    def refresh(self):
+        total = len(self.view)
+        self.offset = max(0, min(self.offset, total - self.visible_rows))
+        rows = self.view.window(self.offset, self.visible_rows)
+        
+        # Keep exactly one item per visible row
+        while len(self.items) < len(rows):
+            self.items.append(self.tree.insert('', tk.END, values=()))
+        while len(self.items) > len(rows):
+            self.tree.delete(self.items.pop())
+        
+        for item, nurse in zip(self.items, rows):
+            self.tree.item(item, values=[nurse[f] for f in self.fields])
+        
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(rows)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
 class WardShiftPlanner:
     def __init__(self, root):
@@ -18,12 +117,55 @@ class WardShiftPlanner:
         # Initialize data
         self.nurses = []
         self.patients = []
-        self.acuity_categories = ["High", "Moderate", "Low"]
-        self.skill_levels = ["Senior", "Intermediate", "Junior"]
-        self.tasks = ["Wound dressings", "Bed baths", "IV meds", "Post-ops", "Isolation cases"]
+        self.plan = None
+        self.plan_cache = None
+        self.history_path = None
+        self.report_time = None
+        self.report_token = 0
+        self.import_thread = None
+        self.import_reader = None
+        self.import_queue = None
+        self.import_cancel = None
+        self.import_error = None
+        self.generate_job = 0
+        self.generate_pending = None
+        self.generate_after = None
+        self.generate_thread = None
+        self.generate_run = None
+        self.generate_queue = queue.Queue()
+        self.acuity_categories = ACUITY_CATEGORIES
+        self.skill_levels = SKILL_LEVELS
+        self.tasks = TASKS
+        
+        # Inputs live in Tk variables made up front, so a tab that hasn't
+        # been opened yet (and has no widgets) still has its values
+        self.acuity_vars = {acuity: tk.StringVar(value="0") for acuity in self.acuity_categories}
+        self.task_vars = {task: tk.IntVar(value=1) for task in self.tasks}
+        self.task_count_vars = {task: tk.StringVar(value="1") for task in self.tasks}
+        self.fair_var = tk.IntVar(value=0)
+        self.notes_text = None
+        self.nurse_view = RosterView(self.nurses)
+        self.nurse_list = None
         
         self.create_widgets()
         
+        # Phase timings of each Generate go to a status bar when the app was
+        # started with --trace or --profile
+        metrics = instrument.recorder()
+        if metrics is not None:
+            self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, before=self.main_frame)
+            metrics.listeners.append(self.show_metrics)
+        
+    def create_plan_cache(self):
+        # Plans survive restarts in the user's cache folder; if it can't be
+        # created the cache just lives in memory
+        from ward_planner.cache import PlanCache, default_cache_dir
+        
+        try:
+            return PlanCache(directory=default_cache_dir())
+        except OSError:
+            return PlanCache()
+    
     def create_widgets(self):
         # Title
         title_frame = tk.Frame(self.root, bg='#2c3e50', height=80)
@@ -38,6 +180,11 @@ class WardShiftPlanner:
         # Main content frame
         main_frame = tk.Frame(self.root, bg='#f0f8ff')
         main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+        self.main_frame = main_frame
+        
+        # Instrumentation status bar, only packed when tracing
+        self.status_bar = tk.Label(self.root, text="", anchor=tk.W, font=('Courier', 9),
+                                   bg='#2c3e50', fg='white', padx=8)
         
         # Left panel - Inputs
         left_panel = tk.Frame(main_frame, bg='white', relief=tk.RAISED, bd=2)
@@ -47,29 +194,24 @@ class WardShiftPlanner:
         right_panel = tk.Frame(main_frame, bg='white', relief=tk.RAISED, bd=2)
         right_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
         
-        # Create notebook for tabs
+        # Create notebook for tabs. Each tab's widgets are built the first
+        # time it is selected, so startup only builds Basic Settings.
         notebook = ttk.Notebook(left_panel)
         notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Tab 1: Basic Settings
-        tab1 = ttk.Frame(notebook)
-        notebook.add(tab1, text="Basic Settings")
-        self.create_basic_settings_tab(tab1)
-        
-        # Tab 2: Nurse Management
-        tab2 = ttk.Frame(notebook)
-        notebook.add(tab2, text="Nurse Management")
-        self.create_nurse_management_tab(tab2)
-        
-        # Tab 3: Patient Acuity
-        tab3 = ttk.Frame(notebook)
-        notebook.add(tab3, text="Patient Acuity")
-        self.create_acuity_tab(tab3)
-        
-        # Tab 4: Tasks & Notes
-        tab4 = ttk.Frame(notebook)
-        notebook.add(tab4, text="Tasks & Notes")
-        self.create_tasks_tab(tab4)
+        self.tab_builders = {}
+        tabs = []
+        for text, builder in (("Basic Settings", self.create_basic_settings_tab),
+                              ("Nurse Management", self.create_nurse_management_tab),
+                              ("Patient Acuity", self.create_acuity_tab),
+                              ("Tasks & Notes", self.create_tasks_tab)):
+            tab = ttk.Frame(notebook)
+            notebook.add(tab, text=text)
+            self.tab_builders[str(tab)] = (tab, builder)
+            tabs.append(tab)
+        self.nurse_tab = tabs[1]
+        notebook.bind('<<NotebookTabChanged>>', lambda event: self.build_tab(notebook.select()))
+        self.build_tab(notebook.select())
         
         # Output area
         self.create_output_panel(right_panel)
@@ -97,17 +239,44 @@ class WardShiftPlanner:
         self.ratio_entry.pack(side=tk.LEFT)
         self.ratio_entry.insert(0, "6")
         
+        # Allocation mode
+        tk.Label(frame, text="Allocation Mode:", 
+                font=('Arial', 11, 'bold'), bg='white').grid(row=2, column=0, sticky=tk.W, pady=(0, 10))
+        self.mode_combo = ttk.Combobox(frame, values=ALLOCATION_MODES, width=12, state='readonly')
+        self.mode_combo.grid(row=2, column=1, sticky=tk.W, pady=(0, 10))
+        self.mode_combo.current(0)
+        
+        # Incremental re-allocation keeps patients with their current nurse
+        self.incremental_var = tk.IntVar(value=1)
+        tk.Checkbutton(frame, text="Keep previous allocation (only move patients when needed)",
+                      variable=self.incremental_var, bg='white',
+                      anchor=tk.W).grid(row=3, column=0, columnspan=2, sticky=tk.W)
+        
+        # Heavy patients go first to whoever carried least in the saved history
+        tk.Checkbutton(frame, text="Share out heavy patients fairly using the saved history",
+                      variable=self.fair_var, bg='white',
+                      anchor=tk.W).grid(row=4, column=0, columnspan=2, sticky=tk.W)
+        
         # Generate button
         generate_btn = tk.Button(frame, text="🔧 Generate Allocation", 
                                 font=('Arial', 11, 'bold'),
                                 bg='#3498db', fg='white',
                                 command=self.generate_allocation)
-        generate_btn.grid(row=2, column=0, columnspan=2, pady=20)
+        generate_btn.grid(row=5, column=0, columnspan=2, pady=20)
         
         # Validation info
         self.validation_label = tk.Label(frame, text="", 
                                         font=('Arial', 10), bg='white', fg='red')
-        self.validation_label.grid(row=3, column=0, columnspan=2)
+        self.validation_label.grid(row=6, column=0, columnspan=2)
+        
+        # Generation progress, only shown while a plan is being worked out
+        self.generate_frame = tk.Frame(frame, bg='white')
+        self.generate_progress = ttk.Progressbar(self.generate_frame, mode='indeterminate',
+                                                 length=200)
+        self.generate_progress.pack(side=tk.LEFT, padx=5)
+        tk.Label(self.generate_frame, text="Generating...", bg='white').pack(side=tk.LEFT, padx=5)
+        tk.Button(self.generate_frame, text="Cancel", 
+                 command=self.cancel_generation).pack(side=tk.LEFT, padx=5)
         
     def create_nurse_management_tab(self, parent):
         frame = tk.Frame(parent, bg='white')
@@ -134,18 +303,21 @@ class WardShiftPlanner:
         list_frame = tk.Frame(frame, bg='white')
         list_frame.pack(fill=tk.BOTH, expand=True)
         
-        tk.Label(list_frame, text="Nurses on Duty:", 
-                font=('Arial', 11, 'bold'), bg='white').pack(anchor=tk.W)
-        
-        # Treeview for nurses
-        columns = ('Name', 'Skill Level')
-        self.nurse_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
+        header_frame = tk.Frame(list_frame, bg='white')
+        header_frame.pack(fill=tk.X)
+        tk.Label(header_frame, text="Nurses on Duty:", 
+                font=('Arial', 11, 'bold'), bg='white').pack(side=tk.LEFT)
         
-        for col in columns:
-            self.nurse_tree.heading(col, text=col)
-            self.nurse_tree.column(col, width=150)
+        # Filter by name or skill
+        self.nurse_filter = tk.StringVar()
+        self.nurse_filter.trace_add('write', lambda *args: self.filter_nurses())
+        tk.Entry(header_frame, textvariable=self.nurse_filter, width=15).pack(side=tk.RIGHT)
+        tk.Label(header_frame, text="Filter:", bg='white').pack(side=tk.RIGHT, padx=(0, 5))
         
-        self.nurse_tree.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
+        # Virtualized list for nurses
+        self.nurse_list = VirtualNurseList(list_frame, self.nurse_view,
+                                           (('Name', 'name'), ('Skill Level', 'skill')))
+        self.nurse_list.frame.pack(fill=tk.BOTH, expand=True, pady=(5, 10))
         
         # Control buttons
         btn_frame = tk.Frame(frame, bg='white')
@@ -158,6 +330,27 @@ class WardShiftPlanner:
         tk.Button(btn_frame, text="Save to File", 
                  command=self.save_nurses_to_file).pack(side=tk.LEFT, padx=5)
         
+        # Import progress, only shown while a roster file is loading
+        self.import_frame = tk.Frame(frame, bg='white')
+        self.import_progress = ttk.Progressbar(self.import_frame, mode='determinate',
+                                               maximum=100, length=200)
+        self.import_progress.pack(side=tk.LEFT, padx=5)
+        self.import_label = tk.Label(self.import_frame, text="", bg='white')
+        self.import_label.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.import_frame, text="Cancel", 
+                 command=self.cancel_import).pack(side=tk.LEFT, padx=5)
+        
+    def build_tab(self, tab):
+        entry = self.tab_builders.pop(str(tab), None)
+        if entry is not None:
+            frame, builder = entry
+            builder(frame)
+    
+    def current_notes(self):
+        if self.notes_text is None:
+            return ""
+        return self.notes_text.get("1.0", tk.END).strip()
+    
     def create_acuity_tab(self, parent):
         frame = tk.Frame(parent, bg='white')
         frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -168,17 +361,17 @@ class WardShiftPlanner:
         acuity_frame = tk.Frame(frame, bg='white')
         acuity_frame.pack(fill=tk.X, pady=10)
         
-        self.acuity_vars = {}
         for i, acuity in enumerate(self.acuity_categories):
             tk.Label(acuity_frame, text=f"{acuity} Acuity:", bg='white').grid(row=i, column=0, sticky=tk.W, padx=(0, 10))
-            var = tk.StringVar(value="0")
-            self.acuity_vars[acuity] = var
+            var = self.acuity_vars[acuity]
             entry = tk.Entry(acuity_frame, textvariable=var, width=10)
             entry.grid(row=i, column=1, padx=(0, 20))
         
         # Auto-calculate button
         tk.Button(frame, text="Auto-calculate from Total", 
                  command=self.calculate_acuity).pack(pady=10)
+        tk.Button(frame, text="📈 What-if Staffing", 
+                 command=self.show_staffing_curve).pack()
         
         # Acuity explanation
         info_text = """High Acuity: Critically ill, frequent monitoring needed
@@ -196,13 +389,20 @@ Low Acuity: Mostly independent, minimal intervention"""
         tk.Label(frame, text="Tasks to Distribute:", 
                 font=('Arial', 11, 'bold'), bg='white').pack(anchor=tk.W)
         
-        self.task_vars = {}
+        # How many of each task this shift; they go to whoever has the most
+        # time left after their patients
+        task_frame = tk.Frame(frame, bg='white')
+        task_frame.pack(fill=tk.X)
         for i, task in enumerate(self.tasks):
-            var = tk.IntVar(value=1)
-            self.task_vars[task] = var
-            cb = tk.Checkbutton(frame, text=task, variable=var, 
+            var = self.task_vars[task]
+            cb = tk.Checkbutton(task_frame, text=task, variable=var, 
                                bg='white', anchor=tk.W)
-            cb.pack(fill=tk.X, pady=2)
+            cb.grid(row=i, column=0, sticky=tk.W, pady=2)
+            tk.Spinbox(task_frame, from_=1, to=999, width=4,
+                      textvariable=self.task_count_vars[task]).grid(row=i, column=1, padx=5)
+            minutes = TASK_MINUTES.get(task, DEFAULT_TASK_MINUTES)
+            tk.Label(task_frame, text=f"× {minutes} min", bg='white',
+                    fg='#555').grid(row=i, column=2, sticky=tk.W)
         
         # Notes section
         tk.Label(frame, text="Shift Notes:", 
@@ -236,6 +436,8 @@ Low Acuity: Mostly independent, minimal intervention"""
                  command=self.export_to_csv).pack(side=tk.LEFT, padx=5)
         tk.Button(export_frame, text="🖨️ Print Preview", 
                  command=self.print_preview).pack(side=tk.LEFT, padx=5)
+        tk.Button(export_frame, text="🗄️ Save to History", 
+                 command=self.save_to_history).pack(side=tk.LEFT, padx=5)
         
     def add_nurse(self):
         name = self.nurse_name_entry.get().strip()
@@ -246,59 +448,146 @@ Low Acuity: Mostly independent, minimal intervention"""
             return
         
         self.nurses.append({"name": name, "skill": skill})
-        self.nurse_tree.insert('', tk.END, values=(name, skill))
+        self.nurse_list.refresh()
         self.nurse_name_entry.delete(0, tk.END)
         
     def clear_nurses(self):
+        # Swapping in a new list is O(1); the view only ever holds the
+        # visible rows, so there is nothing to delete item by item
         self.nurses = []
-        for item in self.nurse_tree.get_children():
-            self.nurse_tree.delete(item)
+        self.nurse_view.set_store(self.nurses)
+        if self.nurse_list is not None:
+            self.nurse_list.scroll_to(0)
+    
+    def filter_nurses(self):
+        self.nurse_view.set_filter(self.nurse_filter.get())
+        self.nurse_list.scroll_to(0)
     
     def load_nurses_from_file(self):
+        if self.import_thread is not None:
+            return
+        
+        from tkinter import filedialog
+        
         file_path = filedialog.askopenfilename(
             title="Select nurse file",
-            filetypes=[("Text files", "*.txt"), ("CSV files", "*.csv"), ("All files", "*.*")]
+            filetypes=[("Text files", "*.txt"), ("CSV files", "*.csv"),
+                       ("JSON files", "*.json"), ("All files", "*.*")]
         )
         
         if file_path:
-            try:
-                self.clear_nurses()
-                with open(file_path, 'r') as f:
-                    for line in f:
-                        if ',' in line:
-                            parts = line.strip().split(',')
-                            if len(parts) >= 2:
-                                name, skill = parts[0], parts[1]
-                                if skill not in self.skill_levels:
-                                    skill = "Intermediate"
-                        else:
-                            name = line.strip()
-                            skill = "Intermediate"
-                        
-                        if name:
-                            self.nurses.append({"name": name, "skill": skill})
-                            self.nurse_tree.insert('', tk.END, values=(name, skill))
-                
-                messagebox.showinfo("Success", f"Loaded {len(self.nurses)} nurses from file")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load file: {str(e)}")
+            self.start_import(file_path)
+    
+    def start_import(self, file_path):
+        from ward_planner.roster import RosterReader
+        
+        # The progress bar lives on the nurse tab
+        self.build_tab(self.nurse_tab)
+        try:
+            reader = RosterReader(file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to load file: {str(e)}")
+            return
+        
+        # Parse on a background thread; rows come back through a queue and
+        # are added to the list in batches from after() callbacks
+        self.clear_nurses()
+        self.import_reader = reader
+        self.import_queue = queue.Queue()
+        self.import_cancel = threading.Event()
+        self.import_error = None
+        self.import_thread = threading.Thread(
+            target=self.read_roster, args=(reader, self.import_queue, self.import_cancel),
+            daemon=True)
+        
+        self.import_progress['value'] = 0
+        self.import_label.config(text="Loading...")
+        self.import_frame.pack(fill=tk.X, pady=(5, 0))
+        self.import_thread.start()
+        self.root.after(IMPORT_POLL_MS, self.poll_import)
+    
+    def read_roster(self, reader, batches, cancel):
+        # Runs on the import thread and never touches Tk
+        import csv
+        
+        try:
+            for batch in reader:
+                if cancel.is_set():
+                    break
+                batches.put(batch)
+        except (OSError, ValueError, csv.Error) as e:
+            batches.put(e)
+        batches.put(None)
+    
+    def poll_import(self):
+        done = False
+        rows = 0
+        try:
+            while rows < IMPORT_ROWS_PER_TICK:
+                batch = self.import_queue.get_nowait()
+                if batch is None:
+                    done = True
+                    break
+                if isinstance(batch, Exception):
+                    self.import_error = batch
+                    continue
+                if self.import_cancel.is_set():
+                    continue
+                self.nurses.extend(batch)
+                rows += len(batch)
+        except queue.Empty:
+            pass
+        
+        if rows and self.nurse_list is not None:
+            self.nurse_list.refresh()
+        self.import_progress['value'] = self.import_reader.progress * 100
+        self.import_label.config(text=f"{len(self.nurses)} nurses ({self.import_reader.progress:.0%})")
+        
+        if done:
+            self.finish_import()
+        else:
+            self.root.after(IMPORT_POLL_MS, self.poll_import)
+    
+    def cancel_import(self):
+        if self.import_cancel is not None:
+            self.import_cancel.set()
+            self.import_label.config(text="Cancelling...")
+    
+    def finish_import(self):
+        reader = self.import_reader
+        cancelled = self.import_cancel.is_set()
+        error = self.import_error
+        self.import_thread = self.import_reader = self.import_queue = None
+        self.import_cancel = self.import_error = None
+        self.import_frame.pack_forget()
+        
+        if error is not None:
+            messagebox.showerror("Error", f"Failed to load file: {str(error)}")
+        elif cancelled:
+            messagebox.showinfo("Cancelled", f"Import cancelled after {len(self.nurses)} nurses")
+        else:
+            message = f"Loaded {len(self.nurses)} nurses from file"
+            if reader.fixed_skills:
+                message += f" ({reader.fixed_skills} unknown skill levels set to Intermediate)"
+            messagebox.showinfo("Success", message)
     
     def save_nurses_to_file(self):
         if not self.nurses:
             messagebox.showwarning("Warning", "No nurses to save")
             return
         
+        from tkinter import filedialog
+        from ward_planner.roster import save_roster
+        
         file_path = filedialog.asksaveasfilename(
             title="Save nurses to file",
             defaultextension=".txt",
-            filetypes=[("Text files", "*.txt"), ("CSV files", "*.csv")]
+            filetypes=[("Text files", "*.txt"), ("CSV files", "*.csv"), ("JSON files", "*.json")]
         )
         
         if file_path:
             try:
-                with open(file_path, 'w') as f:
-                    for nurse in self.nurses:
-                        f.write(f"{nurse['name']},{nurse['skill']}\n")
+                save_roster(file_path, self.nurses)
                 messagebox.showinfo("Success", "Nurses saved successfully")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to save file: {str(e)}")
@@ -306,222 +595,316 @@ Low Acuity: Mostly independent, minimal intervention"""
     def calculate_acuity(self):
         try:
             total = int(self.patient_entry.get())
-            
-            # Simple distribution: 20% high, 50% moderate, 30% low
-            high = int(total * 0.2)
-            moderate = int(total * 0.5)
-            low = total - high - moderate
-            
-            self.acuity_vars["High"].set(str(high))
-            self.acuity_vars["Moderate"].set(str(moderate))
-            self.acuity_vars["Low"].set(str(low))
+            for acuity, count in split_acuity(total).items():
+                self.acuity_vars[acuity].set(str(count))
         except ValueError:
             messagebox.showwarning("Warning", "Please enter a valid total number of patients")
     
-    def validate_ratio(self):
+    def show_staffing_curve(self):
+        # Nurses needed from half to one and a half times today's census,
+        # over every acuity mix in 10% steps (and the one entered), at the
+        # current ratio with the current roster's skill mix
         try:
-            total_patients = int(self.patient_entry.get())
+            total = int(self.patient_entry.get())
             ratio = int(self.ratio_entry.get())
-            required_nurses = math.ceil(total_patients / ratio)
-            
-            if len(self.nurses) < required_nurses:
-                self.validation_label.config(
-                    text=f"⚠️ Unsafe staffing: You need at least {required_nurses} nurses for a 1:{ratio} ratio."
-                )
-                return False
-            else:
-                self.validation_label.config(text="✓ Staffing ratio is safe")
-                return True
+            counts = [int(self.acuity_vars[a].get() or 0) for a in self.acuity_categories]
+        except ValueError:
+            messagebox.showwarning("Warning", "Please enter valid numbers")
+            return
+        
+        try:
+            from ward_planner.scenarios import simplex_grid, sweep
+        except ImportError as e:
+            messagebox.showerror("Error", f"What-if staffing needs NumPy: {str(e)}")
+            return
+        
+        mixes = simplex_grid(0.1)
+        if sum(counts) > 0:
+            mixes.append(tuple(counts))
+        skill_mix = None
+        if self.nurses:
+            skill_mix = [tuple(sum(1 for n in self.nurses if n['skill'] == skill)
+                               for skill in self.skill_levels)]
+        try:
+            result = sweep(range(total // 2, total + total // 2 + 1), mixes,
+                           [(ratio, ratio, ratio)], skill_mix)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("What-if Staffing")
+        window.geometry("700x500")
+        
+        text_widget = scrolledtext.ScrolledText(window, font=('Courier', 10))
+        text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        text_widget.insert(tk.END, f"Nurses needed at 1:{ratio} over {len(mixes)} acuity mixes"
+                                   f" ({len(result)} scenarios)\n"
+                                   "Short: share of mixes without enough senior or"
+                                   " high-acuity-eligible nurses\n\n")
+        text_widget.insert(tk.END, result.format_curve())
+        text_widget.config(state=tk.DISABLED)
+        
+        buttons = tk.Frame(window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="📊 Export to CSV", 
+                 command=lambda: self.export_sweep(result)).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Close", command=window.destroy).pack(side=tk.LEFT, padx=5)
+    
+    def export_sweep(self, result):
+        from tkinter import filedialog
+        from ward_planner.scenarios import write_sweep
+        
+        file_path = filedialog.asksaveasfilename(
+            title="Export What-if Scenarios",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            rows = write_sweep(result, file_path)
+            messagebox.showinfo("Success", f"Exported {rows} scenarios to {file_path}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export: {str(e)}")
+    
+    def validate_ratio(self):
+        try:
+            with instrument.span("validate"):
+                total_patients = int(self.patient_entry.get())
+                ratio = int(self.ratio_entry.get())
+                safe, message = check_ratio(total_patients, ratio, len(self.nurses))
         except ValueError:
             self.validation_label.config(text="Please enter valid numbers")
             return False
+        
+        self.validation_label.config(text=message)
+        return safe
     
     def generate_allocation(self):
+        run = instrument.start_run("generate")
         if not self.validate_ratio():
-            if not messagebox.askyesno("Warning", "Staffing ratio may be unsafe. Continue anyway?"):
+            with instrument.span("confirm"):
+                confirmed = messagebox.askyesno("Warning", "Staffing ratio may be unsafe. Continue anyway?")
+            if not confirmed:
+                run.finish()
                 return
         
         if not self.nurses:
+            run.finish()
             messagebox.showwarning("Warning", "Please add at least one nurse")
             return
         
         try:
-            total_patients = int(self.patient_entry.get())
-            
-            # Create patient list with acuity
-            patients = []
-            acuity_counts = {}
-            
-            for acuity in self.acuity_categories:
-                count = int(self.acuity_vars[acuity].get() or 0)
-                acuity_counts[acuity] = count
-                patients.extend([{"id": i+1, "acuity": acuity} 
-                               for i in range(len(patients), len(patients) + count)])
-            
-            # Adjust if total doesn't match
-            if len(patients) != total_patients:
-                messagebox.showwarning("Warning", 
-                    f"Acuity distribution ({len(patients)}) doesn't match total patients ({total_patients}). Adjusting...")
-                while len(patients) < total_patients:
-                    patients.append({"id": len(patients)+1, "acuity": "Moderate"})
-                patients = patients[:total_patients]
-            
-            # Distribute patients to nurses
-            allocation = self.distribute_patients(patients, self.nurses)
-            
-            # Generate output
-            self.display_allocation(allocation, acuity_counts)
+            acuity_counts = {acuity: int(self.acuity_vars[acuity].get() or 0)
+                             for acuity in self.acuity_categories}
+            selected_tasks = []
+            for task, var in self.task_vars.items():
+                if var.get() != 1:
+                    continue
+                count = int(self.task_count_vars[task].get() or 1)
+                selected_tasks.append(task if count == 1 else {"name": task, "count": count})
             
+            # The worker gets its own copy of the roster, which may change
+            # while it runs
+            inputs = dict(nurses=list(self.nurses),
+                          total_patients=int(self.patient_entry.get()),
+                          ratio=int(self.ratio_entry.get()),
+                          acuity_counts=acuity_counts,
+                          tasks=selected_tasks,
+                          notes=self.current_notes())
         except ValueError as e:
+            run.finish()
             messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+        
+        mode = self.mode_combo.get()
+        previous = None
+        # Only balanced plans are kept incrementally (see incremental.replan);
+        # optimal and contiguous always plan afresh
+        if (self.incremental_var.get() and self.plan is not None and self.plan.mode == mode
+                and mode == "balanced"):
+            previous = self.plan
+        fair = bool(self.fair_var.get()) and previous is None
+        
+        # Planning runs on a worker thread. Repeated clicks within the
+        # debounce window collapse into the last one, and only the newest
+        # request's plan is ever shown.
+        self.generate_job += 1
+        self.generate_pending = (self.generate_job, mode, inputs, previous, fair, run)
+        if self.generate_after is not None:
+            self.root.after_cancel(self.generate_after)
+        self.generate_after = self.root.after(GENERATE_DEBOUNCE_MS, self.start_generation)
+        if not self.generate_frame.grid_info():
+            self.generate_frame.grid(row=7, column=0, columnspan=2, pady=(10, 0))
+            self.generate_progress.start(15)
     
-    def distribute_patients(self, patients, nurses):
-        # Sort nurses by skill (Senior first)
-        sorted_nurses = sorted(nurses, 
-                              key=lambda x: self.skill_levels.index(x['skill']))
-        
-        # Group patients by acuity
-        high_acuity = [p for p in patients if p['acuity'] == 'High']
-        moderate_acuity = [p for p in patients if p['acuity'] == 'Moderate']
-        low_acuity = [p for p in patients if p['acuity'] == 'Low']
-        
-        # Initialize allocation
-        allocation = {nurse['name']: {
-            'nurse': nurse,
-            'patients': [],
-            'tasks': [],
-            'justification': ''
-        } for nurse in sorted_nurses}
-        
-        nurse_names = list(allocation.keys())
-        nurse_index = 0
-        
-        # Distribute high acuity patients first (to senior nurses)
-        for patient in high_acuity:
-            # Find next available nurse (wrap around if needed)
-            for _ in range(len(nurse_names)):
-                current_nurse = nurse_names[nurse_index % len(nurse_names)]
-                allocation[current_nurse]['patients'].append(patient)
-                nurse_index += 1
-                break
+    def start_generation(self):
+        self.generate_after = None
+        if self.generate_thread is not None or self.generate_pending is None:
+            # The running job starts the pending one when it comes back
+            return
         
-        # Distribute moderate acuity
-        for patient in moderate_acuity:
-            current_nurse = nurse_names[nurse_index % len(nurse_names)]
-            allocation[current_nurse]['patients'].append(patient)
-            nurse_index += 1
-        
-        # Distribute low acuity
-        for patient in low_acuity:
-            current_nurse = nurse_names[nurse_index % len(nurse_names)]
-            allocation[current_nurse]['patients'].append(patient)
-            nurse_index += 1
-        
-        # Add justification
-        for nurse_name, data in allocation.items():
-            patient_count = len(data['patients'])
-            acuity_dist = {}
-            for p in data['patients']:
-                acuity_dist[p['acuity']] = acuity_dist.get(p['acuity'], 0) + 1
-            
-            justification = f"Assigned {patient_count} patients"
-            if acuity_dist:
-                acuity_desc = ', '.join([f"{v} {k.lower()}" for k, v in acuity_dist.items()])
-                justification += f" ({acuity_desc})"
-            
-            skill = data['nurse']['skill']
-            if skill == 'Senior' and acuity_dist.get('High', 0) > 0:
-                justification += f". Senior nurse assigned high-acuity patients."
-            elif skill == 'Junior' and acuity_dist.get('High', 0) == 0:
-                justification += f". Junior nurse assigned appropriate lower-acuity patients."
-            
-            data['justification'] = justification
-        
-        return allocation
-    
-    def display_allocation(self, allocation, acuity_counts):
-        output = "=" * 60 + "\n"
-        output += "WARD SHIFT ALLOCATION REPORT\n"
-        output += f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
-        output += "=" * 60 + "\n\n"
-        
-        # Summary
-        output += "📊 SUMMARY\n"
-        output += f"Total Patients: {sum(acuity_counts.values())}\n"
-        output += f"Nurses on Duty: {len(allocation)}\n"
-        output += f"Patient Acuity: {acuity_counts}\n\n"
-        
-        # Individual allocations
-        for nurse_name, data in allocation.items():
-            output += f"\n{'='*40}\n"
-            output += f"👩⚕️ NURSE: {nurse_name}\n"
-            output += f"📋 Skill Level: {data['nurse']['skill']}\n"
-            output += f"🛌 Patients Assigned: {len(data['patients'])}\n"
-            
-            # Group patients by bed ranges
-            if data['patients']:
-                patient_ids = sorted([p['id'] for p in data['patients']])
-                # Create bed ranges
-                ranges = []
-                start = end = patient_ids[0]
-                
-                for pid in patient_ids[1:]:
-                    if pid == end + 1:
-                        end = pid
-                    else:
-                        ranges.append((start, end))
-                        start = end = pid
-                ranges.append((start, end))
-                
-                bed_ranges = ', '.join([f"{s}-{e}" if s != e else str(s) for s, e in ranges])
-                output += f"📍 Bed Assignment: {bed_ranges}\n"
-            
-            # Acuity breakdown
-            acuity_summary = {}
-            for p in data['patients']:
-                acuity_summary[p['acuity']] = acuity_summary.get(p['acuity'], 0) + 1
-            
-            if acuity_summary:
-                output += f"📈 Acuity Breakdown: {acuity_summary}\n"
-            
-            # Justification
-            output += f"💡 {data['justification']}\n"
-        
-        # Tasks distribution (simplified)
-        output += "\n\n📝 TASKS DISTRIBUTION\n"
-        output += "-" * 40 + "\n"
-        
-        # Distribute selected tasks
-        selected_tasks = [task for task, var in self.task_vars.items() if var.get() == 1]
-        if selected_tasks:
-            for i, task in enumerate(selected_tasks):
-                nurse_idx = i % len(allocation)
-                nurse_name = list(allocation.keys())[nurse_idx]
-                allocation[nurse_name]['tasks'].append(task)
-        
-        for nurse_name, data in allocation.items():
-            if data['tasks']:
-                output += f"\n{nurse_name}: {', '.join(data['tasks'])}"
-        
-        # Shift notes
-        notes = self.notes_text.get("1.0", tk.END).strip()
-        if notes:
-            output += "\n\n📋 SHIFT NOTES\n"
-            output += "-" * 40 + "\n"
-            output += notes
-        
-        output += "\n\n" + "=" * 60
-        output += "\n⚠️ REMINDER: This is a planning tool. Always use clinical judgment."
+        job, mode, inputs, previous, fair, run = self.generate_pending
+        self.generate_pending = None
+        if self.plan_cache is None:
+            self.plan_cache = self.create_plan_cache()
+        history_path = self.get_history_path() if fair else None
+        self.generate_run = run
+        if previous is not None:
+            # replan works in place; the plan on screen must stay intact
+            previous = copy.deepcopy(previous)
+        self.generate_thread = threading.Thread(
+            target=self.plan_in_background,
+            args=(job, mode, inputs, previous, history_path, run), daemon=True)
+        self.generate_thread.start()
+        self.root.after(GENERATE_POLL_MS, self.poll_generation)
+    
+    def read_history(self, path, nurses):
+        # Runs on the generate thread: SQLite connections stay on the thread
+        # that opened them
+        import sqlite3
+        from ward_planner.store import Store
+        
+        try:
+            with Store(path) as store:
+                return store.recent_load(nurses)
+        except (OSError, sqlite3.Error) as e:
+            raise OSError(f"Could not read the history in {path}: {e}") from e
+    
+    def plan_in_background(self, job, mode, inputs, previous, history_path=None,
+                           run=instrument.NULL_RUN):
+        # Runs on the generate thread and never touches Tk. With --profile,
+        # run's profiler only covers the Tk thread, so this one is profiled
+        # into it separately. Every failure is posted back, since an
+        # exception here would otherwise leave the progress bar up for good.
+        try:
+            with run.profile_thread():
+                if previous is not None:
+                    from ward_planner.incremental import replan
+                    plan = replan(previous, **inputs)
+                else:
+                    history = None
+                    if history_path is not None:
+                        history = self.read_history(history_path, inputs["nurses"])
+                    plan = self.plan_cache.plan(mode=mode, history=history, **inputs)
+        except Exception as e:
+            self.generate_queue.put((job, mode, None, e))
+        else:
+            self.generate_queue.put((job, mode, plan, None))
+    
+    def poll_generation(self):
+        try:
+            job, mode, plan, error = self.generate_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(GENERATE_POLL_MS, self.poll_generation)
+            return
         
+        self.generate_thread = None
+        run = self.generate_run
+        self.generate_run = None
+        if job != self.generate_job:
+            # Cancelled or superseded: drop it, and start the newest request
+            # unless its debounce timer will
+            run.finish()
+            if self.generate_after is None:
+                self.start_generation()
+            return
+        
+        self.hide_generation_progress()
+        if isinstance(error, ImportError):
+            run.finish()
+            messagebox.showerror("Error", f"{mode} mode is unavailable: {str(error)}")
+            return
+        if isinstance(error, OSError):
+            run.finish()
+            messagebox.showerror("Error", str(error))
+            return
+        if isinstance(error, ValueError):
+            run.finish()
+            messagebox.showerror("Error", f"Invalid input: {str(error)}")
+            return
+        if error is not None:
+            run.finish()
+            messagebox.showerror("Error", f"Planning failed: {error!r}")
+            return
+        
+        for warning in plan.warnings:
+            messagebox.showwarning("Warning", warning)
+        
+        self.display_allocation(plan, run)
+    
+    def cancel_generation(self):
+        # A running plan can't be interrupted; bumping the job number makes
+        # its result stale so it is dropped when it arrives
+        self.generate_job += 1
+        self.generate_pending = None
+        if self.generate_after is not None:
+            self.root.after_cancel(self.generate_after)
+            self.generate_after = None
+        self.hide_generation_progress()
+    
+    def hide_generation_progress(self):
+        self.generate_progress.stop()
+        self.generate_frame.grid_forget()
+    
+    def display_allocation(self, plan, run=instrument.NULL_RUN):
+        # run, if instrumented, ends once the whole report is on screen
+        self.plan = plan
+        self.report_time = datetime.now()
+        self.report_token += 1
         self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(1.0, output)
+        self.stream_report(self.output_text, self.report_sections(), on_done=run.finish,
+                           token=self.report_token)
+    
+    def show_metrics(self, record):
+        spans = "  ".join(f"{name} {seconds * 1000:.1f}" for name, seconds in record["spans"].items())
+        counters = "  ".join(f"{name} {value}" for name, value in record["counters"].items())
+        text = f"{record['run']} {record['seconds'] * 1000:.1f} ms | {spans}"
+        if counters:
+            text += f" | {counters}"
+        if record.get("profile"):
+            text += f" | {os.path.basename(record['profile'])}"
+        self.status_bar.config(text=text)
+    
+    def report_sections(self):
+        # The same generator feeds the output panel, TXT export and preview
+        from ward_planner.report import iter_report
+        
+        return iter_report(self.plan, self.report_time)
+    
+    def stream_report(self, widget, sections, on_done=None, token=None):
+        # Insert a bounded amount of text per event-loop turn so long reports
+        # appear progressively; a newer report (token) supersedes this one
+        if token is not None and token != self.report_token:
+            return
+        if not widget.winfo_exists():
+            return
+        
+        written = 0
+        while True:
+            with instrument.span("render"):
+                section = next(sections, None)
+            if section is None:
+                break
+            with instrument.span("insert"):
+                widget.insert(tk.END, section)
+            written += len(section)
+            if written >= REPORT_CHARS_PER_TICK:
+                self.root.after(1, self.stream_report, widget, sections, on_done, token)
+                return
+        
+        if on_done is not None:
+            on_done()
     
     def export_to_txt(self):
-        content = self.output_text.get(1.0, tk.END)
-        if not content.strip():
+        if self.plan is None:
             messagebox.showwarning("Warning", "No allocation to export")
             return
         
+        from tkinter import filedialog
+        from ward_planner.report import write_report
+        
         file_path = filedialog.asksaveasfilename(
             title="Export allocation",
             defaultextension=".txt",
@@ -531,44 +914,102 @@ Low Acuity: Mostly independent, minimal intervention"""
         if file_path:
             try:
                 with open(file_path, 'w') as f:
-                    f.write(content)
+                    write_report(self.plan, f, self.report_time)
                 messagebox.showinfo("Success", f"Allocation exported to {file_path}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to export: {str(e)}")
     
     def export_to_csv(self):
-        # This would export structured data for analysis
+        # Structured export, one row per bed, for analysis
+        if self.plan is None:
+            messagebox.showwarning("Warning", "No allocation to export")
+            return
+        
+        from tkinter import filedialog
+        from ward_planner.export import export_plans
+        
         file_path = filedialog.asksaveasfilename(
             title="Export to CSV",
             defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            confirmoverwrite=False,
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines files", "*.jsonl"), ("All files", "*.*")]
         )
         
-        if file_path:
-            try:
-                # In a real implementation, you would export the structured data
-                messagebox.showinfo("Info", "CSV export would be implemented with structured data")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to export: {str(e)}")
+        if not file_path:
+            return
+        
+        # Existing files are usually a running history across shifts
+        append = False
+        if os.path.exists(file_path) and os.path.getsize(file_path):
+            append = messagebox.askyesnocancel(
+                "Export", "Append this shift to the existing file?\n(No overwrites it)")
+            if append is None:
+                return
+        
+        try:
+            rows = export_plans([self.plan], file_path, append=append,
+                                planned_at=self.report_time)
+            messagebox.showinfo("Success", f"Exported {rows} rows to {file_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export: {str(e)}")
+    
+    def get_history_path(self):
+        if self.history_path is None:
+            from ward_planner.store import default_history_path
+            self.history_path = default_history_path()
+        return self.history_path
+    
+    def save_to_history(self):
+        # Records this shift in the history database that fair allocation
+        # and workload queries read
+        if self.plan is None:
+            messagebox.showwarning("Warning", "No allocation to save")
+            return
+        
+        import sqlite3
+        from ward_planner.store import Store
+        
+        try:
+            with Store(self.get_history_path()) as store:
+                store.record_plan(self.plan, self.report_time.date(), self.report_time)
+            messagebox.showinfo("Success", f"Saved this shift to {self.history_path}")
+        except (OSError, sqlite3.Error) as e:
+            messagebox.showerror("Error", f"Failed to save: {str(e)}")
     
     def print_preview(self):
         # Simple print preview
-        content = self.output_text.get(1.0, tk.END)
+        if self.plan is None:
+            messagebox.showwarning("Warning", "No allocation to preview")
+            return
+        
         preview_window = tk.Toplevel(self.root)
         preview_window.title("Print Preview")
         preview_window.geometry("800x600")
         
         text_widget = scrolledtext.ScrolledText(preview_window, font=('Courier', 10))
         text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        text_widget.insert(1.0, content)
-        text_widget.config(state=tk.DISABLED)
+        self.stream_report(text_widget, self.report_sections(),
+                           on_done=lambda: text_widget.config(state=tk.DISABLED))
         
         tk.Button(preview_window, text="Close", 
                  command=preview_window.destroy).pack(pady=10)
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ward Shift Planner")
+    parser.add_argument("--trace", nargs="?", const="", metavar="FILE",
+                        help="show phase timings of each Generate in a status bar, "
+                             "and append them to FILE as JSON lines if given")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="also profile each Generate with cProfile into DIR")
+    args = parser.parse_args(argv)
+    if args.trace is not None or args.profile:
+        instrument.enable(args.trace or None, args.profile)
+    
+    # With --trace, a "startup" run times window creation to first paint
+    run = instrument.start_run("startup")
     root = tk.Tk()
     app = WardShiftPlanner(root)
+    root.after_idle(run.finish)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+from .engine import (
+    ACUITY_CATEGORIES,
+    SKILL_LEVELS,
+    TASKS,
+    WardPlan,
+    check_ratio,
+    distribute_patients,
+    plan_ward,
+    required_nurses,
+)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from .constants import ACUITY_CATEGORIES, ACUITY_WEIGHTS, SKILL_FACTORS
+from .engine import normalize_nurses, plan_ward, split_acuity
+
+# Bump when WardPlan or the allocators change shape or results, so plans
+# stored by an older version are never served
+CACHE_VERSION = 5
+
+# What a stale or damaged cache file can raise while being unpickled
+CACHE_ERRORS = (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+                ImportError, IndexError, TypeError, ValueError)
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "ward_planner")
+
+
+def plan_key(nurses, total_patients, ratio, acuity_counts=None, tasks=(),
+             acuity_weights=None, skill_factors=None, mode="balanced", history=None,
+             layout=None, beds=None):
+    # Stable hash of the allocation inputs, normalised the way plan_ward
+    # normalises them so equivalent inputs share a key. Nurse and task order
+    # are kept: both decide who gets what.
+    total_patients = int(total_patients)
+    if acuity_counts is None:
+        acuity_counts = split_acuity(total_patients)
+    inputs = {
+        "version": CACHE_VERSION,
+        "nurses": [[n['name'], n['skill']] for n in normalize_nurses(nurses)],
+        "total_patients": total_patients,
+        "ratio": int(ratio),
+        "acuity": [int(acuity_counts.get(a) or 0) for a in ACUITY_CATEGORIES],
+        "tasks": list(tasks),
+        "acuity_weights": {**ACUITY_WEIGHTS, **(acuity_weights or {})},
+        "skill_factors": {**SKILL_FACTORS, **(skill_factors or {})},
+        "mode": mode,
+    }
+    if history:
+        # Only keyed when given, so plans without history keep their keys
+        inputs["history"] = sorted(history.items())
+    if layout is not None:
+        inputs["layout"] = layout
+    if beds is not None:
+        inputs["beds"] = sorted((int(bed), acuity) for bed, acuity in beds.items())
+    data = json.dumps(inputs, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class PlanCache:
+    # Memoizes plan_ward on plan_key. Plans are held pickled, so callers can
+    # change the plan they get back (replan does) without touching the cache.
+    # The newest max_entries live in memory in LRU order; with a directory
+    # every plan is also written there as <key>.pickle and the oldest files
+    # beyond max_disk_entries are removed. Only point directory at a folder
+    # you trust: entries are unpickled.
+    def __init__(self, max_entries=128, directory=None, max_disk_entries=4096):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_writes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def _remember(self, key, data):
+        self.entries[key] = data
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            plan = pickle.loads(data)
+            os.utime(path)
+        except FileNotFoundError:
+            return None, None
+        except CACHE_ERRORS:
+            # Corrupt or from an incompatible version: drop it and replan
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, None
+        return data, plan
+
+    def _write_disk(self, key, data):
+        # Write then rename, so a reader never sees half a file
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self.disk_writes += 1
+        if self.disk_writes % 64 == 0:
+            self.prune_disk()
+
+    def prune_disk(self):
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith(".pickle")]
+            if len(paths) <= self.max_disk_entries:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.max_disk_entries]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return pickle.loads(data)
+        if self.directory:
+            data, plan = self._read_disk(key)
+            if plan is not None:
+                self._remember(key, data)
+                self.hits += 1
+                self.disk_hits += 1
+                return plan
+        self.misses += 1
+        return None
+
+    def put(self, key, plan):
+        data = pickle.dumps(plan, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, data)
+        if self.directory:
+            self._write_disk(key, data)
+
+    def plan(self, nurses, total_patients, ratio, acuity_counts=None, tasks=(),
+             ward="", notes="", acuity_weights=None, skill_factors=None,
+             mode="balanced", shift="", history=None, layout=None, beds=None):
+        # Drop-in for engine.plan_ward. Ward, notes and shift don't change the
+        # allocation, so they aren't keyed and are set on every plan returned
+        key = plan_key(nurses, total_patients, ratio, acuity_counts, tasks,
+                       acuity_weights, skill_factors, mode, history, layout, beds)
+        plan = self.get(key)
+        if plan is None:
+            plan = plan_ward(nurses, total_patients, ratio, acuity_counts, tasks,
+                             acuity_weights=acuity_weights, skill_factors=skill_factors,
+                             mode=mode, history=history, layout=layout, beds=beds)
+            self.put(key, plan)
+        plan.ward = ward
+        plan.notes = notes
+        plan.shift = shift
+        return plan
+
+    def clear(self, disk=False):
+        self.entries.clear()
+        if disk and self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
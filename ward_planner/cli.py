@@ -0,0 +1,461 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date
+
+from . import instrument
+from .engine import ACUITY_CATEGORIES, ALLOCATION_MODES
+from .export import export_plans
+from .hospital import plan_wards, summarize
+from .report import write_report
+from .wardfile import iter_ward_files, load_rota_spec
+
+
+def write_plan(plan, out_dir, fmt):
+    os.makedirs(out_dir, exist_ok=True)
+    name = plan.label.replace("/", "_")
+    if fmt == "json":
+        with open(os.path.join(out_dir, f"{name}.json"), 'w') as f:
+            json.dump(plan.to_dict(), f, indent=2)
+    else:
+        with open(os.path.join(out_dir, f"{name}.txt"), 'w') as f:
+            write_report(plan, f)
+
+
+def open_store(path):
+    # Imported here so runs without --db don't load sqlite3
+    from .store import Store
+    return Store(path)
+
+
+def cmd_plan(args):
+    started = time.perf_counter()
+    results = []
+
+    store = open_store(args.db) if args.db else None
+    history = None
+    if store and args.fair_days:
+        history = store.recent_load(days=args.fair_days, until=args.day)
+
+    trace = bool(args.trace or args.profile)
+    for result in plan_wards(iter_ward_files(args.directory), args.mode,
+                             workers=args.workers, serial=args.serial,
+                             cache_dir=args.cache, trace=trace, profile_dir=args.profile,
+                             history=history):
+        results.append(result)
+        if not result.ok:
+            print(f"{result.label}: error: {result.error}", file=sys.stderr)
+            if args.trace and result.metrics:
+                instrument.write_record(args.trace, result.metrics)
+            continue
+
+        plan = result.plan
+        if args.out:
+            written = time.perf_counter()
+            write_plan(plan, args.out, args.format)
+            if result.metrics:
+                result.metrics["spans"]["report"] = time.perf_counter() - written
+        if args.trace and result.metrics:
+            instrument.write_record(args.trace, result.metrics)
+        status = "safe" if plan.safe else "UNSAFE"
+        line = f"{plan.label}: {plan.nurse_count} nurses, {plan.total_patients} patients, {status}"
+        if plan.objective is not None:
+            line += f", cost {plan.objective:.1f}"
+        metrics = plan.bed_metrics()
+        if metrics is not None:
+            line += f", {metrics['runs_per_nurse']:.1f} runs per nurse"
+        print(line)
+        for warning in plan.warnings:
+            print(f"{plan.label}: warning: {warning}", file=sys.stderr)
+
+    summary = summarize(results)
+    if args.history:
+        export_plans((r.plan for r in results if r.ok), args.history, append=True)
+    if store:
+        with store:
+            store.record_plans([r.plan for r in results if r.ok], args.day)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    elapsed = time.perf_counter() - started
+    cached = f", {summary['cached']} from cache" if args.cache else ""
+    print(f"Planned {summary['wards']} wards ({summary['failed']} failed, "
+          f"{len(summary['unsafe'])} unsafe{cached}) in {elapsed:.2f}s")
+    return 1 if summary["failed"] else 0
+
+
+def cmd_rota(args):
+    # Imported here so `plan` doesn't pay for the rota module
+    from .rota import continuity, plan_rota_beds, schedule_rota
+
+    started = time.perf_counter()
+    try:
+        spec = load_rota_spec(args.file)
+        rota = schedule_rota(spec["nurses"], spec["days"], spec["total_patients"],
+                             spec["ratios"], spec["skill_minimums"],
+                             spec["max_shifts_per_week"], spec["max_consecutive"],
+                             ward=spec["ward"], start=spec["start"],
+                             iterations=args.iterations, seed=args.seed)
+    except (OSError, ValueError) as e:
+        print(f"rota: error: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+
+    print(rota.format_table())
+    print()
+    breaches = ", ".join(f"{key} {count}" for key, count in rota.breakdown.items() if count)
+    print(f"Rota cost {rota.cost:.1f} ({breaches or 'no rule breaches'}) "
+          f"after {rota.iterations} moves in {elapsed:.2f}s")
+
+    try:
+        if args.csv:
+            with open(args.csv, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=["ward", "date", "shift", "nurse", "skill"])
+                writer.writeheader()
+                writer.writerows(rota.to_rows())
+
+        if args.beds or args.history or args.db:
+            plans = plan_rota_beds(rota, spec["total_patients"], spec["ratios"],
+                                   spec["acuity_counts"], spec["tasks"])
+            print(f"Allocated beds for {len(plans)} shifts, "
+                  f"{continuity(plans):.0%} of patients kept their nurse")
+            if args.beds:
+                for plan in plans:
+                    write_plan(plan, args.beds, args.format)
+            if args.history:
+                export_plans(plans, args.history, append=True)
+            if args.db:
+                with open_store(args.db) as store:
+                    for d in range(rota.days):
+                        day = rota.date_of(d)
+                        prefix = day.isoformat() + " "
+                        store.record_plans([p for p in plans if p.shift.startswith(prefix)], day)
+    except (OSError, ValueError) as e:
+        print(f"rota: error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_workload(args):
+    started = time.perf_counter()
+    with open_store(args.db) as store:
+        stats = store.workload(args.days, args.until)
+    elapsed = time.perf_counter() - started
+
+    key = (lambda item: item[1]["patients"].get(args.acuity, 0)) if args.acuity \
+        else (lambda item: item[1]["load"])
+    rows = sorted(stats.items(), key=key, reverse=True)
+    if args.json:
+        json.dump(dict(rows), sys.stdout, indent=2)
+        print()
+        return 0
+
+    acuities = [args.acuity] if args.acuity else ACUITY_CATEGORIES
+    width = max([len("Nurse")] + [len(name) for name, _ in rows])
+    print(f"{'Nurse':<{width}}  {'Shifts':>6}  " +
+          "  ".join(f"{a:>8}" for a in acuities) + f"  {'Load':>7}")
+    for name, entry in rows:
+        print(f"{name:<{width}}  {entry['shifts']:>6}  " +
+              "  ".join(f"{entry['patients'].get(a, 0):>8}" for a in acuities) +
+              f"  {entry['load']:>7.1f}")
+    print(f"{len(rows)} nurses over the {args.days} days to "
+          f"{(args.until or date.today()).isoformat()} ({elapsed * 1000:.0f} ms)")
+    return 0
+
+
+def parse_census(text):
+    # "28", "10,20,30" or an inclusive range "10:60" / "10:60:5"
+    try:
+        if ":" in text:
+            parts = [int(p) for p in text.split(":")]
+            if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] <= 0):
+                raise ValueError
+            start, stop, step = parts if len(parts) == 3 else parts + [1]
+            return list(range(start, stop + 1, step))
+        return [int(p) for p in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected N, N,N,... or START:STOP[:STEP], got {text!r}")
+
+
+def parse_triple(text):
+    # "4/6/8" or "20/50/30"
+    try:
+        parts = [float(p) for p in text.split("/")]
+        if len(parts) != 3:
+            raise ValueError
+        return tuple(parts)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected three numbers like 4/6/8, got {text!r}")
+
+
+def cmd_sweep(args):
+    # Needs NumPy, so only imported for this command
+    try:
+        from .scenarios import simplex_grid, sweep, write_sweep
+    except ImportError as e:
+        print(f"sweep: error: needs NumPy ({e})", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    try:
+        mixes = list(args.mix or [])
+        if args.mix_step:
+            mixes += simplex_grid(args.mix_step)
+        result = sweep(args.census, mixes or None, args.ratios, args.skill_mix,
+                       skill_minimums={"Senior": args.min_seniors})
+    except ValueError as e:
+        print(f"sweep: error: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+
+    print(result.format_curve())
+    print(f"{len(result)} scenarios in {elapsed * 1000:.0f} ms, "
+          f"{int(result.short.sum())} short of a skill")
+    if args.csv:
+        write_sweep(result, args.csv)
+    if args.curve_csv:
+        write_sweep(result, args.curve_csv, curve=True)
+    return 0
+
+
+def cmd_serve(args):
+    # Imported here: only this command needs asyncio
+    from .service import serve
+
+    def ready(address):
+        host, port = address
+        workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+        print(f"Serving ward plans on http://{host}:{port} (worker processes: {workers})",
+              flush=True)
+
+    try:
+        serve(args.host, args.port, ready, workers=args.workers, max_pending=args.max_pending,
+              max_connections=args.max_connections)
+    except OSError as e:
+        print(f"serve: error: {e}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_live(args):
+    # Imported here so the other commands don't load the live machinery
+    from .engine import plan_ward
+    from .live import FeedReader, LiveWard, follow, update_writer
+    from .wardfile import load_ward_specs
+
+    try:
+        specs = load_ward_specs(args.ward_file)
+        if args.shift:
+            specs = [spec for spec in specs if spec["shift"] == args.shift]
+            if not specs:
+                raise ValueError(f"No shift {args.shift} in {args.ward_file}")
+        spec = specs[0]
+        live = LiveWard(plan_ward(**spec), spec["tasks"], spec["acuity_weights"],
+                        spec["skill_factors"])
+        reader = FeedReader(args.feed, from_start=args.from_start)
+    except (OSError, ValueError) as e:
+        print(f"live: error: {e}", file=sys.stderr)
+        return 2
+
+    out = sys.stdout if args.out in (None, "-") else open(args.out, 'a')
+    emit = update_writer(live, out, args.report)
+    # The starting allocation, so a reader has something to apply moves to
+    emit(live.snapshot(), [])
+    try:
+        follow(live, reader, emit, args.window, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def cmd_robust(args):
+    # Imported here so the other commands don't load the simulator
+    from .engine import plan_ward
+    from .robustness import ScenarioModel, simulate
+    from .wardfile import load_ward_specs
+
+    started = time.perf_counter()
+    try:
+        specs = load_ward_specs(args.ward_file)
+        if args.shift:
+            specs = [spec for spec in specs if spec["shift"] == args.shift]
+            if not specs:
+                raise ValueError(f"No shift {args.shift} in {args.ward_file}")
+        spec = specs[0]
+        plan = plan_ward(**spec)
+        model = ScenarioModel(args.discharge, args.deteriorate, args.improve, args.admit_rate,
+                              args.absence, skill_minimums={"Senior": args.min_seniors})
+        result = simulate(plan, args.scenarios, args.seed, model, spec["acuity_weights"],
+                          spec["skill_factors"], workers=args.workers, serial=args.serial)
+    except (OSError, ValueError) as e:
+        print(f"robust: error: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+
+    print(result.format_text(args.top))
+    print(f"Simulated in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result.to_dict(args.top), f, indent=2)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ward_planner",
+                                     description="Headless ward shift planning")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan = sub.add_parser("plan", help="plan every ward file in a directory")
+    plan.add_argument("directory", help="directory of ward .json files")
+    plan.add_argument("--out", help="write one report per ward into this directory")
+    plan.add_argument("--format", choices=["text", "json"], default="text",
+                      help="report format written with --out (default: text)")
+    plan.add_argument("--mode", choices=ALLOCATION_MODES,
+                      help="allocation mode for every ward, overriding the ward files")
+    plan.add_argument("--workers", type=int,
+                      help="worker processes (default: one per CPU)")
+    plan.add_argument("--serial", action="store_true",
+                      help="plan in this process, one ward at a time (for debugging)")
+    plan.add_argument("--summary", help="write the merged site summary as JSON")
+    plan.add_argument("--history",
+                      help="append one row per bed to this CSV (or .jsonl) history file")
+    plan.add_argument("--cache",
+                      help="reuse plans for unchanged wards from this cache directory")
+    plan.add_argument("--trace",
+                      help="append per-ward phase timings and counters to this JSON lines file")
+    plan.add_argument("--profile",
+                      help="profile each ward with cProfile, writing .prof files to this directory")
+    plan.add_argument("--db",
+                      help="record every plan in this SQLite history database")
+    plan.add_argument("--day", type=date.fromisoformat,
+                      help="date the plans are recorded under, YYYY-MM-DD (default: today)")
+    plan.add_argument("--fair-days", type=int, metavar="DAYS",
+                      help="with --db, give the heaviest patients to whoever carried "
+                           "the least load over this many days")
+    plan.set_defaults(func=cmd_plan)
+
+    rota = sub.add_parser("rota", help="build a multi-week Day/Evening/Night rota for a ward")
+    rota.add_argument("file", help="rota .json file")
+    rota.add_argument("--csv", help="write the rota as one row per nurse shift")
+    rota.add_argument("--beds", help="allocate beds for every shift and write the reports here")
+    rota.add_argument("--format", choices=["text", "json"], default="text",
+                      help="report format written with --beds (default: text)")
+    rota.add_argument("--history",
+                      help="append every shift's bed rows to this CSV (or .jsonl) history file")
+    rota.add_argument("--iterations", type=int,
+                      help="local search moves (default: 100 per nurse per day)")
+    rota.add_argument("--seed", type=int, default=0,
+                      help="random seed; the same seed gives the same rota")
+    rota.add_argument("--db",
+                      help="record every shift's bed allocation in this SQLite history database")
+    rota.set_defaults(func=cmd_rota)
+
+    workload = sub.add_parser("workload", help="per-nurse workload from a history database")
+    workload.add_argument("db", help="SQLite history database written with --db")
+    workload.add_argument("--days", type=int, default=30,
+                          help="length of the window in days (default: 30)")
+    workload.add_argument("--until", type=date.fromisoformat,
+                          help="last day of the window, YYYY-MM-DD (default: today)")
+    workload.add_argument("--acuity", choices=ACUITY_CATEGORIES,
+                          help="only show and sort by patient-shifts of this acuity")
+    workload.add_argument("--json", action="store_true", help="print the figures as JSON")
+    workload.set_defaults(func=cmd_workload)
+
+    what_if = sub.add_parser("sweep", help="what-if staffing over census, acuity mix, "
+                                           "ratios and skill mix (needs NumPy)")
+    what_if.add_argument("--census", type=parse_census, default=list(range(10, 61)),
+                         help="patients: N, N,N,... or START:STOP[:STEP] (default: 10:60)")
+    what_if.add_argument("--mix", type=parse_triple, action="append",
+                         help="High/Moderate/Low acuity mix, e.g. 20/50/30; repeatable")
+    what_if.add_argument("--mix-step", type=float,
+                         help="also sweep every acuity mix on this grid step, e.g. 0.1")
+    what_if.add_argument("--ratios", type=parse_triple, action="append",
+                         help="High/Moderate/Low patients per nurse, e.g. 4/6/8; repeatable")
+    what_if.add_argument("--skill-mix", type=parse_triple, action="append",
+                         help="Senior/Intermediate/Junior roster mix, e.g. 25/45/30; repeatable")
+    what_if.add_argument("--min-seniors", type=int, default=1,
+                         help="seniors every shift needs (default: 1)")
+    what_if.add_argument("--csv", help="write every scenario to this CSV (or .jsonl) file")
+    what_if.add_argument("--curve-csv", help="write the staffing curve to this CSV (or .jsonl) file")
+    what_if.set_defaults(func=cmd_sweep)
+
+    live = sub.add_parser("live", help="keep a ward's allocation up to date from an event feed")
+    live.add_argument("ward_file", help="ward .json file giving the starting roster and beds")
+    live.add_argument("feed", help="JSON lines file of admit, discharge, acuity, break and "
+                                   "return events (see ward_planner/live.py)")
+    live.add_argument("--shift", help="which shift of a multi-shift ward file (default: the first)")
+    live.add_argument("--window", type=float, default=0.5,
+                      help="seconds to gather a burst of events into one update (default: 0.5)")
+    live.add_argument("--out", help="append one JSON line per update here (default: stdout)")
+    live.add_argument("--report", help="rewrite the full report here after every update")
+    live.add_argument("--from-start", action="store_true",
+                      help="apply the events already in the feed, not only new ones")
+    live.add_argument("--once", action="store_true",
+                      help="stop at the end of the feed instead of waiting for more")
+    live.set_defaults(func=cmd_live)
+
+    robust = sub.add_parser("robust", help="Monte Carlo robustness of a ward's plan against "
+                                           "admissions, discharges, acuity changes and absences")
+    robust.add_argument("ward_file", help="ward .json file to plan and test")
+    robust.add_argument("--shift", help="which shift of a multi-shift ward file (default: the first)")
+    robust.add_argument("--scenarios", type=int, default=10000,
+                        help="scenarios to simulate (default: 10000)")
+    robust.add_argument("--seed", type=int, default=0,
+                        help="random seed; the same seed gives the same figures (default: 0)")
+    robust.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    robust.add_argument("--serial", action="store_true", help="simulate in this process")
+    robust.add_argument("--discharge", type=float, default=0.10,
+                        help="chance each patient is discharged (default: 0.10)")
+    robust.add_argument("--deteriorate", type=float, default=0.05,
+                        help="chance each patient goes up an acuity level (default: 0.05)")
+    robust.add_argument("--improve", type=float, default=0.05,
+                        help="chance each patient goes down an acuity level (default: 0.05)")
+    robust.add_argument("--admit-rate", type=float, default=2.0,
+                        help="mean admissions per shift (default: 2)")
+    robust.add_argument("--absence", type=float, default=0.03,
+                        help="chance each nurse calls in sick (default: 0.03)")
+    robust.add_argument("--min-seniors", type=int, default=1,
+                        help="seniors the shift needs (default: 1)")
+    robust.add_argument("--top", type=int, default=5,
+                        help="fragile nurse assignments to list (default: 5)")
+    robust.add_argument("--json", help="write the figures as JSON to this file")
+    robust.set_defaults(func=cmd_robust)
+
+    service = sub.add_parser("serve", help="serve allocations to ward terminals over HTTP/JSON")
+    service.add_argument("--host", default="127.0.0.1",
+                         help="address to listen on (default: 127.0.0.1, this machine only)")
+    service.add_argument("--port", type=int, default=8765,
+                         help="port to listen on, 0 for any free port (default: 8765)")
+    service.add_argument("--workers", type=int,
+                         help="worker processes for optimal, contiguous and large wards "
+                              "(default: one per CPU; 0 plans everything in the server)")
+    service.add_argument("--max-pending", type=int,
+                         help="worker solves queued or running before answering 503 "
+                              "(default: 16 per worker)")
+    service.add_argument("--max-connections", type=int, default=1024,
+                         help="connected clients before answering 503 (default: 1024)")
+    service.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "fair_days", None) and not args.db:
+        parser.error("--fair-days requires --db")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+ACUITY_CATEGORIES = ["High", "Moderate", "Low"]
+SKILL_LEVELS = ["Senior", "Intermediate", "Junior"]
+ALLOCATION_MODES = ["balanced", "optimal", "contiguous"]
+TASKS = ["Wound dressings", "Bed baths", "IV meds", "Post-ops", "Isolation cases"]
+
+DEFAULT_SKILL = "Intermediate"
+DEFAULT_ACUITY = "Moderate"
+
+# Small-int codes used by the compact model (index into the lists above)
+ACUITY_CODES = {acuity: code for code, acuity in enumerate(ACUITY_CATEGORIES)}
+SKILL_CODES = {skill: code for code, skill in enumerate(SKILL_LEVELS)}
+
+# Workload each patient adds to a nurse, by acuity
+ACUITY_WEIGHTS = {"High": 3.0, "Moderate": 2.0, "Low": 1.0}
+# How much weighted load a nurse of each skill level carries relative to an
+# intermediate nurse before being considered equally busy
+SKILL_FACTORS = {"Senior": 1.25, "Intermediate": 1.0, "Junior": 0.75}
+# Skill levels that may take each acuity. If none of them are on duty the
+# patient goes to the least-loaded nurse of any skill.
+ACUITY_ELIGIBILITY = {
+    "High": ["Senior", "Intermediate"],
+    "Moderate": SKILL_LEVELS,
+    "Low": SKILL_LEVELS,
+}
+
+# Task allocation. Minutes each task instance takes (tasks not listed take
+# DEFAULT_TASK_MINUTES) and the skill levels allowed to do it (anyone, if
+# not listed).
+TASK_MINUTES = {
+    "Wound dressings": 20,
+    "Bed baths": 30,
+    "IV meds": 15,
+    "Post-ops": 30,
+    "Isolation cases": 25,
+}
+DEFAULT_TASK_MINUTES = 20
+TASK_ELIGIBILITY = {
+    "IV meds": ["Senior", "Intermediate"],
+    "Post-ops": ["Senior", "Intermediate"],
+}
+# A nurse's shift, and the direct care time each unit of acuity-weighted
+# load takes (before the skill factor); what's left over is time for tasks
+SHIFT_MINUTES = 450
+CARE_MINUTES_PER_LOAD = 30
@@ -0,0 +1,422 @@
+import heapq
+import math
+
+from .constants import (ACUITY_CATEGORIES, ACUITY_ELIGIBILITY, ACUITY_WEIGHTS,
+                        ALLOCATION_MODES, DEFAULT_SKILL, SKILL_FACTORS, SKILL_LEVELS,
+                        TASKS)
+from . import instrument
+from .model import CompactAllocation, PatientTable, order_nurses
+from .tasks import pack_tasks
+
+
+class WardPlan:
+    def __init__(self, ward, total_patients, ratio, nurses, acuity_counts,
+                 allocation, safe, safety_message, warnings=None, notes="",
+                 mode="balanced", objective=None, shift="", layout=None):
+        self.ward = ward
+        self.total_patients = total_patients
+        self.ratio = ratio
+        self.nurses = nurses
+        self.acuity_counts = acuity_counts
+        # Either the dict allocation or a CompactAllocation that is only
+        # expanded into dicts when something asks for plan.allocation
+        if isinstance(allocation, CompactAllocation):
+            self.compact = allocation
+            self._allocation = None
+        else:
+            self.compact = None
+            self._allocation = allocation
+        self.safe = safe
+        self.safety_message = safety_message
+        self.warnings = warnings or []
+        self.notes = notes
+        self.mode = mode
+        self.objective = objective
+        self.shift = shift
+        self.moves = []
+        # Bays and beds in walking order, if the ward gave one (geography.py)
+        self.layout = layout
+
+    @property
+    def allocation(self):
+        if self._allocation is None:
+            self._allocation = expand_allocation(self.compact)
+        return self._allocation
+
+    @property
+    def nurse_count(self):
+        if self._allocation is None:
+            return len(self.compact)
+        return len(self._allocation)
+
+    def bed_metrics(self):
+        # Contiguity and walking figures for a plan with a layout or from
+        # the contiguous allocator, else None
+        if self.layout is None and self.mode != "contiguous":
+            return None
+        from .geography import layout_metrics
+        return layout_metrics(self.allocation, self.layout)
+
+    @property
+    def label(self):
+        return f"{self.ward}/{self.shift}" if self.shift else self.ward
+
+    def summary(self):
+        return {
+            "ward": self.ward,
+            "shift": self.shift,
+            "total_patients": self.total_patients,
+            "ratio": self.ratio,
+            "nurses": self.nurse_count,
+            "required_nurses": required_nurses(self.total_patients, self.ratio),
+            "safe": self.safe,
+            "mode": self.mode,
+            "objective": self.objective,
+            "acuity": dict(self.acuity_counts),
+            "warnings": list(self.warnings),
+            "moved": len(self.moves),
+        }
+
+    def to_dict(self):
+        data = self.summary()
+        data["notes"] = self.notes
+        data["moves"] = [dict(m) for m in self.moves]
+        data["allocation"] = [{
+            "nurse": name,
+            "skill": entry['nurse']['skill'],
+            "patients": [dict(p) for p in entry['patients']],
+            "tasks": list(entry['tasks']),
+            "task_minutes": entry.get('task_minutes', 0.0),
+            "spare_minutes": entry.get('spare_minutes'),
+            "load": entry['load'],
+            "justification": entry['justification'],
+        } for name, entry in self.allocation.items()]
+        metrics = self.bed_metrics()
+        if metrics is not None:
+            data["layout"] = self.layout
+            data["bed_metrics"] = metrics
+        return data
+
+
+def normalize_nurses(nurses):
+    # Accepts {"name", "skill"} dicts or (name, skill) pairs; unknown skills
+    # fall back to Intermediate the same way the roster loader does
+    result = []
+    for nurse in nurses:
+        if isinstance(nurse, dict):
+            name = nurse.get('name', '')
+            skill = nurse.get('skill', DEFAULT_SKILL)
+        elif isinstance(nurse, str):
+            name, skill = nurse, DEFAULT_SKILL
+        else:
+            name = nurse[0]
+            skill = nurse[1] if len(nurse) > 1 else DEFAULT_SKILL
+
+        name = str(name).strip()
+        if not name:
+            continue
+        if skill not in SKILL_LEVELS:
+            skill = DEFAULT_SKILL
+        result.append({"name": name, "skill": skill})
+    return result
+
+
+def required_nurses(total_patients, ratio):
+    if ratio <= 0:
+        raise ValueError("Ratio must be a positive number")
+    return math.ceil(total_patients / ratio)
+
+
+def check_ratio(total_patients, ratio, nurse_count):
+    required = required_nurses(total_patients, ratio)
+    if nurse_count < required:
+        return False, f"⚠️ Unsafe staffing: You need at least {required} nurses for a 1:{ratio} ratio."
+    return True, "✓ Staffing ratio is safe"
+
+
+def split_acuity(total):
+    # Simple distribution: 20% high, 50% moderate, 30% low
+    high = int(total * 0.2)
+    moderate = int(total * 0.5)
+    low = total - high - moderate
+    return {"High": high, "Moderate": moderate, "Low": low}
+
+
+def build_patients(total_patients, acuity_counts):
+    table, warnings = PatientTable.from_counts(total_patients, acuity_counts)
+    return table.to_dicts(), warnings
+
+
+def count_acuity(entry):
+    # Cached on the entry so reports don't have to recount
+    acuity_dist = {}
+    for p in entry['patients']:
+        acuity_dist[p['acuity']] = acuity_dist.get(p['acuity'], 0) + 1
+    entry['acuity_counts'] = acuity_dist
+    return acuity_dist
+
+
+def justify(entry):
+    patient_count = len(entry['patients'])
+    acuity_dist = count_acuity(entry)
+
+    justification = f"Assigned {patient_count} patients"
+    if acuity_dist:
+        acuity_desc = ', '.join([f"{v} {k.lower()}" for k, v in acuity_dist.items()])
+        justification += f" ({acuity_desc})"
+
+    skill = entry['nurse']['skill']
+    if skill == 'Senior' and acuity_dist.get('High', 0) > 0:
+        justification += ". Senior nurse assigned high-acuity patients."
+    elif skill == 'Junior' and acuity_dist.get('High', 0) == 0:
+        justification += ". Junior nurse assigned appropriate lower-acuity patients."
+
+    return justification
+
+
+def new_allocation(nurses):
+    # Sort nurses by skill (Senior first)
+    sorted_nurses = sorted(nurses, key=lambda x: SKILL_LEVELS.index(x['skill']))
+
+    return {nurse['name']: {
+        'nurse': nurse,
+        'patients': [],
+        'tasks': [],
+        'load': 0.0,
+        'justification': ''
+    } for nurse in sorted_nurses}
+
+
+def group_by_acuity(patients):
+    by_acuity = {acuity: [] for acuity in ACUITY_CATEGORIES}
+    for patient in patients:
+        if patient['acuity'] not in by_acuity:
+            raise ValueError(f"Unknown acuity: {patient['acuity']}")
+        by_acuity[patient['acuity']].append(patient)
+    return by_acuity
+
+
+def patient_cap(total_patients, nurse_count, ratio):
+    # Most patients any one nurse is given: the ratio while staffing is
+    # safe, otherwise an even share of the shortfall (as in optimal.py)
+    if not ratio or not nurse_count:
+        return None
+    return max(ratio, math.ceil(total_patients / nurse_count))
+
+
+def balanced_assignment(patients, nurses, acuity_weights=None, skill_factors=None,
+                        eligibility=None, history=None, ratio=None):
+    # patients is a PatientTable and nurses a seniority-ordered list of Nurse;
+    # returns a CompactAllocation. history maps nurse names to their recent
+    # load per shift (store.Store.recent_load) and breaks ties between equally
+    # loaded nurses, so the heavy patients go to whoever has had fewer lately
+    # without making today's split any less even. With ratio, no nurse is
+    # given more than patient_cap patients: a nurse who reaches it leaves
+    # their heap, and if every eligible nurse is full the patient goes to
+    # the least-loaded nurse of any skill with room.
+    acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+    skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+    eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+    if any(factor <= 0 for factor in skill_factors.values()):
+        raise ValueError("Skill factors must be positive")
+
+    result = CompactAllocation(nurses, patients)
+    assignment = result.assignment
+    loads = result.loads
+
+    # One min-heap per skill level keyed on (scaled load, recent load,
+    # seniority order), so the least-loaded nurse of each skill is always on
+    # top. Without history the entries start in seniority order, which is
+    # already a valid heap.
+    history = history or {}
+    recent = [history.get(nurse.name, 0.0) for nurse in nurses]
+    heaps = {skill: [] for skill in SKILL_LEVELS}
+    for order, nurse in enumerate(nurses):
+        heaps[nurse.skill].append((0.0, recent[order], order))
+    if history:
+        for heap in heaps.values():
+            heapq.heapify(heap)
+    cap = patient_cap(len(patients), len(nurses), ratio)
+    counts = [0] * len(nurses)
+
+    def candidates(acuity):
+        return ([skill for skill in eligibility[acuity] if heaps[skill]]
+                or [skill for skill in SKILL_LEVELS if heaps[skill]])
+
+    # High acuity first so the heaviest patients are spread before the
+    # lighter ones fill the gaps
+    codes = patients.acuity
+    for code, acuity in enumerate(ACUITY_CATEGORIES):
+        skills = candidates(acuity)
+        weight = acuity_weights[acuity]
+
+        for row in range(len(codes)):
+            if codes[row] != code:
+                continue
+            # At most one peek per skill level, then a single O(log N) replace
+            skill = min(skills, key=lambda s: heaps[s][0])
+            order = heaps[skill][0][2]
+            assignment[row] = order
+            loads[order] += weight
+            counts[order] += 1
+            if cap is not None and counts[order] >= cap:
+                heapq.heappop(heaps[skill])
+                if not heaps[skill]:
+                    skills = candidates(acuity)
+            else:
+                heapq.heapreplace(heaps[skill],
+                                  (loads[order] / skill_factors[skill], recent[order], order))
+
+    return result
+
+
+def nurse_warnings(name, skill, counts, ratio, eligibility):
+    # counts is the nurse's patients per acuity, in ACUITY_CATEGORIES order
+    warnings = []
+    if ratio and sum(counts) > ratio:
+        warnings.append(f"{name} has {sum(counts)} patients, over the 1:{ratio} ratio")
+    for code, acuity in enumerate(ACUITY_CATEGORIES):
+        if counts[code] and skill not in eligibility[acuity]:
+            plural = "s" if counts[code] != 1 else ""
+            warnings.append(f"{name} ({skill}) has {counts[code]} "
+                            f"{acuity.lower()} acuity patient{plural}; no eligible nurse "
+                            f"had room")
+    return warnings
+
+
+def staffing_warnings(compact, ratio, eligibility=None):
+    # Nurses over the ratio, and patients with a nurse not eligible for
+    # their acuity, in a CompactAllocation
+    eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+    width = len(ACUITY_CATEGORIES)
+    counts = compact.acuity_by_nurse()
+    warnings = []
+    for index, nurse in enumerate(compact.nurses):
+        warnings += nurse_warnings(nurse.name, nurse.skill,
+                                   counts[index * width:(index + 1) * width], ratio, eligibility)
+    return warnings
+
+
+def allocation_warnings(allocation, ratio, eligibility=None):
+    # staffing_warnings for an allocation dict, such as one replanned in place
+    eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+    warnings = []
+    for name, entry in allocation.items():
+        counts = [0] * len(ACUITY_CATEGORIES)
+        for patient in entry['patients']:
+            counts[ACUITY_CATEGORIES.index(patient['acuity'])] += 1
+        warnings += nurse_warnings(name, entry['nurse']['skill'], counts, ratio, eligibility)
+    return warnings
+
+
+def expand_allocation(compact, patient_dicts=None):
+    allocation = compact.to_allocation(patient_dicts)
+    for data in allocation.values():
+        data['justification'] = justify(data)
+    return allocation
+
+
+def distribute_patients(patients, nurses, acuity_weights=None, skill_factors=None,
+                        eligibility=None, history=None, ratio=None):
+    compact = balanced_assignment(PatientTable.from_dicts(patients), order_nurses(nurses),
+                                  acuity_weights, skill_factors, eligibility, history, ratio)
+    return expand_allocation(compact, patients)
+
+
+def allocate(patients, nurses, ratio, mode="balanced", acuity_weights=None,
+             skill_factors=None):
+    # Returns (allocation, objective); only the optimal mode has an objective
+    if mode == "balanced":
+        return distribute_patients(patients, nurses, acuity_weights, skill_factors,
+                                   ratio=ratio), None
+    if mode == "optimal":
+        # Needs NumPy, so only imported when asked for
+        from .optimal import distribute_patients_optimal
+        return distribute_patients_optimal(patients, nurses, ratio, acuity_weights, skill_factors)
+    raise ValueError(f"Unknown allocation mode: {mode}")
+
+
+def distribute_tasks(allocation, tasks, acuity_counts=None, skill_factors=None):
+    # Replaces every nurse's tasks with a packing of these onto the time left
+    # after their patients (see tasks.pack_tasks); returns warnings
+    entries = list(allocation.values())
+    assigned, minutes, spare, warnings = pack_tasks(
+        [entry['nurse']['skill'] for entry in entries],
+        [entry.get('load') or 0.0 for entry in entries],
+        tasks, acuity_counts, skill_factors)
+    for i, entry in enumerate(entries):
+        entry['tasks'] = assigned.get(i, [])
+        entry['task_minutes'] = minutes[i]
+        entry['spare_minutes'] = spare[i]
+    return warnings
+
+
+def plan_ward(nurses, total_patients, ratio, acuity_counts=None, tasks=(),
+              ward="", notes="", acuity_weights=None, skill_factors=None,
+              mode="balanced", shift="", history=None, layout=None, beds=None):
+    # history (balanced mode only) is each nurse's recent load per shift, see
+    # balanced_assignment. layout lists bays of beds in walking order and
+    # beds maps bed id to acuity for the occupied beds, replacing
+    # total_patients and acuity_counts (see geography.py).
+    nurses = normalize_nurses(nurses)
+    if not nurses:
+        raise ValueError("Please add at least one nurse")
+
+    total_patients = int(total_patients)
+    ratio = int(ratio)
+    if total_patients < 0:
+        raise ValueError("Total patients cannot be negative")
+
+    warnings = []
+    if beds is not None:
+        beds = {int(bed): acuity for bed, acuity in beds.items()}
+        if len(beds) != total_patients:
+            warnings.append(f"Bed list ({len(beds)}) doesn't match total patients "
+                            f"({total_patients}). Using the bed list...")
+        total_patients = len(beds)
+        acuity_counts = {acuity: 0 for acuity in ACUITY_CATEGORIES}
+        for acuity in beds.values():
+            if acuity not in acuity_counts:
+                raise ValueError(f"Unknown acuity: {acuity}")
+            acuity_counts[acuity] += 1
+    if acuity_counts is None:
+        acuity_counts = split_acuity(total_patients)
+    acuity_counts = {acuity: int(acuity_counts.get(acuity) or 0)
+                     for acuity in ACUITY_CATEGORIES}
+
+    safe, safety_message = check_ratio(total_patients, ratio, len(nurses))
+    with instrument.span("patients"):
+        if beds is not None:
+            patients = PatientTable.from_dicts(
+                [{"id": bed, "acuity": beds[bed]} for bed in sorted(beds)])
+        else:
+            patients, count_warnings = PatientTable.from_counts(total_patients, acuity_counts)
+            warnings += count_warnings
+    instrument.count("patients", len(patients))
+    instrument.count("nurses", len(nurses))
+
+    if mode in ("balanced", "contiguous"):
+        # Stays compact until a report or export asks for the dict shape
+        with instrument.span("distribute"):
+            if mode == "balanced":
+                allocation = balanced_assignment(patients, order_nurses(nurses),
+                                                 acuity_weights, skill_factors, history=history,
+                                                 ratio=ratio)
+            else:
+                from .geography import contiguous_assignment
+                allocation = contiguous_assignment(patients, order_nurses(nurses), layout,
+                                                   acuity_weights, skill_factors, ratio=ratio)
+            warnings += staffing_warnings(allocation, ratio)
+        with instrument.span("tasks"):
+            warnings += allocation.assign_tasks(tasks, acuity_counts, skill_factors)
+        objective = None
+    else:
+        with instrument.span("distribute"):
+            allocation, objective = allocate(patients.to_dicts(), nurses, ratio, mode,
+                                             acuity_weights, skill_factors)
+        with instrument.span("tasks"):
+            warnings += distribute_tasks(allocation, tasks, acuity_counts, skill_factors)
+
+    return WardPlan(ward, total_patients, ratio, nurses, acuity_counts,
+                    allocation, safe, safety_message, warnings, notes,
+                    mode, objective, shift, layout)
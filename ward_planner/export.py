@@ -0,0 +1,76 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+# One row per bed; a nurse without patients still gets a row with no bed
+FIELDS = ["planned_at", "ward", "shift", "nurse", "skill", "bed", "acuity",
+          "tasks", "justification"]
+
+
+def iter_rows(plan, planned_at=None):
+    planned_at = (planned_at or datetime.now()).isoformat(timespec='seconds')
+    for nurse_name, data in plan.allocation.items():
+        beds = [(p['id'], p['acuity']) for p in data['patients']] or [(None, None)]
+        for bed, acuity in beds:
+            yield {
+                "planned_at": planned_at,
+                "ward": plan.ward,
+                "shift": plan.shift,
+                "nurse": nurse_name,
+                "skill": data['nurse']['skill'],
+                "bed": bed,
+                "acuity": acuity,
+                "tasks": data['tasks'],
+                "justification": data['justification'],
+            }
+
+
+def export_csv(plans, path, append=False, planned_at=None):
+    # Streams rows straight to the file; with append=True the header is only
+    # written when the history file is new or empty
+    with open(path, 'a' if append else 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if f.tell() == 0:
+            writer.writeheader()
+        count = 0
+        for plan in plans:
+            for row in iter_rows(plan, planned_at):
+                row["tasks"] = "; ".join(row["tasks"])
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def export_jsonl(plans, path, append=False, planned_at=None):
+    with open(path, 'a' if append else 'w') as f:
+        count = 0
+        for plan in plans:
+            for row in iter_rows(plan, planned_at):
+                f.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')))
+                f.write("\n")
+                count += 1
+    return count
+
+
+def export_plans(plans, path, append=False, planned_at=None):
+    # Format follows the extension: .jsonl / .ndjson, anything else is CSV
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        return export_jsonl(plans, path, append, planned_at)
+    return export_csv(plans, path, append, planned_at)
+
+
+def read_history(path):
+    # Reads either format back as row dicts, one at a time
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            row["bed"] = int(row["bed"]) if row["bed"] else None
+            row["acuity"] = row["acuity"] or None
+            row["tasks"] = row["tasks"].split("; ") if row["tasks"] else []
+            yield row
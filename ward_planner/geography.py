@@ -0,0 +1,288 @@
+from bisect import bisect_right
+
+from .constants import (ACUITY_CATEGORIES, ACUITY_ELIGIBILITY, ACUITY_WEIGHTS,
+                        SKILL_FACTORS, SKILL_LEVELS)
+from .engine import patient_cap
+from .model import CompactAllocation
+
+# Bed geography. A layout is the ward's bays in walking order, each a list
+# of bed ids in walking order:
+#   [[1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12], ...]
+# (or {"Bay A": [1, 2, ...], ...}; dicts keep their order). Beds next to
+# each other in a bay are one step apart and the walk from one bay to the
+# next is BAY_WALK steps.
+#
+# The contiguous allocator gives every nurse one unbroken run of occupied
+# beds along that walk. It binary-searches the smallest T such that the
+# ward splits into runs whose load / skill factor is at most T. For a given
+# T, a greedy DP over how many nurses of each skill level are used checks
+# feasibility: from any bed, a nurse of skill s extends as far as T and
+# acuity eligibility allow, and the furthest bed reached for each
+# (seniors, intermediates, juniors) count dominates. The states grow with
+# the cube of the roster, which is a few milliseconds for a ward's nurses
+# but not meant for a whole site at once. Contiguity costs some balance:
+# with few nurses eligible for scattered High acuity beds, their runs have
+# to be long. With a ratio no run is longer than engine.patient_cap beds,
+# unless eligibility leaves no other way to cover the walk; the plan's
+# staffing warnings then name whoever is over.
+
+DEFAULT_BAY_SIZE = 6
+BAY_WALK = 4
+# Bisection stops once T is known to this relative precision
+PRECISION = 1e-6
+
+
+def default_layout(bed_ids, bay_size=DEFAULT_BAY_SIZE):
+    beds = sorted(bed_ids)
+    return [beds[i:i + bay_size] for i in range(0, len(beds), bay_size)]
+
+
+def normalize_layout(layout, bed_ids):
+    # [(bay name, [bed ids])]; beds missing from the layout are walked last,
+    # in id order, as an "Unlisted" bay
+    if layout is None:
+        layout = default_layout(bed_ids)
+    if isinstance(layout, dict):
+        bays = [(str(name), [int(b) for b in beds]) for name, beds in layout.items()]
+    else:
+        bays = [(str(i + 1), [int(b) for b in beds]) for i, beds in enumerate(layout)]
+    seen = set()
+    for name, beds in bays:
+        for bed in beds:
+            if bed in seen:
+                raise ValueError(f"Bed {bed} appears twice in the layout")
+            seen.add(bed)
+    unlisted = sorted(set(bed_ids) - seen)
+    if unlisted:
+        bays.append(("Unlisted", unlisted))
+    return bays
+
+
+def walk_positions(bays):
+    # {bed: (position along the walk, bay name)}
+    positions = {}
+    step = 0
+    for i, (name, beds) in enumerate(bays):
+        if i:
+            step += BAY_WALK - 1
+        for bed in beds:
+            positions[bed] = (step, name)
+            step += 1
+    return positions
+
+
+def contiguous_assignment(patients, nurses, layout=None, acuity_weights=None,
+                          skill_factors=None, eligibility=None, ratio=None):
+    # patients is a PatientTable and nurses a seniority-ordered list of Nurse;
+    # returns a CompactAllocation in which each nurse has one run of beds
+    acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+    skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+    eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+    if any(factor <= 0 for factor in skill_factors.values()):
+        raise ValueError("Skill factors must be positive")
+
+    result = CompactAllocation(nurses, patients)
+    if not len(patients) or not nurses:
+        return result
+
+    # Patients in walking order
+    positions = walk_positions(normalize_layout(layout, patients.ids))
+    rows = sorted(range(len(patients)), key=lambda r: positions[patients.ids[r]][0])
+    weights = [acuity_weights[ACUITY_CATEGORIES[patients.acuity[r]]] for r in rows]
+    prefix = [0.0]
+    for weight in weights:
+        prefix.append(prefix[-1] + weight)
+    n = len(rows)
+
+    skills = [skill for skill in SKILL_LEVELS if any(nurse.skill == skill for nurse in nurses)]
+    available = [sum(1 for nurse in nurses if nurse.skill == skill) for skill in skills]
+    factors = [skill_factors[skill] for skill in skills]
+
+    # blocked[k][i]: the first walk index at or after i that skill k may not
+    # take (n if none). An acuity nobody on duty is eligible for is open to all.
+    blocked = []
+    for skill in skills:
+        barred = set()
+        for code, acuity in enumerate(ACUITY_CATEGORIES):
+            allowed = [s for s in eligibility[acuity] if s in skills]
+            if allowed and skill not in allowed:
+                barred.add(code)
+        nxt = [n] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            nxt[i] = i if patients.acuity[rows[i]] in barred else nxt[i + 1]
+        blocked.append(nxt)
+
+    capacity = sum(a * f for a, f in zip(available, factors))
+    staff = len(nurses)
+
+    def cover(limit, cap):
+        # Furthest walk index reached per skill-count state, with the state
+        # and skill it was reached from; returns a state that covers the
+        # ward, or None. A run that takes no beds, or a state whose
+        # remaining nurses can't carry the remaining load or beds, is dropped.
+        slack = 1 + PRECISION
+        most = n if cap is None else cap
+        # ends[k][pos]: how far a nurse of skill k starting at pos gets
+        ends = [[min(bisect_right(prefix, prefix[pos] + limit * factor * slack) - 1, barrier[pos],
+                     pos + most)
+                 for pos in range(n)] for factor, barrier in zip(factors, blocked)]
+        start = (0,) * len(skills)
+        reach = {start: (0, None, None, capacity)}
+        frontier = [start]
+        while frontier:
+            following = {}
+            for state in frontier:
+                pos, _, _, spare = reach[state]
+                if pos == n:
+                    return state, reach
+                for k, skill_count in enumerate(state):
+                    if skill_count == available[k]:
+                        continue
+                    end = ends[k][pos]
+                    left = spare - factors[k]
+                    if end == pos or prefix[n] - prefix[end] > limit * left * slack:
+                        continue
+                    if n - end > most * (staff - sum(state) - 1):
+                        continue
+                    nxt = state[:k] + (skill_count + 1,) + state[k + 1:]
+                    if nxt not in following or end > following[nxt][0]:
+                        following[nxt] = (end, state, k, left)
+            reach.update(following)
+            frontier = list(following)
+        return None, reach
+
+    # Binary search on the answer, between the load if it could be spread
+    # perfectly and the whole ward on the least experienced nurse. Only
+    # eligibility can make that upper bound fail (no skill on duty may take
+    # every acuity, and there aren't enough nurses to alternate).
+    lo = max(prefix[n] / capacity, max(weights) / max(factors)) * (1 - PRECISION)
+    hi = prefix[n] / min(factors)
+    cap = patient_cap(n, staff, ratio)
+    if cap is not None and cover(hi, cap)[0] is None:
+        cap = None
+    if cover(hi, cap)[0] is None:
+        raise ValueError("The beds can't be split into one run per nurse under the "
+                         "acuity eligibility rules; use the balanced mode")
+    while hi - lo > PRECISION * hi:
+        mid = (lo + hi) / 2
+        if cover(mid, cap)[0] is None:
+            lo = mid
+        else:
+            hi = mid
+    state, reach = cover(hi, cap)
+
+    # Walk the DP back into runs [skill, begin, end) in walk order, give
+    # any nurse left over part of a heavy run and even out the boundaries
+    runs = []
+    while reach[state][1] is not None:
+        end, previous, k, _ = reach[state]
+        runs.append([k, reach[previous][0], end])
+        state = previous
+    runs.reverse()
+    used = [0] * len(skills)
+    for run in runs:
+        used[run[0]] += 1
+    idle = [k for k in range(len(skills)) for _ in range(available[k] - used[k])]
+    spread(runs, idle, prefix, factors, blocked)
+    smooth(runs, prefix, factors, blocked, cap)
+
+    # Hand each run to the next unused nurse of its skill level in seniority
+    # order
+    by_skill = {skill: [i for i, nurse in enumerate(nurses) if nurse.skill == skill]
+                for skill in skills}
+    assignment = result.assignment
+    loads = result.loads
+    for k, begin, end in runs:
+        nurse = by_skill[skills[k]].pop(0)
+        for i in range(begin, end):
+            assignment[rows[i]] = nurse
+            loads[nurse] += weights[i]
+    return result
+
+
+def spread(runs, idle, prefix, factors, blocked):
+    # The DP only uses as many nurses as the bound needs. Each idle nurse
+    # (skill index) takes the head or tail of whichever run that most
+    # lowers, if any does; runs are only ever made lighter and shorter, so
+    # they stay within the cap.
+    def scaled(k, begin, end):
+        return (prefix[end] - prefix[begin]) / factors[k]
+
+    for k in idle:
+        best = None
+        for i, (j, begin, end) in enumerate(runs):
+            worst = scaled(j, begin, end)
+            for cut in range(begin + 1, end):
+                if blocked[k][cut] >= end:
+                    pair = max(scaled(j, begin, cut), scaled(k, cut, end))
+                    if pair < worst - PRECISION and (best is None or pair < best[0]):
+                        best = (pair, i, [j, begin, cut], [k, cut, end])
+                if blocked[k][begin] >= cut:
+                    pair = max(scaled(k, begin, cut), scaled(j, cut, end))
+                    if pair < worst - PRECISION and (best is None or pair < best[0]):
+                        best = (pair, i, [k, begin, cut], [j, cut, end])
+        if best is not None:
+            _, i, first, second = best
+            runs[i:i + 1] = [first, second]
+
+
+def smooth(runs, prefix, factors, blocked, cap=None):
+    # The DP pushes every run as far as the bound allows, so the last few
+    # come out light. Move each boundary between neighbouring runs to even
+    # out the pair (eligibility and the cap on beds per run permitting)
+    # until nothing changes. A move never raises the larger of the pair, so
+    # the bound still holds.
+    def scaled(k, begin, end):
+        return (prefix[end] - prefix[begin]) / factors[k]
+
+    for _ in range(len(runs)):
+        moved = False
+        for a, b in zip(runs, runs[1:]):
+            best = a[2]
+            worst = max(scaled(a[0], a[1], best), scaled(b[0], best, b[2]))
+            # a must keep a bed and may not reach a bed it is barred from;
+            # b must keep a bed and may not start before one it is barred from
+            first = a[1] + 1 if cap is None else max(a[1] + 1, b[2] - cap)
+            last = b[2] - 1 if cap is None else min(b[2] - 1, a[1] + cap)
+            for cut in range(first, min(last, blocked[a[0]][a[1]]) + 1):
+                if blocked[b[0]][cut] < b[2]:
+                    continue
+                pair = max(scaled(a[0], a[1], cut), scaled(b[0], cut, b[2]))
+                if pair < worst - PRECISION:
+                    best, worst = cut, pair
+            if best != a[2]:
+                a[2] = b[1] = best
+                moved = True
+        if not moved:
+            break
+
+
+def layout_metrics(allocation, layout=None):
+    # How scattered each nurse's beds are: runs of beds that are next to each
+    # other among the occupied beds (1 is one unbroken block), bays visited,
+    # and the walk from their first bed to their last. Works for any
+    # allocation mode.
+    bed_ids = [p['id'] for entry in allocation.values() for p in entry['patients']]
+    positions = walk_positions(normalize_layout(layout, bed_ids))
+    order = {bed: i for i, bed in enumerate(sorted(bed_ids, key=lambda b: positions[b][0]))}
+
+    nurses = {}
+    for name, entry in allocation.items():
+        beds = sorted((p['id'] for p in entry['patients']), key=lambda b: order[b])
+        if not beds:
+            nurses[name] = {"runs": 0, "bays": 0, "walk": 0}
+            continue
+        runs = 1 + sum(1 for a, b in zip(beds, beds[1:]) if order[b] != order[a] + 1)
+        nurses[name] = {
+            "runs": runs,
+            "bays": len({positions[b][1] for b in beds}),
+            "walk": positions[beds[-1]][0] - positions[beds[0]][0],
+        }
+    busy = [m for m in nurses.values() if m["runs"]] or [{"runs": 0, "bays": 0, "walk": 0}]
+    return {
+        "runs_per_nurse": sum(m["runs"] for m in busy) / len(busy),
+        "bays_per_nurse": sum(m["bays"] for m in busy) / len(busy),
+        "walk_total": sum(m["walk"] for m in busy),
+        "walk_max": max(m["walk"] for m in busy),
+        "nurses": nurses,
+    }
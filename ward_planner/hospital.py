@@ -0,0 +1,134 @@
+import os
+
+from . import instrument
+from .engine import normalize_nurses, plan_ward
+from .wardfile import load_ward_specs
+
+PLANNING_ERRORS = (OSError, ValueError, TypeError, KeyError, ImportError)
+
+# One cache per process and directory, so a pool worker reuses its memory
+# cache across every ward it is handed
+_caches = {}
+
+
+def process_cache(directory):
+    if directory not in _caches:
+        from .cache import PlanCache
+        _caches[directory] = PlanCache(directory=directory)
+    return _caches[directory]
+
+
+class WardResult:
+    def __init__(self, source, label, plan=None, error=None, cached=False, metrics=None):
+        self.source = source
+        self.label = label
+        self.plan = plan
+        self.error = error
+        self.cached = cached
+        # The ward's instrument record when planned with trace on
+        self.metrics = metrics
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def plan_ward_file(path, mode=None, cache_dir=None, trace=False, profile_dir=None,
+                   history=None):
+    # Runs in a worker process. Every failure is returned rather than raised,
+    # so one bad roster only loses its own ward. history is the site-wide
+    # {nurse name: recent load}; each ward is only given its own nurses'.
+    if trace or profile_dir:
+        instrument.enable(profile_dir=profile_dir)
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        specs = load_ward_specs(path)
+        cache = process_cache(cache_dir) if cache_dir else None
+    except PLANNING_ERRORS as e:
+        return [WardResult(path, name, error=str(e))]
+    except Exception as e:
+        return [WardResult(path, name, error=f"Unexpected error: {e!r}")]
+
+    results = []
+    for spec in specs:
+        if mode:
+            spec["mode"] = mode
+        if history:
+            spec["history"] = {n['name']: history[n['name']]
+                               for n in normalize_nurses(spec["nurses"]) if n['name'] in history}
+        label = f"{spec['ward']}/{spec['shift']}" if spec["shift"] else spec["ward"]
+        with instrument.start_run(label) as run:
+            try:
+                if cache is None:
+                    result = WardResult(path, label, plan=plan_ward(**spec))
+                else:
+                    hits = cache.hits
+                    plan = cache.plan(**spec)
+                    result = WardResult(path, label, plan=plan, cached=cache.hits > hits)
+                    run.count("cache_hits", int(result.cached))
+            except PLANNING_ERRORS as e:
+                result = WardResult(path, label, error=str(e))
+            except Exception as e:
+                # A bug in one ward still mustn't cost the others theirs
+                result = WardResult(path, label, error=f"Unexpected error: {e!r}")
+        result.metrics = run.record()
+        results.append(result)
+    return results
+
+
+def _plan_ward_file_job(job):
+    return plan_ward_file(*job)
+
+
+def plan_wards(paths, mode=None, workers=None, serial=False, cache_dir=None,
+               trace=False, profile_dir=None, history=None):
+    # Yields WardResults in input order whether run serially or on a pool
+    jobs = [(path, mode, cache_dir, trace, profile_dir, history) for path in paths]
+    if serial or len(jobs) < 2:
+        for job in jobs:
+            yield from _plan_ward_file_job(job)
+        return
+
+    # Deferred: the multiprocessing machinery is the slowest import here
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    # A few chunks per worker keeps the pool busy without paying IPC per ward
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_plan_ward_file_job, jobs, chunksize=chunksize):
+            yield from results
+
+
+def summarize(results):
+    summary = {
+        "wards": 0,
+        "failed": 0,
+        "cached": 0,
+        "patients": 0,
+        "nurses": 0,
+        "required_nurses": 0,
+        "unsafe": [],
+        "acuity": {},
+        "plans": [],
+        "errors": [],
+    }
+    for result in results:
+        if not result.ok:
+            summary["failed"] += 1
+            summary["errors"].append({"ward": result.label, "source": result.source,
+                                      "error": result.error})
+            continue
+
+        ward = result.plan.summary()
+        summary["wards"] += 1
+        summary["cached"] += result.cached
+        summary["patients"] += ward["total_patients"]
+        summary["nurses"] += ward["nurses"]
+        summary["required_nurses"] += ward["required_nurses"]
+        if not ward["safe"]:
+            summary["unsafe"].append(result.label)
+        for acuity, count in ward["acuity"].items():
+            summary["acuity"][acuity] = summary["acuity"].get(acuity, 0) + count
+        summary["plans"].append(ward)
+    return summary
@@ -0,0 +1,392 @@
+import heapq
+
+from . import instrument
+from .engine import (ACUITY_CATEGORIES, ACUITY_ELIGIBILITY, ACUITY_WEIGHTS,
+                     SKILL_FACTORS, SKILL_LEVELS, WardPlan, allocation_warnings,
+                     build_patients, check_ratio, distribute_tasks, justify,
+                     normalize_nurses, patient_cap, split_acuity)
+
+
+def move(patient, source, target):
+    # source is None for an admission, target is None for a discharge
+    return {"patient": patient['id'], "acuity": patient['acuity'],
+            "from": source, "to": target}
+
+
+class IncrementalAllocator:
+    # Keeps an existing allocation balanced under small changes, moving as
+    # few patients as it can. Works on the allocation dict in place. Nurses
+    # sit in lazily invalidated heaps (least-loaded per skill, most-loaded
+    # overall), so each change costs O(moved patients * log N) rather than a
+    # pass over the ward.
+    # With ratio, nobody is given more than engine.patient_cap patients, as
+    # in a fresh balanced plan. total_patients is the patient count the cap
+    # is worked out for (the ward's new total when reconciling), or the
+    # current count if that is higher. A nurse found full at the top of a
+    # heap is parked until the cap rises; any change to them re-pushes them.
+    def __init__(self, allocation, acuity_weights=None, skill_factors=None,
+                 eligibility=None, ratio=None, total_patients=None):
+        self.allocation = allocation
+        self.acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+        self.skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+        self.eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+        self.ratio = ratio
+        self.total_patients = total_patients
+
+        self.owner = {}
+        self.version = {}
+        self.skill_counts = {skill: 0 for skill in SKILL_LEVELS}
+        self.min_heaps = {skill: [] for skill in SKILL_LEVELS}
+        self.max_heap = []
+        self.parked = []
+        self.parked_cap = None
+        self.touched = set()
+
+        for name, entry in allocation.items():
+            entry['load'] = sum(self.acuity_weights[p['acuity']] for p in entry['patients'])
+            for patient in entry['patients']:
+                self.owner[patient['id']] = name
+            self.skill_counts[entry['nurse']['skill']] += 1
+            self.version[name] = 0
+            self._push(name)
+
+    def scaled_load(self, name):
+        entry = self.allocation[name]
+        return entry['load'] / self.skill_factors[entry['nurse']['skill']]
+
+    def _push(self, name):
+        skill = self.allocation[name]['nurse']['skill']
+        key = self.scaled_load(name)
+        rank = SKILL_LEVELS.index(skill)
+        version = self.version[name]
+        heapq.heappush(self.min_heaps[skill], (key, rank, name, version))
+        heapq.heappush(self.max_heap, (-key, rank, name, version))
+
+        # Drop stale entries once they outnumber the live ones
+        if len(self.max_heap) > 4 * len(self.allocation) + 16:
+            self.max_heap = [e for e in self.max_heap if self._live(e)]
+            heapq.heapify(self.max_heap)
+            for s, heap in self.min_heaps.items():
+                self.min_heaps[s] = [e for e in heap if self._live(e)]
+                heapq.heapify(self.min_heaps[s])
+            self.parked = [e for e in self.parked if self._live(e)]
+
+    def _live(self, item):
+        name = item[2]
+        return name in self.allocation and self.version[name] == item[3]
+
+    def _peek(self, heap):
+        while heap and not self._live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def cap(self):
+        total = max(self.total_patients or 0, len(self.owner))
+        return patient_cap(total, len(self.allocation), self.ratio)
+
+    def full(self, name):
+        cap = self.cap()
+        return cap is not None and len(self.allocation[name]['patients']) >= cap
+
+    def _open(self, heap):
+        # Top live entry of a min-heap whose nurse has room
+        cap = self.cap()
+        if self.parked and (cap is None or cap > self.parked_cap):
+            for item in self.parked:
+                if self._live(item):
+                    skill = self.allocation[item[2]]['nurse']['skill']
+                    heapq.heappush(self.min_heaps[skill], item)
+            self.parked = []
+        self.parked_cap = cap
+        while True:
+            top = self._peek(heap)
+            if top is None or not self.full(top[2]):
+                return top
+            self.parked.append(heapq.heappop(heap))
+
+    def _changed(self, name):
+        self.version[name] += 1
+        self._push(name)
+        self.touched.add(name)
+
+    def eligible(self, acuity, skill):
+        # Falls back to any nurse when nobody eligible is on duty
+        allowed = self.eligibility[acuity]
+        return skill in allowed or not any(self.skill_counts[s] for s in allowed)
+
+    def least_loaded(self, acuity):
+        # The least-loaded eligible nurse with room, else the least-loaded
+        # nurse of any skill with room; only if everyone is full (the cap
+        # was worked out for fewer patients) is the cap ignored
+        skills = [s for s in self.eligibility[acuity] if self.skill_counts[s]] or SKILL_LEVELS
+        tops = [top for top in (self._open(self.min_heaps[s]) for s in skills) if top]
+        if not tops:
+            tops = [top for top in (self._open(self.min_heaps[s]) for s in SKILL_LEVELS) if top]
+        if not tops and self.allocation:
+            return min(self.allocation, key=lambda name: (
+                not self.eligible(acuity, self.allocation[name]['nurse']['skill']),
+                self.scaled_load(name)))
+        return min(tops)[2] if tops else None
+
+    def most_loaded(self):
+        top = self._peek(self.max_heap)
+        return top[2] if top else None
+
+    def _place(self, patient, source, target):
+        weight = self.acuity_weights[patient['acuity']]
+        if source is not None:
+            entry = self.allocation.get(source)
+            if entry is not None:
+                entry['patients'].remove(patient)
+                entry['load'] -= weight
+                self._changed(source)
+        if target is None:
+            self.owner.pop(patient['id'], None)
+        else:
+            entry = self.allocation[target]
+            entry['patients'].append(patient)
+            entry['load'] += weight
+            self.owner[patient['id']] = target
+            self._changed(target)
+        return move(patient, source, target)
+
+    def _find(self, patient_id):
+        name = self.owner.get(patient_id)
+        if name is None:
+            raise ValueError(f"Unknown patient: {patient_id}")
+        for patient in self.allocation[name]['patients']:
+            if patient['id'] == patient_id:
+                return name, patient
+
+    def _improves(self, patient, source, target):
+        # Moving helps only if the target ends up lighter than the source was
+        weight = self.acuity_weights[patient['acuity']]
+        skill = self.allocation[target]['nurse']['skill']
+        after = (self.allocation[target]['load'] + weight) / self.skill_factors[skill]
+        return after < self.scaled_load(source) - 1e-9
+
+    def _pull_into(self, name):
+        # Take patients off the busiest nurses while that narrows the gap
+        moves = []
+        skill = self.allocation[name]['nurse']['skill']
+        while not self.full(name):
+            donor = self.most_loaded()
+            if donor is None or donor == name:
+                break
+            best = None
+            for patient in self.allocation[donor]['patients']:
+                if not self.eligible(patient['acuity'], skill):
+                    continue
+                if not self._improves(patient, donor, name):
+                    continue
+                if best is None or self.acuity_weights[patient['acuity']] > self.acuity_weights[best['acuity']]:
+                    best = patient
+            if best is None:
+                break
+            moves.append(self._place(best, donor, name))
+        return moves
+
+    def add_nurse(self, nurse, reclaim=()):
+        # reclaim lists patient ids the nurse takes back first, such as
+        # their own patients after a break, where still on the ward and
+        # eligible; then they pull from the busiest nurses as usual
+        nurse = normalize_nurses([nurse])[0]
+        name = nurse['name']
+        if name in self.allocation:
+            raise ValueError(f"{name} is already on the allocation")
+
+        self.allocation[name] = {'nurse': nurse, 'patients': [], 'tasks': [],
+                                 'load': 0.0, 'justification': ''}
+        self.skill_counts[nurse['skill']] += 1
+        # Versions never reset, so heap entries from an earlier stint of a
+        # nurse with the same name stay stale
+        self.version.setdefault(name, 0)
+        self._changed(name)
+        moves = []
+        for patient_id in reclaim:
+            if patient_id not in self.owner:
+                continue
+            source, patient = self._find(patient_id)
+            if self.eligible(patient['acuity'], nurse['skill']) and not self.full(name):
+                moves.append(self._place(patient, source, name))
+        return moves + self._pull_into(name)
+
+    def remove_nurse(self, name):
+        if name not in self.allocation:
+            raise ValueError(f"Unknown nurse: {name}")
+        if len(self.allocation) == 1:
+            raise ValueError("Cannot remove the last nurse on the allocation")
+
+        entry = self.allocation.pop(name)
+        self.skill_counts[entry['nurse']['skill']] -= 1
+        self.touched.discard(name)
+
+        # Heaviest first, each to the least-loaded eligible nurse
+        moves = []
+        for patient in sorted(entry['patients'], key=lambda p: -self.acuity_weights[p['acuity']]):
+            moves.append(self._place(patient, None, self.least_loaded(patient['acuity'])))
+            moves[-1]['from'] = name
+        return moves
+
+    def set_skill(self, name, skill):
+        entry = self.allocation[name]
+        if skill not in SKILL_LEVELS:
+            raise ValueError(f"Unknown skill level: {skill}")
+        if entry['nurse']['skill'] == skill:
+            return []
+
+        self.skill_counts[entry['nurse']['skill']] -= 1
+        self.skill_counts[skill] += 1
+        entry['nurse'] = {**entry['nurse'], 'skill': skill}
+        self._changed(name)
+
+        moves = []
+        for patient in list(entry['patients']):
+            if not self.eligible(patient['acuity'], skill):
+                target = self.least_loaded(patient['acuity'])
+                if target is not None and target != name:
+                    moves.append(self._place(patient, name, target))
+        return moves
+
+    def set_acuity(self, patient_id, acuity):
+        if acuity not in ACUITY_CATEGORIES:
+            raise ValueError(f"Unknown acuity: {acuity}")
+        name, patient = self._find(patient_id)
+        if patient['acuity'] == acuity:
+            return []
+
+        entry = self.allocation[name]
+        entry['load'] += self.acuity_weights[acuity] - self.acuity_weights[patient['acuity']]
+        patient['acuity'] = acuity
+        self._changed(name)
+
+        # Move only this patient, and only if their nurse can no longer take
+        # them or someone else is now clearly lighter
+        target = self.least_loaded(acuity)
+        if target is None or target == name:
+            return []
+        if not self.eligible(acuity, entry['nurse']['skill']) or self._improves(patient, name, target):
+            return [self._place(patient, name, target)]
+        return []
+
+    def admit(self, patient):
+        if patient['id'] in self.owner:
+            raise ValueError(f"Patient {patient['id']} is already allocated")
+        if patient['acuity'] not in ACUITY_CATEGORIES:
+            raise ValueError(f"Unknown acuity: {patient['acuity']}")
+        return [self._place(patient, None, self.least_loaded(patient['acuity']))]
+
+    def discharge(self, patient_id):
+        name, patient = self._find(patient_id)
+        return [self._place(patient, name, None)]
+
+    def shed(self):
+        # Moves patients off nurses over the cap, lightest first, such as
+        # after an arrival lowers it or in a plan made without a ratio.
+        # O(N) to find them, so reconcile calls it once at the end.
+        cap = self.cap()
+        if cap is None:
+            return []
+        moves = []
+        for name in [n for n, entry in self.allocation.items() if len(entry['patients']) > cap]:
+            entry = self.allocation[name]
+            for patient in sorted(entry['patients'], key=lambda p: self.acuity_weights[p['acuity']]):
+                if len(entry['patients']) <= cap:
+                    break
+                target = self.least_loaded(patient['acuity'])
+                if target is not None and target != name and not self.full(target):
+                    moves.append(self._place(patient, name, target))
+        return moves
+
+    def refresh_justifications(self):
+        for name in self.touched:
+            if name in self.allocation:
+                self.allocation[name]['justification'] = justify(self.allocation[name])
+        self.touched.clear()
+
+
+def replan(plan, nurses, total_patients, ratio, acuity_counts=None, tasks=(),
+           notes="", acuity_weights=None, skill_factors=None):
+    # Brings a previous WardPlan up to date with new inputs, keeping every
+    # patient with their nurse unless a change forces a move. The new plan
+    # takes over the old plan's allocation; plan.moves lists who moved.
+    # Only balanced plans: moves would break up contiguous runs, and an
+    # optimal plan would come back balanced but still labelled optimal.
+    if plan.mode != "balanced":
+        raise ValueError(f"Only balanced plans can be replanned incrementally; "
+                         f"plan {plan.mode} mode afresh")
+    nurses = normalize_nurses(nurses)
+    if not nurses:
+        raise ValueError("Please add at least one nurse")
+
+    total_patients = int(total_patients)
+    ratio = int(ratio)
+    if total_patients < 0:
+        raise ValueError("Total patients cannot be negative")
+    if acuity_counts is None:
+        acuity_counts = split_acuity(total_patients)
+    acuity_counts = {acuity: int(acuity_counts.get(acuity) or 0)
+                     for acuity in ACUITY_CATEGORIES}
+
+    safe, safety_message = check_ratio(total_patients, ratio, len(nurses))
+    with instrument.span("patients"):
+        patients, warnings = build_patients(total_patients, acuity_counts)
+    instrument.count("patients", len(patients))
+    instrument.count("nurses", len(nurses))
+
+    with instrument.span("distribute"):
+        moves = reconcile(plan.allocation, nurses, patients, acuity_weights, skill_factors,
+                          ratio)
+    instrument.count("moves", len(moves))
+
+    allocation = plan.allocation
+    warnings += allocation_warnings(allocation, ratio)
+    with instrument.span("tasks"):
+        warnings += distribute_tasks(allocation, tasks, acuity_counts, skill_factors)
+
+    new_plan = WardPlan(plan.ward, total_patients, ratio, nurses, acuity_counts,
+                        allocation, safe, safety_message, warnings, notes,
+                        plan.mode, None, plan.shift, plan.layout)
+    new_plan.moves = moves
+    return new_plan
+
+
+def reconcile(allocation, nurses, patients, acuity_weights=None, skill_factors=None,
+              ratio=None):
+    # Applies the new roster and patient list to an allocation in place and
+    # returns the moves made. With ratio, nobody ends up over patient_cap.
+    allocator = IncrementalAllocator(allocation, acuity_weights, skill_factors,
+                                     ratio=ratio, total_patients=len(patients))
+    moves = []
+
+    # Discharges first, so leavers' patients aren't moved only to go home
+    # and the cap isn't worked out for patients who have left
+    current = {patient['id']: patient['acuity']
+               for entry in allocator.allocation.values() for patient in entry['patients']}
+    incoming = {patient['id']: patient for patient in patients}
+    for patient_id in current.keys() - incoming.keys():
+        moves += allocator.discharge(patient_id)
+
+    # Nurses: arrivals first so leavers' patients have somewhere to go
+    wanted = {nurse['name']: nurse for nurse in nurses}
+    for name, nurse in wanted.items():
+        if name not in allocator.allocation:
+            moves += allocator.add_nurse(nurse)
+        else:
+            moves += allocator.set_skill(name, nurse['skill'])
+    for name in [n for n in allocator.allocation if n not in wanted]:
+        moves += allocator.remove_nurse(name)
+
+    # Patients: acuity changes, then admissions
+    for patient_id, patient in incoming.items():
+        if patient_id not in current:
+            continue
+        if current[patient_id] != patient['acuity']:
+            moves += allocator.set_acuity(patient_id, patient['acuity'])
+    for patient_id, patient in incoming.items():
+        if patient_id not in current:
+            moves += allocator.admit(patient)
+    moves += allocator.shed()
+
+    allocator.refresh_justifications()
+    return moves
@@ -0,0 +1,245 @@
+import os
+import time
+from datetime import datetime
+
+# Timing spans and counters for "why is generate slow today". Nothing is
+# recorded until enable() is called: span() then hands back one shared null
+# context and count() returns at once, so instrumented code costs a global
+# lookup and a call when it is off.
+#
+# Work is grouped into runs (one Generate click, one ward in a batch). Spans
+# and counters land on the current run; a finished run becomes one record,
+#   {"run": "generate", "at": "...", "seconds": 0.012,
+#    "spans": {"distribute": 0.004, ...}, "counters": {"patients": 28, ...}}
+# appended to the JSON lines log and passed to any listeners (the GUI
+# status bar). With a profile_dir each run is also profiled with cProfile
+# and its stats dumped there as <run>-<time>.prof. cProfile only sees the
+# thread that enabled it, so work a run hands to another thread goes inside
+# run.profile_thread() on that thread to be included.
+
+_recorder = None
+
+
+class NullSpan:
+    # contextlib.nullcontext, without importing contextlib
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("run", "name", "started")
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.run.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Run:
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.at = datetime.now()
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = {}
+        self.counters = {}
+        self.profile_path = None
+        self.profiler = None
+        # Finished profiles of other threads, merged into this run's dump
+        self.thread_profiles = []
+        if recorder.profile_dir is not None:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def add(self, name, seconds):
+        # Repeated spans of one name (report chunks) add up
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def profile_thread(self):
+        # Context manager profiling the calling thread into this run
+        if self.profiler is None:
+            return NULL_SPAN
+        return ThreadProfile(self)
+
+    def record(self):
+        record = {
+            "run": self.name,
+            "at": self.at.isoformat(timespec='milliseconds'),
+            "seconds": self.seconds,
+            "spans": self.spans,
+            "counters": self.counters,
+        }
+        if self.profile_path:
+            record["profile"] = self.profile_path
+        return record
+
+    def finish(self):
+        if self.seconds is not None:
+            return self.record()
+        self.seconds = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+            stamp = self.at.strftime('%Y%m%d-%H%M%S-%f')
+            name = "".join(c if c.isalnum() else "_" for c in self.name)
+            self.profile_path = os.path.join(self.recorder.profile_dir, f"{name}-{stamp}.prof")
+            import pstats
+            stats = pstats.Stats(self.profiler)
+            for profiler in self.thread_profiles:
+                stats.add(profiler)
+            stats.dump_stats(self.profile_path)
+            self.profiler = None
+        return self.recorder.finished(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+
+class ThreadProfile:
+    __slots__ = ("run", "profiler")
+
+    def __init__(self, run):
+        import cProfile
+        self.run = run
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.run.thread_profiles.append(self.profiler)
+        return False
+
+
+class NullRun:
+    # What start_run() returns while instrumentation is off
+    def count(self, name, value=1):
+        pass
+
+    def profile_thread(self):
+        return NULL_SPAN
+
+    def record(self):
+        return None
+
+    def finish(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_RUN = NullRun()
+
+
+class Recorder:
+    def __init__(self, log_path=None, profile_dir=None):
+        self.log_path = log_path
+        self.profile_dir = profile_dir
+        self.current = None
+        self.last = None
+        self.listeners = []
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def start(self, name):
+        # One run at a time: starting a new one finishes the one it replaces
+        # (cProfile can't nest either)
+        if self.current is not None:
+            self.current.finish()
+        self.current = Run(self, name)
+        return self.current
+
+    def finished(self, run):
+        if self.current is run:
+            self.current = None
+        record = run.record()
+        self.last = record
+        if self.log_path:
+            write_record(self.log_path, record)
+        for listener in self.listeners:
+            listener(record)
+        return record
+
+
+def write_record(path, record):
+    import json
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, separators=(',', ':')))
+        f.write("\n")
+
+
+def enable(log_path=None, profile_dir=None):
+    # Idempotent: an existing recorder is kept (and given the log or profile
+    # directory if it had none)
+    global _recorder
+    if _recorder is None:
+        _recorder = Recorder(log_path, profile_dir)
+    else:
+        _recorder.log_path = _recorder.log_path or log_path
+        if profile_dir and _recorder.profile_dir is None:
+            os.makedirs(profile_dir, exist_ok=True)
+            _recorder.profile_dir = profile_dir
+    return _recorder
+
+
+def disable():
+    global _recorder
+    if _recorder is not None and _recorder.current is not None:
+        _recorder.current.finish()
+    _recorder = None
+
+
+def enabled():
+    return _recorder is not None
+
+
+def recorder():
+    return _recorder
+
+
+def start_run(name):
+    if _recorder is None:
+        return NULL_RUN
+    return _recorder.start(name)
+
+
+def span(name):
+    if _recorder is None or _recorder.current is None:
+        return NULL_SPAN
+    return Span(_recorder.current, name)
+
+
+def count(name, value=1):
+    if _recorder is not None and _recorder.current is not None:
+        _recorder.current.count(name, value)
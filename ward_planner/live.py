@@ -0,0 +1,299 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from .engine import ACUITY_CATEGORIES, allocation_warnings, check_ratio, distribute_tasks
+from .incremental import IncrementalAllocator
+from .report import write_report
+
+# Live rebalancing from an event feed. The feed is a JSON lines file that
+# something else (an ADT interface, a ward clerk's tool) appends to, one
+# event per line:
+#
+#   {"type": "admit", "bed": 31, "acuity": "High"}
+#   {"type": "discharge", "bed": 12}
+#   {"type": "acuity", "bed": 5, "acuity": "Moderate"}
+#   {"type": "break", "nurse": "Ann"}     covered by the others meanwhile
+#   {"type": "return", "nurse": "Ann"}    takes their own patients back
+#
+# Any other keys (a timestamp, who sent it) are ignored. Every event lands
+# in memory as soon as it is read, but events are applied in batches: the
+# first event after a quiet spell opens a window of `window` seconds, and
+# everything read by the time it closes is folded into its net effect (an
+# admission then discharge of the same bed cancels out, the last acuity for
+# a bed wins) and applied through IncrementalAllocator in one go. So a
+# burst costs one rebalance and one update, and no event waits much longer
+# than the window.
+
+EVENT_TYPES = ("admit", "discharge", "acuity", "break", "return")
+DEFAULT_WINDOW = 0.5
+# How often an idle feed is checked for new lines
+POLL_INTERVAL = 0.05
+
+
+def parse_event(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        raise ValueError("Event is not JSON")
+    if not isinstance(event, dict) or event.get("type") not in EVENT_TYPES:
+        raise ValueError(f"Event type must be one of {', '.join(EVENT_TYPES)}")
+    if event["type"] in ("break", "return"):
+        if not event.get("nurse"):
+            raise ValueError(f"'{event['type']}' event is missing 'nurse'")
+        return {"type": event["type"], "nurse": str(event["nurse"]).strip()}
+    try:
+        bed = int(event["bed"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"'{event['type']}' event needs a whole-number 'bed'")
+    if event["type"] == "discharge":
+        return {"type": "discharge", "bed": bed}
+    if event.get("acuity") not in ACUITY_CATEGORIES:
+        raise ValueError(f"'{event['type']}' event needs an acuity of "
+                         f"{', '.join(ACUITY_CATEGORIES)}")
+    return {"type": event["type"], "bed": bed, "acuity": event["acuity"]}
+
+
+class LiveWard:
+    def __init__(self, plan, tasks=(), acuity_weights=None, skill_factors=None):
+        # Takes over plan's allocation and keeps it up to date, within the
+        # plan's ratio. Only balanced plans, as with incremental.replan:
+        # rebalancing would break up contiguous runs and undo an optimal
+        # assignment while the plan still claimed its mode.
+        if plan.mode != "balanced":
+            raise ValueError("Only balanced plans can be followed live; "
+                             "plan the ward in balanced mode")
+        self.plan = plan
+        self.tasks = list(tasks)
+        self.skill_factors = skill_factors
+        self.allocator = IncrementalAllocator(plan.allocation, acuity_weights, skill_factors,
+                                              ratio=plan.ratio)
+        # name -> (nurse, ids of the patients they had when they left)
+        self.breaks = {}
+        self.updates = 0
+        self.refresh()
+
+    @property
+    def allocation(self):
+        return self.allocator.allocation
+
+    def beds(self):
+        # {bed: acuity} for every patient on the ward
+        return {p['id']: p['acuity'] for entry in self.allocation.values()
+                for p in entry['patients']}
+
+    def coalesce(self, events):
+        # The net effect of a batch as
+        # (returns, discharges, breaks, acuity changes, admissions), plus a
+        # warning for each event that doesn't fit the state it arrives in
+        beds = self.beds()
+        final = dict(beds)
+        away = set(self.breaks)
+        on_duty = set(self.allocation)
+        warnings = []
+        for event in events:
+            kind = event["type"]
+            if kind in ("break", "return"):
+                name = event["nurse"]
+                if kind == "break" and name in on_duty:
+                    on_duty.discard(name)
+                    away.add(name)
+                elif kind == "return" and name in away:
+                    away.discard(name)
+                    on_duty.add(name)
+                else:
+                    state = "on break" if name in away else "on duty" if name in on_duty \
+                        else "not on this ward"
+                    warnings.append(f"Ignored {kind} for {name}: {state}")
+                continue
+            bed = event["bed"]
+            if kind == "discharge":
+                if final.pop(bed, None) is None:
+                    warnings.append(f"Ignored discharge of bed {bed}: not occupied")
+            elif kind == "admit" and bed in final:
+                warnings.append(f"Ignored admission to bed {bed}: already occupied")
+            elif kind == "acuity" and bed not in final:
+                warnings.append(f"Ignored acuity change for bed {bed}: not occupied")
+            else:
+                final[bed] = event["acuity"]
+
+        returns = [name for name in self.breaks if name not in away]
+        leaving = [name for name in self.allocation if name not in on_duty]
+        discharges = [bed for bed in beds if bed not in final]
+        changes = [(bed, acuity) for bed, acuity in final.items()
+                   if bed in beds and beds[bed] != acuity]
+        admissions = [(bed, acuity) for bed, acuity in final.items() if bed not in beds]
+        return (returns, discharges, leaving, changes, admissions), warnings
+
+    def apply(self, events):
+        # Applies a batch of parsed events and returns (moves, warnings).
+        # Nurses come back first so there is room for what follows, and
+        # breaks are taken before admissions so nobody is handed a patient
+        # just as they leave.
+        (returns, discharges, leaving, changes, admissions), warnings = self.coalesce(events)
+        allocator = self.allocator
+        # The cap is worked out for the ward as it will be after the batch
+        allocator.total_patients = len(self.beds()) - len(discharges) + len(admissions)
+        moves = []
+        for name in returns:
+            nurse, patients = self.breaks.pop(name)
+            moves += allocator.add_nurse(nurse, reclaim=patients)
+        for bed in discharges:
+            moves += allocator.discharge(bed)
+        for name in leaving:
+            if len(self.allocation) == 1:
+                warnings.append(f"Ignored break for {name}: nobody else is on duty")
+                continue
+            entry = self.allocation[name]
+            self.breaks[name] = (entry['nurse'], [p['id'] for p in entry['patients']])
+            moves += allocator.remove_nurse(name)
+        for bed, acuity in changes:
+            moves += allocator.set_acuity(bed, acuity)
+        for bed, acuity in admissions:
+            moves += allocator.admit({"id": bed, "acuity": acuity})
+        moves += allocator.shed()
+        warnings += self.refresh()
+        self.plan.moves = moves
+        self.plan.warnings = warnings
+        self.updates += 1
+        return moves, warnings
+
+    def refresh(self):
+        # Counts, safety, tasks and justifications after a batch; returns
+        # staffing and task warnings
+        plan = self.plan
+        beds = self.beds()
+        plan.acuity_counts = {acuity: 0 for acuity in ACUITY_CATEGORIES}
+        for acuity in beds.values():
+            plan.acuity_counts[acuity] += 1
+        plan.total_patients = len(beds)
+        plan.safe, plan.safety_message = check_ratio(len(beds), plan.ratio, len(self.allocation))
+        warnings = allocation_warnings(self.allocation, plan.ratio)
+        warnings += distribute_tasks(self.allocation, self.tasks, plan.acuity_counts,
+                                     self.skill_factors)
+        self.allocator.refresh_justifications()
+        return warnings
+
+    def snapshot(self):
+        plan = self.plan
+        return {
+            "ward": plan.ward,
+            "update": self.updates,
+            "patients": plan.total_patients,
+            "acuity": dict(plan.acuity_counts),
+            "nurses_on_duty": len(self.allocation),
+            "on_break": list(self.breaks),
+            "safe": plan.safe,
+            "moves": [dict(m) for m in plan.moves],
+            "warnings": list(plan.warnings),
+            "allocation": [{
+                "nurse": name,
+                "skill": entry['nurse']['skill'],
+                "beds": sorted(p['id'] for p in entry['patients']),
+                "load": entry['load'],
+                "tasks": list(entry['tasks']),
+            } for name, entry in self.allocation.items()],
+        }
+
+
+def write_atomic(path, write):
+    # Readers (a ward terminal showing the report) never see half a file
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class FeedReader:
+    # Reads whole lines appended to a file, from where it was opened. A
+    # line still being written is held until its newline arrives, and a
+    # file that shrinks (truncated or replaced) is read again from the top.
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.f = open(path, 'r')
+        if not from_start:
+            self.f.seek(0, os.SEEK_END)
+        self.partial = ""
+
+    def close(self):
+        self.f.close()
+
+    def lines(self):
+        # Every complete line available now
+        lines = []
+        while True:
+            chunk = self.f.readline()
+            if not chunk:
+                break
+            if not chunk.endswith("\n"):
+                self.partial += chunk
+                break
+            lines.append(self.partial + chunk)
+            self.partial = ""
+        if not lines:
+            try:
+                size = os.stat(self.path).st_size
+            except OSError:
+                size = None
+            if size is not None and size < self.f.tell():
+                self.f.close()
+                self.f = open(self.path, 'r')
+                self.partial = ""
+        return lines
+
+
+def follow(live, reader, emit, window=DEFAULT_WINDOW, once=False, clock=time.monotonic,
+           sleep=time.sleep):
+    # Feeds reader's events to live in coalesced batches, calling
+    # emit(snapshot, latencies) after each. latencies are the seconds each
+    # event of the batch waited between being read and being applied. With
+    # once, stops when the feed has nothing more instead of waiting.
+    pending = []
+    deadline = None
+    while True:
+        now = clock()
+        for line in reader.lines():
+            if not line.strip():
+                continue
+            try:
+                pending.append((parse_event(line), now))
+            except ValueError as e:
+                print(f"live: warning: {e}: {line.strip()[:80]}", file=sys.stderr)
+                continue
+            if deadline is None:
+                deadline = now + window
+        now = clock()
+        if pending and (now >= deadline or once):
+            live.apply([event for event, _ in pending])
+            done = clock()
+            emit(live.snapshot(), [done - read for _, read in pending])
+            pending = []
+            deadline = None
+            continue
+        if once and not pending:
+            return
+        sleep(POLL_INTERVAL if deadline is None else max(0.0, min(POLL_INTERVAL, deadline - now)))
+
+
+def update_writer(live, out=None, report=None):
+    # An emit() for follow(): one JSON line per update to out (a file
+    # object), and live's full report rewritten at the report path
+    def emit(snapshot, latencies):
+        record = {"at": datetime.now().isoformat(timespec='seconds'),
+                  "events": len(latencies),
+                  "latency_ms": round(max(latencies, default=0.0) * 1000, 1), **snapshot}
+        if out is not None:
+            out.write(json.dumps(record, separators=(',', ':')) + "\n")
+            out.flush()
+        if report:
+            write_atomic(report, lambda f: write_report(live.plan, f))
+    return emit
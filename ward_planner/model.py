@@ -0,0 +1,206 @@
+from array import array
+
+from .constants import (ACUITY_CATEGORIES, ACUITY_CODES, DEFAULT_ACUITY,
+                        DEFAULT_SKILL, SKILL_CODES)
+from .tasks import pack_tasks
+
+# Compact planning model. A ward's patients are two parallel arrays (bed ids
+# and one-byte acuity codes) and an allocation is one nurse index per patient,
+# instead of a dict per patient and nested dicts per nurse. The dict shapes
+# used by the GUI, reports and exporters are produced on demand by the
+# adapters below.
+
+
+class Nurse:
+    # A plain slotted class rather than a dataclass: importing dataclasses
+    # (and inspect with it) is most of the package's import time
+    __slots__ = ("name", "skill")
+
+    def __init__(self, name, skill=DEFAULT_SKILL):
+        self.name = name
+        self.skill = skill
+
+    def __repr__(self):
+        return f"Nurse(name={self.name!r}, skill={self.skill!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Nurse):
+            return NotImplemented
+        return (self.name, self.skill) == (other.name, other.skill)
+
+    __hash__ = None
+
+    @property
+    def skill_code(self):
+        return SKILL_CODES[self.skill]
+
+    def as_dict(self):
+        return {"name": self.name, "skill": self.skill}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['skill'])
+
+
+def order_nurses(nurses):
+    # Senior first, one Nurse per name (a repeated name keeps its first
+    # position and its last skill, as the dict allocation always has)
+    by_name = {}
+    for nurse in sorted(nurses, key=lambda n: SKILL_CODES[n['skill']]):
+        by_name[nurse['name']] = nurse
+    return [Nurse.from_dict(n) for n in by_name.values()]
+
+
+class PatientTable:
+    __slots__ = ("ids", "acuity")
+
+    def __init__(self, ids=(), acuity=()):
+        self.ids = array('i', ids)
+        self.acuity = array('b', acuity)
+
+    @classmethod
+    def from_counts(cls, total_patients, acuity_counts):
+        # Same beds and warning as engine.build_patients, without a dict per bed
+        table = cls()
+        warnings = []
+        for acuity in ACUITY_CATEGORIES:
+            count = int(acuity_counts.get(acuity) or 0)
+            if count < 0:
+                raise ValueError(f"{acuity} acuity count cannot be negative")
+            table.acuity.extend(array('b', [ACUITY_CODES[acuity]]) * count)
+
+        built = len(table.acuity)
+        if built != total_patients:
+            warnings.append(
+                f"Acuity distribution ({built}) doesn't match total patients ({total_patients}). Adjusting...")
+            if built < total_patients:
+                table.acuity.extend(array('b', [ACUITY_CODES[DEFAULT_ACUITY]]) * (total_patients - built))
+            else:
+                del table.acuity[total_patients:]
+
+        table.ids = array('i', range(1, len(table.acuity) + 1))
+        return table, warnings
+
+    @classmethod
+    def from_dicts(cls, patients):
+        table = cls()
+        for patient in patients:
+            if patient['acuity'] not in ACUITY_CODES:
+                raise ValueError(f"Unknown acuity: {patient['acuity']}")
+            table.ids.append(patient['id'])
+            table.acuity.append(ACUITY_CODES[patient['acuity']])
+        return table
+
+    def __len__(self):
+        return len(self.ids)
+
+    def as_dict(self, row):
+        return {"id": self.ids[row], "acuity": ACUITY_CATEGORIES[self.acuity[row]]}
+
+    def to_dicts(self):
+        return [{"id": pid, "acuity": ACUITY_CATEGORIES[code]}
+                for pid, code in zip(self.ids, self.acuity)]
+
+    def counts(self):
+        counts = [0] * len(ACUITY_CATEGORIES)
+        for code in self.acuity:
+            counts[code] += 1
+        return dict(zip(ACUITY_CATEGORIES, counts))
+
+
+class CompactAllocation:
+    # assignment[row] is the index into nurses of the nurse caring for
+    # patient row, or -1 if unassigned. loads holds each nurse's weighted load;
+    # tasks maps nurse index to task names and only has nurses with tasks.
+    # task_minutes and spare are per nurse: time on tasks, and shift time left
+    # after patients and tasks (negative when over), as tasks.pack_tasks
+    # leaves them.
+    __slots__ = ("nurses", "patients", "assignment", "loads", "tasks",
+                 "task_minutes", "spare")
+
+    def __init__(self, nurses, patients, assignment=None, loads=None, tasks=None,
+                 task_minutes=None, spare=None):
+        self.nurses = nurses
+        self.patients = patients
+        self.assignment = array('i', [-1]) * len(patients) if assignment is None else assignment
+        self.loads = array('d', [0.0]) * len(nurses) if loads is None else loads
+        self.tasks = tasks or {}
+        self.task_minutes = array('d', [0.0]) * len(nurses) if task_minutes is None else task_minutes
+        self.spare = array('d', [0.0]) * len(nurses) if spare is None else spare
+
+    def __len__(self):
+        return len(self.nurses)
+
+    def assign_tasks(self, tasks, acuity_counts=None, skill_factors=None):
+        # Packs tasks onto the time left after patient care, as
+        # engine.distribute_tasks does for the dict shape; returns warnings
+        self.tasks, minutes, spare, warnings = pack_tasks(
+            [nurse.skill for nurse in self.nurses], self.loads, tasks,
+            acuity_counts, skill_factors)
+        self.task_minutes = array('d', minutes)
+        self.spare = array('d', spare)
+        return warnings
+
+    def acuity_by_nurse(self):
+        # Flat (nurse, acuity) count table: counts[n * 3 + code]
+        width = len(ACUITY_CATEGORIES)
+        counts = array('i', [0]) * (len(self.nurses) * width)
+        for nurse, code in zip(self.assignment, self.patients.acuity):
+            if nurse >= 0:
+                counts[nurse * width + code] += 1
+        return counts
+
+    def to_allocation(self, patient_dicts=None):
+        # Adapter to the {name: {'nurse', 'patients', 'tasks', 'load',
+        # 'justification'}} shape. Patients are listed per nurse by acuity
+        # (High first) then bed, the order the balanced allocator hands
+        # them out. patient_dicts, if given, are reused instead of new dicts.
+        entries = [{
+            'nurse': nurse.as_dict(),
+            'patients': [],
+            'tasks': list(self.tasks.get(i, [])),
+            'task_minutes': self.task_minutes[i],
+            'spare_minutes': self.spare[i],
+            'load': self.loads[i],
+            'justification': ''
+        } for i, nurse in enumerate(self.nurses)]
+
+        assignment = self.assignment
+        acuity = self.patients.acuity
+        for code in range(len(ACUITY_CATEGORIES)):
+            for row in range(len(assignment)):
+                if acuity[row] == code and assignment[row] >= 0:
+                    patient = patient_dicts[row] if patient_dicts is not None else self.patients.as_dict(row)
+                    entries[assignment[row]]['patients'].append(patient)
+
+        return {nurse.name: entry for nurse, entry in zip(self.nurses, entries)}
+
+    @classmethod
+    def from_allocation(cls, allocation, acuity_weights=None):
+        # Adapter from the dict shape; rows follow the allocation's order
+        nurses = []
+        ids = array('i')
+        codes = array('b')
+        assignment = array('i')
+        loads = array('d')
+        tasks = {}
+        task_minutes = array('d')
+        spare = array('d')
+        for index, entry in enumerate(allocation.values()):
+            nurses.append(Nurse.from_dict(entry['nurse']))
+            for patient in entry['patients']:
+                ids.append(patient['id'])
+                codes.append(ACUITY_CODES[patient['acuity']])
+                assignment.append(index)
+            if entry.get('load') is None and acuity_weights:
+                loads.append(sum(acuity_weights[p['acuity']] for p in entry['patients']))
+            else:
+                loads.append(entry.get('load') or 0.0)
+            if entry['tasks']:
+                tasks[index] = list(entry['tasks'])
+            task_minutes.append(entry.get('task_minutes') or 0.0)
+            spare.append(entry.get('spare_minutes') or 0.0)
+        patients = PatientTable()
+        patients.ids = ids
+        patients.acuity = codes
+        return cls(nurses, patients, assignment, loads, tasks, task_minutes, spare)
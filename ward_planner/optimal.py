@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+from .engine import (ACUITY_CATEGORIES, ACUITY_WEIGHTS, SKILL_FACTORS,
+                     SKILL_LEVELS, group_by_acuity, justify, new_allocation)
+
+# Cost of giving one patient of each acuity (columns: High, Moderate, Low)
+# to a nurse of each skill level (rows: Senior, Intermediate, Junior).
+# Seniors on low acuity waste skill, juniors on high acuity are unsafe.
+SKILL_ACUITY_COST = [
+    [0.0, 1.0, 2.0],
+    [3.0, 0.0, 0.5],
+    [10.0, 1.0, 0.0],
+]
+# Extra cost per patient already on a nurse's list, scaled by the patient's
+# acuity weight and the nurse's skill factor. It grows with every patient so
+# the solver spreads load instead of stacking the cheapest nurse.
+BALANCE_WEIGHT = 1.0
+# Cost of each patient beyond the ratio when the ward is understaffed
+OVER_RATIO_PENALTY = 50.0
+
+
+def build_cost_matrix(nurses, ratio, slots_per_nurse, acuity_weights, skill_factors,
+                      balance_weight=BALANCE_WEIGHT):
+    # Every nurse gets slots_per_nurse consecutive slots; slot k belongs to
+    # nurse k // slots_per_nurse and is their (k % slots_per_nurse)-th patient.
+    # Returns a (acuity, slot) matrix.
+    skills = np.array([SKILL_LEVELS.index(n['skill']) for n in nurses])
+    factors = np.array([skill_factors[n['skill']] for n in nurses], dtype=float)
+    weights = np.array([acuity_weights[a] for a in ACUITY_CATEGORIES], dtype=float)
+    rank = np.arange(slots_per_nurse)
+
+    cost = np.asarray(SKILL_ACUITY_COST, dtype=float).T[:, skills, None]
+    cost = cost + balance_weight * weights[:, None, None] * rank[None, None, :] / factors[None, :, None]
+    cost = cost + np.where(rank >= ratio, OVER_RATIO_PENALTY, 0.0)[None, None, :]
+    return cost.reshape(len(ACUITY_CATEGORIES), -1)
+
+
+def solve_transport(cost, supply):
+    # Min-cost assignment of supply[i] identical patients of class i to
+    # single-patient slots, by successive shortest augmenting paths. Patients
+    # of one class are interchangeable, so the residual graph collapses to a
+    # handful of class nodes: an edge i -> j hands one of j's slots to class i
+    # (j then needs another), and a path ends when a class takes a free slot.
+    # Each augmentation is a few vectorised passes over the slots.
+    n_classes, n_slots = cost.shape
+    supply = np.array(supply, dtype=int)
+    if supply.sum() > n_slots:
+        raise ValueError("More patients than slots")
+
+    classes = np.arange(n_classes)
+    owner = np.full(n_slots, -1)
+    # diff[i, j, k]: change in cost when slot k moves from class j to class i
+    diff = cost[:, None, :] - cost[None, :, :]
+
+    for _ in range(int(supply.sum())):
+        held = owner[None, :] == classes[:, None]
+        masked = np.where(held[None, :, :], diff, np.inf)
+        hop_slot = masked.argmin(axis=2)
+        hop = np.take_along_axis(masked, hop_slot[:, :, None], axis=2)[:, :, 0]
+
+        free = np.where(owner[None, :] < 0, cost, np.inf)
+        exit_slot = free.argmin(axis=1)
+        exit_cost = free[classes, exit_slot]
+
+        # Bellman-Ford from every class that still has patients to place
+        dist = np.where(supply > 0, 0.0, np.inf)
+        prev = np.full(n_classes, -1)
+        for _ in range(n_classes - 1):
+            cand = dist[:, None] + hop
+            best_from = cand.argmin(axis=0)
+            best = cand[best_from, classes]
+            improved = best < dist - 1e-9
+            dist = np.where(improved, best, dist)
+            prev = np.where(improved, best_from, prev)
+
+        # Walk the path back from the class that takes the free slot; each
+        # predecessor takes over its successor's slot
+        node = int(np.argmin(dist + exit_cost))
+        owner[exit_slot[node]] = node
+        for _ in range(n_classes):
+            if prev[node] < 0:
+                break
+            owner[hop_slot[prev[node], node]] = prev[node]
+            node = int(prev[node])
+        supply[node] -= 1
+
+    return owner
+
+
+def distribute_patients_optimal(patients, nurses, ratio, acuity_weights=None,
+                                skill_factors=None, balance_weight=BALANCE_WEIGHT):
+    acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+    skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+
+    allocation = new_allocation(nurses)
+    by_acuity = group_by_acuity(patients)
+    names = list(allocation.keys())
+    for entry in allocation.values():
+        entry['cost'] = 0.0
+
+    objective = 0.0
+    if patients:
+        # Capacity comes from the ratio; an understaffed ward gets just
+        # enough extra (penalised) slots to place everyone
+        slots = max(ratio, math.ceil(len(patients) / len(names)))
+        cost = build_cost_matrix([allocation[n]['nurse'] for n in names], ratio, slots,
+                                 acuity_weights, skill_factors, balance_weight)
+        owner = solve_transport(cost, [len(by_acuity[a]) for a in ACUITY_CATEGORIES])
+
+        queues = [iter(by_acuity[a]) for a in ACUITY_CATEGORIES]
+        for k in np.flatnonzero(owner >= 0):
+            acuity = int(owner[k])
+            entry = allocation[names[k // slots]]
+            entry['patients'].append(next(queues[acuity]))
+            entry['load'] += acuity_weights[ACUITY_CATEGORIES[acuity]]
+            entry['cost'] += float(cost[acuity, k])
+            objective += float(cost[acuity, k])
+
+    for entry in allocation.values():
+        entry['justification'] = (justify(entry).rstrip('.') +
+                                  f". Assignment cost {entry['cost']:.1f} of {objective:.1f} ward total.")
+
+    return allocation, objective
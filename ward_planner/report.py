@@ -0,0 +1,134 @@
+from datetime import datetime
+
+from . import instrument
+from .tasks import task_summary
+
+RULE = "=" * 60
+NURSE_RULE = "=" * 40
+SECTION_RULE = "-" * 40
+
+
+def bed_ranges(patient_ids):
+    patient_ids = sorted(patient_ids)
+    if not patient_ids:
+        return ""
+
+    ranges = []
+    start = end = patient_ids[0]
+    for pid in patient_ids[1:]:
+        if pid == end + 1:
+            end = pid
+        else:
+            ranges.append((start, end))
+            start = end = pid
+    ranges.append((start, end))
+
+    return ', '.join([f"{s}-{e}" if s != e else str(s) for s, e in ranges])
+
+
+def nurse_section(nurse_name, data):
+    lines = [
+        f"\n{NURSE_RULE}",
+        f"👩⚕️ NURSE: {nurse_name}",
+        f"📋 Skill Level: {data['nurse']['skill']}",
+        f"🛌 Patients Assigned: {len(data['patients'])}",
+    ]
+    if data['patients']:
+        lines.append(f"📍 Bed Assignment: {bed_ranges([p['id'] for p in data['patients']])}")
+
+    # Acuity breakdown, as counted when the allocation was justified
+    acuity_summary = data.get('acuity_counts')
+    if acuity_summary is None:
+        acuity_summary = {}
+        for p in data['patients']:
+            acuity_summary[p['acuity']] = acuity_summary.get(p['acuity'], 0) + 1
+    if acuity_summary:
+        lines.append(f"📈 Acuity Breakdown: {acuity_summary}")
+
+    lines.append(f"💡 {data['justification']}")
+    return "\n".join(lines) + "\n"
+
+
+def iter_report(plan, now=None):
+    # Yields the report one section at a time; "".join() of the sections is
+    # the full text. Each section is built with a single join, so rendering
+    # is linear in the size of the allocation.
+    now = now or datetime.now()
+    allocation = plan.allocation
+
+    header = [RULE, "WARD SHIFT ALLOCATION REPORT"]
+    if plan.ward:
+        header.append(f"Ward: {plan.ward}")
+    if plan.shift:
+        header.append(f"Shift: {plan.shift}")
+    header += [f"Date: {now.strftime('%Y-%m-%d %H:%M')}", RULE, ""]
+
+    # Summary
+    header += [
+        "📊 SUMMARY",
+        f"Total Patients: {sum(plan.acuity_counts.values())}",
+        f"Nurses on Duty: {len(allocation)}",
+        f"Patient Acuity: {plan.acuity_counts}",
+    ]
+    if plan.objective is not None:
+        header.append(f"Allocation Cost: {plan.objective:.1f} ({plan.mode})")
+    yield "\n".join(header) + "\n\n"
+
+    # Individual allocations
+    for nurse_name, data in allocation.items():
+        yield nurse_section(nurse_name, data)
+
+    # Changes since the previous allocation
+    if plan.moves:
+        lines = [f"\n\n🔁 CHANGES SINCE LAST ALLOCATION ({len(plan.moves)} moved)", SECTION_RULE]
+        for m in plan.moves:
+            source = m['from'] or "admitted"
+            target = m['to'] or "discharged"
+            lines.append(f"Bed {m['patient']} ({m['acuity']}): {source} → {target}")
+        yield "\n".join(lines) + "\n"
+
+    # Bed geography: how scattered each nurse's beds are along the ward
+    metrics = plan.bed_metrics()
+    if metrics is not None:
+        lines = ["\n\n🚶 BED GEOGRAPHY", SECTION_RULE,
+                 f"Runs per nurse: {metrics['runs_per_nurse']:.1f}, "
+                 f"bays per nurse: {metrics['bays_per_nurse']:.1f}, "
+                 f"walk: {metrics['walk_total']} beds in all, {metrics['walk_max']} at most"]
+        for nurse_name, m in metrics['nurses'].items():
+            if m['runs']:
+                runs = "1 run" if m['runs'] == 1 else f"{m['runs']} runs"
+                bays = "1 bay" if m['bays'] == 1 else f"{m['bays']} bays"
+                lines.append(f"{nurse_name}: {runs}, {bays}, walk {m['walk']}")
+        yield "\n".join(lines) + "\n"
+
+    # Tasks distribution, with the time each nurse's tasks take and whether
+    # they push the nurse past the end of the shift
+    lines = ["\n\n📝 TASKS DISTRIBUTION", SECTION_RULE]
+    for nurse_name, data in allocation.items():
+        if not data['tasks']:
+            continue
+        line = f"\n{nurse_name}: {task_summary(data['tasks'])}"
+        minutes = data.get('task_minutes')
+        if minutes:
+            spare = data.get('spare_minutes') or 0.0
+            timing = f"{spare:.0f} min spare" if spare >= 0 else f"⚠️ {-spare:.0f} min over shift"
+            line += f" ({minutes:.0f} min, {timing})"
+        lines.append(line)
+    yield "\n".join(lines[:2]) + "\n" + "".join(lines[2:])
+
+    # Shift notes
+    if plan.notes:
+        yield "\n\n📋 SHIFT NOTES\n" + SECTION_RULE + "\n" + plan.notes
+
+    yield "\n\n" + RULE + "\n⚠️ REMINDER: This is a planning tool. Always use clinical judgment."
+
+
+def render_report(plan, now=None):
+    with instrument.span("render"):
+        return "".join(iter_report(plan, now))
+
+
+def write_report(plan, f, now=None):
+    with instrument.span("render"):
+        for section in iter_report(plan, now):
+            f.write(section)
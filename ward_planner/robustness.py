@@ -0,0 +1,271 @@
+import math
+import os
+import random
+
+from .constants import (ACUITY_CATEGORIES, ACUITY_ELIGIBILITY, ACUITY_WEIGHTS,
+                        SKILL_FACTORS, SKILL_LEVELS)
+from .engine import check_ratio
+from .incremental import reconcile
+from .synthetic import ACUITY_MIX
+
+# Monte Carlo robustness of a shift plan. Each scenario is one way the
+# shift could go after the plan is made: some patients are discharged,
+# some deteriorate or improve by one acuity level, a Poisson number are
+# admitted, and some nurses call in sick. The plan is brought up to date
+# with incremental.reconcile, the way the GUI's incremental mode or the
+# live feed would, and the result is checked against
+#   ratio      the ward needs more nurses than are left (check_ratio)
+#   overload   a nurse ends up with more work than a full ratio of
+#              Moderate patients, adjusted for their skill level (load over
+#              ratio * Moderate weight * skill factor)
+#   skill_mix  fewer nurses of a skill than its minimum, or a patient left
+#              with a nurse not eligible for their acuity
+# Scenarios run in fixed-size chunks, each with its own random.Random
+# seeded from (seed, chunk), so the figures depend only on the seed and
+# scenario count, never on how many workers ran them.
+
+DISCHARGE_PROB = 0.10
+DETERIORATE_PROB = 0.05
+IMPROVE_PROB = 0.05
+ADMIT_RATE = 2.0
+ABSENCE_PROB = 0.03
+DEFAULT_SKILL_MINIMUMS = {"Senior": 1}
+CHUNK = 250
+BREACHES = ("ratio", "overload", "skill_mix")
+
+
+class ScenarioModel:
+    def __init__(self, discharge=DISCHARGE_PROB, deteriorate=DETERIORATE_PROB,
+                 improve=IMPROVE_PROB, admit_rate=ADMIT_RATE, absence=ABSENCE_PROB,
+                 admit_mix=None, skill_minimums=None):
+        for name, p in (("discharge", discharge), ("deteriorate", deteriorate),
+                        ("improve", improve), ("absence", absence)):
+            if not 0 <= p <= 1:
+                raise ValueError(f"The {name} probability must be between 0 and 1")
+        if deteriorate + improve > 1:
+            raise ValueError("Deterioration and improvement can't add up to more than 1")
+        if admit_rate < 0:
+            raise ValueError("Admission rate cannot be negative")
+        self.discharge = discharge
+        self.deteriorate = deteriorate
+        self.improve = improve
+        self.admit_rate = admit_rate
+        self.absence = absence
+        mix = {**ACUITY_MIX, **(admit_mix or {})}
+        self.admit_weights = [mix[a] for a in ACUITY_CATEGORIES]
+        self.skill_minimums = {**DEFAULT_SKILL_MINIMUMS, **(skill_minimums or {})}
+
+    def poisson(self, rng):
+        # Knuth's method; admission rates per shift are small
+        limit = math.exp(-self.admit_rate)
+        k, product = 0, rng.random()
+        while product > limit:
+            k += 1
+            product *= rng.random()
+        return k
+
+    def sample(self, rng, patients, nurses, next_id):
+        # (patients, nurses present) for one scenario; patients are
+        # (id, acuity) pairs
+        outcome = []
+        top = len(ACUITY_CATEGORIES) - 1
+        for patient_id, acuity in patients:
+            if rng.random() < self.discharge:
+                continue
+            # ACUITY_CATEGORIES runs High to Low, so deteriorating is a step left
+            level = ACUITY_CATEGORIES.index(acuity)
+            roll = rng.random()
+            if roll < self.deteriorate:
+                level = max(0, level - 1)
+            elif roll < self.deteriorate + self.improve:
+                level = min(top, level + 1)
+            outcome.append((patient_id, ACUITY_CATEGORIES[level]))
+        admitted = self.poisson(rng)
+        if admitted:
+            acuities = rng.choices(ACUITY_CATEGORIES, self.admit_weights, k=admitted)
+            outcome.extend((next_id + i, acuity) for i, acuity in enumerate(acuities))
+        present = [nurse for nurse in nurses if rng.random() >= self.absence]
+        return outcome, present
+
+
+def base_state(plan):
+    # What a scenario starts from: the plan's patients and nurses, and who
+    # has each patient
+    patients = []
+    owner = {}
+    nurses = []
+    for name, entry in plan.allocation.items():
+        nurses.append(dict(entry['nurse']))
+        for patient in entry['patients']:
+            patients.append((patient['id'], patient['acuity']))
+            owner[patient['id']] = name
+    return patients, nurses, owner
+
+
+def empty_counts():
+    # Scenario counters, plus per-nurse counters keyed by name
+    return {"scenarios": 0, "breaches": {b: 0 for b in BREACHES}, "any": 0,
+            "patients": 0, "nurses": 0, "moves": 0,
+            "overloaded": {}, "absent": {}, "moved": {}, "present": {}}
+
+
+def run_chunk(job):
+    # Runs in a pool worker: the `count` scenarios of chunk `chunk`.
+    # Returns summed counters, merged by merge().
+    (patients, nurses, owner, ratio, model, acuity_weights, skill_factors,
+     seed, chunk, count) = job
+    rng = random.Random(seed * 1_000_003 + chunk)
+    next_id = max((p for p, _ in patients), default=0) + 1
+    weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+    factors = {**SKILL_FACTORS, **(skill_factors or {})}
+    capacity = {skill: ratio * weights["Moderate"] * factors[skill] for skill in SKILL_LEVELS}
+    counts = empty_counts()
+    for _ in range(count):
+        scenario_patients, present = model.sample(rng, patients, nurses, next_id)
+        counts["scenarios"] += 1
+        counts["patients"] += len(scenario_patients)
+        counts["nurses"] += len(present)
+        for nurse in nurses:
+            if nurse not in present:
+                counts["absent"][nurse['name']] = counts["absent"].get(nurse['name'], 0) + 1
+        breached = set()
+        if not present:
+            breached.update(BREACHES)
+        else:
+            allocation = {}
+            for nurse in nurses:
+                allocation[nurse['name']] = {'nurse': nurse, 'patients': [], 'tasks': [],
+                                             'load': 0.0, 'justification': ''}
+            for patient_id, acuity in patients:
+                allocation[owner[patient_id]]['patients'].append(
+                    {"id": patient_id, "acuity": acuity})
+            moves = reconcile(allocation, present,
+                              [{"id": p, "acuity": a} for p, a in scenario_patients],
+                              acuity_weights, skill_factors, ratio)
+            counts["moves"] += len(moves)
+            for m in moves:
+                # Only patients taken off a nurse who is still on shift
+                # count against continuity
+                if m['from'] in allocation and m['to'] is not None:
+                    counts["moved"][m['from']] = counts["moved"].get(m['from'], 0) + 1
+
+            if not check_ratio(len(scenario_patients), ratio, len(present))[0]:
+                breached.add("ratio")
+            skills = {skill: 0 for skill in SKILL_LEVELS}
+            for name, entry in allocation.items():
+                counts["present"][name] = counts["present"].get(name, 0) + 1
+                skill = entry['nurse']['skill']
+                skills[skill] += 1
+                if entry['load'] > capacity[skill] + 1e-9:
+                    breached.add("overload")
+                    counts["overloaded"][name] = counts["overloaded"].get(name, 0) + 1
+                if any(skill not in ACUITY_ELIGIBILITY[p['acuity']] for p in entry['patients']):
+                    breached.add("skill_mix")
+            if any(skills.get(skill, 0) < minimum
+                   for skill, minimum in model.skill_minimums.items()):
+                breached.add("skill_mix")
+        for breach in breached:
+            counts["breaches"][breach] += 1
+        counts["any"] += bool(breached)
+    return counts
+
+
+def merge(total, counts):
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            bucket = total.setdefault(key, {})
+            for name, n in value.items():
+                bucket[name] = bucket.get(name, 0) + n
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class Robustness:
+    def __init__(self, plan, counts, seed):
+        self.plan = plan
+        self.counts = counts
+        self.seed = seed
+
+    @property
+    def scenarios(self):
+        return self.counts["scenarios"]
+
+    def probability(self, breach="any"):
+        count = self.counts["any"] if breach == "any" else self.counts["breaches"][breach]
+        return count / self.scenarios if self.scenarios else 0.0
+
+    def fragile(self, top=5):
+        # Nurses whose assignment is least likely to survive the shift:
+        # overload probability while on shift, then patients moved off them
+        # per scenario
+        rows = []
+        for name, entry in self.plan.allocation.items():
+            present = self.counts["present"].get(name, 0)
+            rows.append({
+                "nurse": name,
+                "skill": entry['nurse']['skill'],
+                "patients": len(entry['patients']),
+                "overload": self.counts["overloaded"].get(name, 0) / present if present else 0.0,
+                "moved_per_scenario": self.counts["moved"].get(name, 0) / max(1, self.scenarios),
+                "absent": self.counts["absent"].get(name, 0) / max(1, self.scenarios),
+            })
+        rows.sort(key=lambda r: (-r["overload"], -r["moved_per_scenario"], r["nurse"]))
+        return rows[:top]
+
+    def to_dict(self, top=5):
+        scenarios = max(1, self.scenarios)
+        return {
+            "ward": self.plan.ward,
+            "scenarios": self.scenarios,
+            "seed": self.seed,
+            "breach_probability": {"any": self.probability(),
+                                   **{b: self.probability(b) for b in BREACHES}},
+            "mean_patients": self.counts["patients"] / scenarios,
+            "mean_nurses": self.counts["nurses"] / scenarios,
+            "mean_moves": self.counts["moves"] / scenarios,
+            "fragile": self.fragile(top),
+        }
+
+    def format_text(self, top=5):
+        data = self.to_dict(top)
+        lines = [f"{data['scenarios']} scenarios for {self.plan.label or 'the ward'} "
+                 f"(seed {self.seed}): on average {data['mean_patients']:.1f} patients, "
+                 f"{data['mean_nurses']:.1f} nurses, {data['mean_moves']:.1f} moves",
+                 "Breach probability: " + ", ".join(
+                     f"{name} {p:.1%}" for name, p in data["breach_probability"].items()),
+                 "",
+                 f"{'Most fragile':<20}  {'Skill':<12}  {'Patients':>8}  {'Overload':>8}  "
+                 f"{'Moved':>6}  {'Absent':>6}"]
+        for row in data["fragile"]:
+            lines.append(f"{row['nurse']:<20}  {row['skill']:<12}  {row['patients']:>8}  "
+                         f"{row['overload']:>8.1%}  {row['moved_per_scenario']:>6.2f}  "
+                         f"{row['absent']:>6.1%}")
+        return "\n".join(lines)
+
+
+def simulate(plan, scenarios=10000, seed=0, model=None, acuity_weights=None,
+             skill_factors=None, workers=None, serial=False):
+    # Runs the scenarios against plan (a WardPlan) and returns a Robustness
+    if scenarios <= 0:
+        raise ValueError("The number of scenarios must be positive")
+    model = model or ScenarioModel()
+    patients, nurses, owner = base_state(plan)
+    jobs = []
+    for chunk, start in enumerate(range(0, scenarios, CHUNK)):
+        jobs.append((patients, nurses, owner, plan.ratio, model, acuity_weights,
+                     skill_factors, seed, chunk, min(CHUNK, scenarios - start)))
+
+    total = empty_counts()
+    if serial or len(jobs) < 2:
+        for job in jobs:
+            merge(total, run_chunk(job))
+    else:
+        # Deferred like in hospital.py
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            for counts in pool.map(run_chunk, jobs):
+                merge(total, counts)
+    return Robustness(plan, total, seed)
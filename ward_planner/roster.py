@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+
+from .engine import DEFAULT_SKILL, SKILL_LEVELS
+
+# Rosters are either text/CSV, one "name,skill" (or just "name") per line,
+# or JSON: a list of {"name", "skill"} objects, optionally wrapped as
+# {"nurses": [...]}. Unknown or missing skills become Intermediate.
+
+BATCH_SIZE = 500
+
+
+def is_json_roster(path):
+    if path.lower().endswith(".json"):
+        return True
+    with open(path, 'r', newline='') as f:
+        return f.read(64).lstrip()[:1] in ("[", "{")
+
+
+def normalize_batch(rows, valid_skills=frozenset(SKILL_LEVELS)):
+    # Validates a whole batch of (name, skill) rows against one set lookup.
+    # Returns the nurse dicts and how many skills had to be defaulted.
+    nurses = []
+    fixed = 0
+    for name, skill in rows:
+        name = name.strip()
+        if not name:
+            continue
+        skill = skill.strip()
+        if skill not in valid_skills:
+            skill = DEFAULT_SKILL
+            fixed += 1
+        nurses.append({"name": name, "skill": skill})
+    return nurses, fixed
+
+
+class RosterReader:
+    # Iterating yields lists of nurse dicts of at most batch_size, reading the
+    # file lazily. bytes_read / bytes_total gives progress while it runs.
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.bytes_total = os.path.getsize(path)
+        self.bytes_read = 0
+        self.loaded = 0
+        self.fixed_skills = 0
+
+    @property
+    def progress(self):
+        if not self.bytes_total:
+            return 1.0
+        return min(1.0, self.bytes_read / self.bytes_total)
+
+    def _lines(self, f):
+        for line in f:
+            self.bytes_read += len(line)
+            yield line
+
+    def _csv_rows(self):
+        with open(self.path, 'r', newline='') as f:
+            for fields in csv.reader(self._lines(f)):
+                if not fields:
+                    continue
+                yield fields[0], fields[1] if len(fields) > 1 else DEFAULT_SKILL
+
+    def _json_rows(self):
+        # The json module has no incremental parser, so JSON rosters are read
+        # in one go and only the validation and hand-off are batched
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        self.bytes_read = self.bytes_total
+        if isinstance(data, dict):
+            data = data.get("nurses", [])
+        if not isinstance(data, list):
+            raise ValueError("JSON roster must be a list of nurses")
+        for item in data:
+            if isinstance(item, dict):
+                yield str(item.get("name", "")), str(item.get("skill", DEFAULT_SKILL))
+            else:
+                yield str(item), DEFAULT_SKILL
+
+    def __iter__(self):
+        rows = self._json_rows() if is_json_roster(self.path) else self._csv_rows()
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield self._flush(batch)
+                batch = []
+        if batch:
+            yield self._flush(batch)
+
+    def _flush(self, rows):
+        nurses, fixed = normalize_batch(rows)
+        self.loaded += len(nurses)
+        self.fixed_skills += fixed
+        return nurses
+
+
+def load_roster(path):
+    nurses = []
+    for batch in RosterReader(path):
+        nurses.extend(batch)
+    return nurses
+
+
+def save_roster(path, nurses):
+    if path.lower().endswith(".json"):
+        with open(path, 'w') as f:
+            json.dump([{"name": n['name'], "skill": n['skill']} for n in nurses], f, indent=2)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerows((n['name'], n['skill']) for n in nurses)
@@ -0,0 +1,77 @@
+from .engine import SKILL_LEVELS
+
+SORT_KEYS = {
+    "name": lambda nurse: nurse['name'].casefold(),
+    "skill": lambda nurse: (SKILL_LEVELS.index(nurse['skill'])
+                            if nurse['skill'] in SKILL_LEVELS else len(SKILL_LEVELS)),
+}
+
+
+class RosterView:
+    # A filtered, sorted window onto a roster list without copying it. With no
+    # filter or sort the view is the list itself; otherwise it keeps a list of
+    # row indices that is rebuilt lazily when the roster or criteria change.
+    def __init__(self, nurses):
+        self.nurses = nurses
+        self.filter_text = ""
+        self.sort_column = None
+        self.reverse = False
+        self.rows = None
+        self.dirty = False
+        self.seen = len(nurses)
+
+    def set_store(self, nurses):
+        self.nurses = nurses
+        self.invalidate()
+
+    def set_filter(self, text):
+        self.filter_text = text.strip().casefold()
+        self.invalidate()
+
+    def set_sort(self, column, reverse=False):
+        if column is not None and column not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by {column}")
+        self.sort_column = column
+        self.reverse = reverse
+        self.invalidate()
+
+    def invalidate(self):
+        self.dirty = True
+
+    @property
+    def active(self):
+        return bool(self.filter_text) or self.sort_column is not None
+
+    def _refresh(self):
+        # Appends to an unfiltered, unsorted roster need no work at all
+        if len(self.nurses) != self.seen:
+            self.seen = len(self.nurses)
+            self.dirty = True
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        if not self.active:
+            self.rows = None
+            return
+
+        nurses = self.nurses
+        rows = range(len(nurses))
+        if self.filter_text:
+            text = self.filter_text
+            rows = [i for i in rows
+                    if text in nurses[i]['name'].casefold() or text in nurses[i]['skill'].casefold()]
+        if self.sort_column is not None:
+            key = SORT_KEYS[self.sort_column]
+            rows = sorted(rows, key=lambda i: key(nurses[i]), reverse=self.reverse)
+        self.rows = list(rows)
+
+    def __len__(self):
+        self._refresh()
+        return len(self.nurses) if self.rows is None else len(self.rows)
+
+    def window(self, start, count):
+        self._refresh()
+        if self.rows is None:
+            return self.nurses[start:start + count]
+        return [self.nurses[i] for i in self.rows[start:start + count]]
@@ -0,0 +1,421 @@
+import copy
+import math
+import random
+from datetime import date, timedelta
+
+from .constants import ACUITY_CATEGORIES, SKILL_CODES, SKILL_LEVELS
+from .engine import normalize_nurses, plan_ward, required_nurses, split_acuity
+from .incremental import replan
+
+SHIFTS = ["Day", "Evening", "Night"]
+SHIFT_CODES = {"Day": "D", "Evening": "E", "Night": "N"}
+# Start and end hour of each shift; a night shift ends the next morning
+SHIFT_HOURS = {"Day": (7.0, 15.5), "Evening": (13.0, 21.5), "Night": (21.0, 31.5)}
+MIN_REST_HOURS = 11
+OFF = -1
+
+DEFAULT_RATIOS = {"Day": 5, "Evening": 6, "Night": 8}
+# At least this many nurses of the skill level or above on every shift
+DEFAULT_SKILL_MINIMUMS = {shift: {"Senior": 1} for shift in SHIFTS}
+
+# Cost of one unit of each rule breach. Coverage and rest dominate; shift
+# changes between consecutive working days and single days on between days
+# off break continuity of care.
+PENALTIES = {
+    "shortage": 100.0,
+    "excess": 10.0,
+    "skill_mix": 60.0,
+    "rest": 80.0,
+    "consecutive": 30.0,
+    "overtime": 60.0,
+    "shift_change": 3.0,
+    "isolated": 5.0,
+}
+
+
+def rest_violations(shift_hours=None, min_rest=MIN_REST_HOURS):
+    # forbidden[a][b]: shift a one day followed by shift b the next leaves
+    # less than min_rest hours off
+    shift_hours = shift_hours or SHIFT_HOURS
+    return [[24 + shift_hours[b][0] - shift_hours[a][1] < min_rest for b in SHIFTS]
+            for a in SHIFTS]
+
+
+def skill_minimum_counts(minimums):
+    # {"Senior": 1, "Intermediate": 3} -> at least 1 senior and at least 3
+    # intermediate-or-senior, as cumulative counts indexed by skill code
+    counts = [0] * len(SKILL_LEVELS)
+    for skill, count in (minimums or {}).items():
+        if skill not in SKILL_CODES:
+            raise ValueError(f"Unknown skill level in skill_minimums: {skill}")
+        counts[SKILL_CODES[skill]] = max(counts[SKILL_CODES[skill]], int(count))
+    return counts
+
+
+class RotaState:
+    # A nurse x day grid of shift indices (OFF when not working) with every
+    # running count the score depends on. change() applies a single cell
+    # edit and returns the cost delta by looking only at the touched slot
+    # counters, the two neighbouring days and a constant number of
+    # consecutive-day windows, so each move is scored in O(1). max_shifts
+    # caps each nurse's shifts in every week of the rota, counted in 7-day
+    # windows from its first day.
+    def __init__(self, nurses, days, required, minimums, max_shifts,
+                 max_consecutive, penalties=None, forbidden=None):
+        self.nurses = nurses
+        self.days = days
+        self.required = required
+        self.minimums = minimums
+        self.max_shifts = max_shifts
+        self.weeks = math.ceil(days / 7)
+        self.max_consecutive = max_consecutive
+        self.penalties = {**PENALTIES, **(penalties or {})}
+        self.skills = [SKILL_CODES[n['skill']] for n in nurses]
+
+        n_shifts = len(SHIFTS)
+        self.grid = [OFF] * (len(nurses) * days)
+        self.cover = [0] * (days * n_shifts)
+        self.at_least = [0] * (days * n_shifts * len(SKILL_LEVELS))
+        self.total = [0] * len(nurses)
+        self.week_total = [0] * (len(nurses) * self.weeks)
+        self.windows = max(0, days - max_consecutive)
+        self.window_count = [0] * (len(nurses) * self.windows)
+
+        # pair[a + 1][b + 1]: cost of shift a followed by shift b next day
+        forbidden = forbidden or rest_violations()
+        p = self.penalties
+        self.pair = [[0.0] * (n_shifts + 1) for _ in range(n_shifts + 1)]
+        for a in range(n_shifts):
+            for b in range(n_shifts):
+                self.pair[a + 1][b + 1] = ((p["rest"] if forbidden[a][b] else 0.0) +
+                                           (p["shift_change"] if a != b else 0.0))
+
+        self.cost = sum(self.slot_cost(slot) for slot in range(len(self.cover)))
+
+    def slot_cost(self, slot):
+        p = self.penalties
+        shift = slot % len(SHIFTS)
+        need = self.required[shift]
+        have = self.cover[slot]
+        cost = p["shortage"] * (need - have) if have < need else p["excess"] * (have - need)
+        base = slot * len(SKILL_LEVELS)
+        for k, minimum in enumerate(self.minimums[shift]):
+            short = minimum - self.at_least[base + k]
+            if short > 0:
+                cost += p["skill_mix"] * short
+        return cost
+
+    def _slot_step(self, slot, skill, step):
+        before = self.slot_cost(slot)
+        self.cover[slot] += step
+        base = slot * len(SKILL_LEVELS)
+        for k in range(skill, len(SKILL_LEVELS)):
+            self.at_least[base + k] += step
+        return self.slot_cost(slot) - before
+
+    def _overtime(self, total):
+        return self.penalties["overtime"] * max(0, total - self.max_shifts)
+
+    def _isolated(self, base, d):
+        # Working day d with a day off (or the rota edge) either side
+        grid = self.grid
+        return (grid[base + d] != OFF
+                and (d == 0 or grid[base + d - 1] == OFF)
+                and (d == self.days - 1 or grid[base + d + 1] == OFF))
+
+    def _isolated_around(self, n, d):
+        base = n * self.days
+        return sum(self._isolated(base, c) for c in range(max(0, d - 1), min(self.days, d + 2)))
+
+    def _window_cost(self, count):
+        return self.penalties["consecutive"] * max(0, count - self.max_consecutive)
+
+    def change(self, n, d, new):
+        days = self.days
+        idx = n * days + d
+        old = self.grid[idx]
+        if old == new:
+            return 0.0
+
+        delta = 0.0
+        skill = self.skills[n]
+        n_shifts = len(SHIFTS)
+        if old != OFF:
+            delta += self._slot_step(d * n_shifts + old, skill, -1)
+        if new != OFF:
+            delta += self._slot_step(d * n_shifts + new, skill, 1)
+
+        pair = self.pair
+        if d > 0:
+            prev = self.grid[idx - 1] + 1
+            delta += pair[prev][new + 1] - pair[prev][old + 1]
+        if d < days - 1:
+            nxt = self.grid[idx + 1] + 1
+            delta += pair[new + 1][nxt] - pair[old + 1][nxt]
+
+        if (old == OFF) != (new == OFF):
+            isolated = self._isolated_around(n, d)
+            self.grid[idx] = new
+            delta += self.penalties["isolated"] * (self._isolated_around(n, d) - isolated)
+
+            step = 1 if new != OFF else -1
+            self.total[n] += step
+            week = n * self.weeks + d // 7
+            total = self.week_total[week]
+            delta += self._overtime(total + step) - self._overtime(total)
+            self.week_total[week] = total + step
+
+            # Windows of max_consecutive + 1 days that contain day d
+            base = n * self.windows
+            for w in range(max(0, d - self.max_consecutive), min(d, self.windows - 1) + 1):
+                count = self.window_count[base + w]
+                delta += self._window_cost(count + step) - self._window_cost(count)
+                self.window_count[base + w] = count + step
+
+        self.grid[idx] = new
+        self.cost += delta
+        return delta
+
+    def shift(self, n, d):
+        return self.grid[n * self.days + d]
+
+    def week_full(self, n, d):
+        # Whether nurse n already works max_shifts in the week of day d
+        return self.week_total[n * self.weeks + d // 7] >= self.max_shifts
+
+    def weekly(self, row):
+        # Shifts worked in each 7-day window of one nurse's row
+        return [sum(1 for s in row[w:w + 7] if s != OFF) for w in range(0, self.days, 7)]
+
+    def full_cost(self):
+        # From-scratch score, for checking the incremental one
+        cost = sum(self.slot_cost(slot) for slot in range(len(self.cover)))
+        for n in range(len(self.nurses)):
+            row = self.grid[n * self.days:(n + 1) * self.days]
+            cost += sum(self.pair[a + 1][b + 1] for a, b in zip(row, row[1:]))
+            cost += sum(self._overtime(worked) for worked in self.weekly(row))
+            cost += self.penalties["isolated"] * sum(
+                self._isolated(n * self.days, d) for d in range(self.days))
+            for w in range(self.windows):
+                window = row[w:w + self.max_consecutive + 1]
+                cost += self._window_cost(sum(1 for s in window if s != OFF))
+        return cost
+
+    def breakdown(self):
+        counts = {key: 0 for key in PENALTIES}
+        n_shifts = len(SHIFTS)
+        for slot, have in enumerate(self.cover):
+            need = self.required[slot % n_shifts]
+            counts["shortage"] += max(0, need - have)
+            counts["excess"] += max(0, have - need)
+            base = slot * len(SKILL_LEVELS)
+            for k, minimum in enumerate(self.minimums[slot % n_shifts]):
+                counts["skill_mix"] += max(0, minimum - self.at_least[base + k])
+        for n in range(len(self.nurses)):
+            row = self.grid[n * self.days:(n + 1) * self.days]
+            for a, b in zip(row, row[1:]):
+                if a != OFF and b != OFF:
+                    counts["rest"] += self.pair[a + 1][b + 1] >= self.penalties["rest"]
+                    counts["shift_change"] += a != b
+            counts["overtime"] += sum(max(0, worked - self.max_shifts)
+                                      for worked in self.weekly(row))
+            counts["isolated"] += sum(self._isolated(n * self.days, d) for d in range(self.days))
+            for w in range(self.windows):
+                window = row[w:w + self.max_consecutive + 1]
+                counts["consecutive"] += max(0, sum(1 for s in window if s != OFF) - self.max_consecutive)
+        return counts
+
+
+def greedy_fill(state):
+    # Starting rota: fill each shift in turn, seniors first where the skill
+    # mix needs them, then whoever still has shifts left this week, can rest
+    # properly and has worked least
+    nurses = range(len(state.nurses))
+    for d in range(state.days):
+        for s in (2, 0, 1):
+            need = state.required[s]
+            minimums = state.minimums[s]
+
+            def rank(n):
+                prev = state.shift(n, d - 1) if d > 0 else OFF
+                return (state.week_full(n, d),
+                        state.pair[prev + 1][s + 1] >= state.penalties["rest"],
+                        state.total[n], state.skills[n])
+
+            free = sorted((n for n in nurses if state.shift(n, d) == OFF), key=rank)
+            chosen = []
+            for k, minimum in enumerate(minimums):
+                have = sum(1 for n in chosen if state.skills[n] <= k)
+                for n in free:
+                    if have >= minimum:
+                        break
+                    if n not in chosen and state.skills[n] <= k:
+                        chosen.append(n)
+                        have += 1
+            for n in free:
+                if len(chosen) >= need:
+                    break
+                if n not in chosen:
+                    chosen.append(n)
+            for n in chosen:
+                state.change(n, d, s)
+    return state
+
+
+def anneal(state, iterations, seed=0, start_temp=50.0, end_temp=0.05, swap_rate=0.5):
+    rng = random.Random(seed)
+    n_nurses = len(state.nurses)
+    days = state.days
+    n_shifts = len(SHIFTS)
+    grid = state.grid
+    cooling = (end_temp / start_temp) ** (1.0 / max(1, iterations))
+    temp = start_temp
+    accepted = 0
+
+    for _ in range(iterations):
+        temp *= cooling
+        n = rng.randrange(n_nurses)
+        d = rng.randrange(days)
+        old = grid[n * days + d]
+
+        if rng.random() < swap_rate:
+            # Swap two nurses' shifts on one day; coverage stays put
+            m = rng.randrange(n_nurses)
+            other = grid[m * days + d]
+            if other == old:
+                continue
+            delta = state.change(n, d, other) + state.change(m, d, old)
+            if delta <= 0 or rng.random() < math.exp(-delta / temp):
+                accepted += 1
+            else:
+                state.change(m, d, other)
+                state.change(n, d, old)
+        else:
+            new = rng.randrange(-1, n_shifts)
+            if new == old:
+                continue
+            delta = state.change(n, d, new)
+            if delta <= 0 or rng.random() < math.exp(-delta / temp):
+                accepted += 1
+            else:
+                state.change(n, d, old)
+
+    return accepted
+
+
+class Rota:
+    def __init__(self, ward, start, nurses, state, required, iterations):
+        self.ward = ward
+        self.start = start
+        self.nurses = nurses
+        self.days = state.days
+        self.grid = list(state.grid)
+        self.required = required
+        self.cost = state.cost
+        self.breakdown = state.breakdown()
+        self.iterations = iterations
+        self.bed_plans = []
+
+    def date_of(self, d):
+        return self.start + timedelta(days=d)
+
+    def shift(self, n, d):
+        s = self.grid[n * self.days + d]
+        return None if s == OFF else SHIFTS[s]
+
+    def on_shift(self, d, shift):
+        s = SHIFTS.index(shift)
+        return [nurse for n, nurse in enumerate(self.nurses)
+                if self.grid[n * self.days + d] == s]
+
+    def format_table(self):
+        width = max(len(n['name']) for n in self.nurses) if self.nurses else 4
+        lines = [f"{'Nurse':<{width}}  " + "".join(
+            self.date_of(d).strftime('%a')[0] for d in range(self.days))]
+        for n, nurse in enumerate(self.nurses):
+            row = self.grid[n * self.days:(n + 1) * self.days]
+            cells = "".join("-" if s == OFF else SHIFT_CODES[SHIFTS[s]] for s in row)
+            lines.append(f"{nurse['name']:<{width}}  {cells}")
+        return "\n".join(lines)
+
+    def to_rows(self):
+        for n, nurse in enumerate(self.nurses):
+            for d in range(self.days):
+                s = self.grid[n * self.days + d]
+                if s != OFF:
+                    yield {"ward": self.ward, "date": self.date_of(d).isoformat(),
+                           "shift": SHIFTS[s], "nurse": nurse['name'], "skill": nurse['skill']}
+
+
+def schedule_rota(nurses, days=28, total_patients=28, ratios=None, skill_minimums=None,
+                  max_shifts_per_week=5, max_consecutive=5, ward="", start=None,
+                  iterations=None, seed=0, penalties=None):
+    nurses = normalize_nurses(nurses)
+    if not nurses:
+        raise ValueError("Please add at least one nurse")
+    if days <= 0:
+        raise ValueError("A rota needs at least one day")
+
+    ratios = {**DEFAULT_RATIOS, **(ratios or {})}
+    skill_minimums = {**DEFAULT_SKILL_MINIMUMS, **(skill_minimums or {})}
+    required = [required_nurses(total_patients, ratios[shift]) for shift in SHIFTS]
+    minimums = [skill_minimum_counts(skill_minimums.get(shift)) for shift in SHIFTS]
+
+    state = RotaState(nurses, days, required, minimums, max_shifts_per_week, max_consecutive,
+                      penalties)
+    greedy_fill(state)
+    if iterations is None:
+        iterations = 100 * len(nurses) * days
+    anneal(state, iterations, seed)
+
+    return Rota(ward, start or date.today(), nurses, state, dict(zip(SHIFTS, required)),
+                iterations)
+
+
+def plan_rota_beds(rota, total_patients, ratios=None, acuity_counts=None, tasks=()):
+    # Bed allocation for every shift of the rota. Each shift type is chained
+    # through the incremental allocator day to day, so a nurse working the
+    # same shift on consecutive days keeps the same beds.
+    ratios = {**DEFAULT_RATIOS, **(ratios or {})}
+    if acuity_counts is None:
+        acuity_counts = split_acuity(total_patients)
+    acuity_counts = {a: acuity_counts.get(a, 0) for a in ACUITY_CATEGORIES}
+
+    previous = {}
+    plans = []
+    for d in range(rota.days):
+        for shift in SHIFTS:
+            nurses = rota.on_shift(d, shift)
+            if not nurses:
+                continue
+            label = f"{rota.date_of(d).isoformat()} {shift}"
+            if shift in previous:
+                # replan takes over the allocation it is given; each shift
+                # keeps its own
+                plan = replan(copy.deepcopy(previous[shift]), nurses, total_patients, ratios[shift],
+                              acuity_counts, tasks)
+                plan.shift = label
+            else:
+                plan = plan_ward(nurses, total_patients, ratios[shift], acuity_counts,
+                                 tasks, ward=rota.ward, shift=label)
+            previous[shift] = plan
+            plans.append(plan)
+    rota.bed_plans = plans
+    return plans
+
+
+def continuity(plans):
+    # Share of patients cared for by the same nurse as on the previous shift
+    # of the same type, over every shift that has a previous one
+    previous = {}
+    kept = carried = 0
+    for plan in plans:
+        shift = plan.shift.rsplit(" ", 1)[-1]
+        owners = {patient['id']: name for name, entry in plan.allocation.items()
+                  for patient in entry['patients']}
+        if shift in previous:
+            before = previous[shift]
+            carried += len(owners)
+            kept += sum(1 for pid, name in owners.items() if before.get(pid) == name)
+        previous[shift] = owners
+    return kept / carried if carried else 1.0
@@ -0,0 +1,242 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from .constants import (ACUITY_CATEGORIES, ACUITY_ELIGIBILITY, ACUITY_WEIGHTS,
+                        SKILL_FACTORS, SKILL_LEVELS)
+
+# What-if staffing sweeps. Every combination of census, acuity mix,
+# per-acuity ratios and roster skill mix is one scenario, and the whole grid
+# is worked out as flat NumPy arrays (one element per scenario), so tens of
+# thousands of scenarios take milliseconds. A scenario's figures are what
+# the balanced allocator would aim for on a roster of exactly the required
+# size:
+#   required      nurses needed for the per-acuity ratios, ceil(sum p_a / r_a)
+#   staff         that roster split by the skill mix (Senior, Intermediate, Junior)
+#   shortfall     extra eligible nurses each acuity needs beyond those on the
+#                 roster (only High has a restricted skill list by default)
+#   under_minimum nurses missing from each skill's minimum
+#   load_*        per-nurse acuity-weighted load. The allocator evens out
+#                 load / skill factor, so a nurse's share is proportional to
+#                 their factor: load_max is the most senior nurse on duty.
+
+DEFAULT_ACUITY_MIXES = [(0.2, 0.5, 0.3)]
+DEFAULT_RATIOS = [(4, 6, 8)]
+DEFAULT_SKILL_MIXES = [(0.25, 0.45, 0.30)]
+DEFAULT_SKILL_MINIMUMS = {"Senior": 1}
+
+FIELDS = (["census"] + [f"mix_{a.lower()}" for a in ACUITY_CATEGORIES]
+          + [f"ratio_{a.lower()}" for a in ACUITY_CATEGORIES]
+          + [f"skill_mix_{s.lower()}" for s in SKILL_LEVELS]
+          + [f"patients_{a.lower()}" for a in ACUITY_CATEGORIES]
+          + ["required"] + [f"staff_{s.lower()}" for s in SKILL_LEVELS]
+          + [f"shortfall_{a.lower()}" for a in ACUITY_CATEGORIES]
+          + [f"under_minimum_{s.lower()}" for s in SKILL_LEVELS]
+          + ["short", "patients_per_nurse", "load_mean", "load_min", "load_max"])
+
+CURVE_FIELDS = ["census", "scenarios", "required_min", "required_median",
+                "required_max", "short_share", "load_max_median", "load_max_worst"]
+
+
+def simplex_grid(step=0.1):
+    # Every (High, Moderate, Low) mix with shares on a multiple of step
+    n = round(1 / step)
+    if n <= 0 or abs(n * step - 1) > 1e-9:
+        raise ValueError("Mix step must divide 1 evenly")
+    return [(h / n, (n - h - l) / n, l / n)
+            for h in range(n + 1) for l in range(n + 1 - h)]
+
+
+def apportion(totals, shares):
+    # Largest remainder split of each total by its row of shares: the parts
+    # are whole, add up to the total and are each within one of the exact
+    # share. totals is (n,), shares (n, k) with rows summing to 1.
+    exact = totals[:, None] * shares
+    parts = np.floor(exact + 1e-9).astype(np.int64)
+    left = totals - parts.sum(axis=1)
+    # Rank each column by its remainder (largest first, ties to the left)
+    order = np.argsort(-(exact - parts), axis=1, kind='stable')
+    rank = np.argsort(order, axis=1, kind='stable')
+    return parts + (rank < left[:, None])
+
+
+def normalized_rows(rows, name, width):
+    rows = np.asarray(rows, dtype=float).reshape(-1, width)
+    if len(rows) == 0:
+        raise ValueError(f"At least one {name} is needed")
+    if (rows < 0).any() or (rows.sum(axis=1) <= 0).any():
+        raise ValueError(f"Each {name} needs non-negative shares that aren't all zero")
+    return rows / rows.sum(axis=1, keepdims=True)
+
+
+class Sweep:
+    def __init__(self, **columns):
+        # One equal-length array per FIELDS group, as built by sweep()
+        self.__dict__.update(columns)
+
+    def __len__(self):
+        return len(self.census)
+
+    def columns(self):
+        # (field, 1-d array) in FIELDS order
+        yield "census", self.census
+        for group, values, labels in (("mix", self.acuity_mix, ACUITY_CATEGORIES),
+                                      ("ratio", self.ratio, ACUITY_CATEGORIES),
+                                      ("skill_mix", self.skill_mix, SKILL_LEVELS),
+                                      ("patients", self.patients, ACUITY_CATEGORIES)):
+            for i, label in enumerate(labels):
+                yield f"{group}_{label.lower()}", values[:, i]
+        yield "required", self.required
+        for i, skill in enumerate(SKILL_LEVELS):
+            yield f"staff_{skill.lower()}", self.staff[:, i]
+        for i, acuity in enumerate(ACUITY_CATEGORIES):
+            yield f"shortfall_{acuity.lower()}", self.shortfall[:, i]
+        for i, skill in enumerate(SKILL_LEVELS):
+            yield f"under_minimum_{skill.lower()}", self.under_minimum[:, i]
+        yield "short", self.short
+        yield "patients_per_nurse", self.patients_per_nurse
+        yield "load_mean", self.load_mean
+        yield "load_min", self.load_min
+        yield "load_max", self.load_max
+
+    def to_rows(self):
+        columns = [values.tolist() for _, values in self.columns()]
+        for values in zip(*columns):
+            yield dict(zip(FIELDS, values))
+
+    def curve(self):
+        # The staffing curve: per census, the spread of required nurses over
+        # every other dimension, the share of scenarios short of a skill, and
+        # the median and worst peak nurse load
+        order = np.argsort(self.census, kind='stable')
+        census = self.census[order]
+        bounds = np.flatnonzero(np.diff(census)) + 1
+        rows = []
+        for group in np.split(order, bounds):
+            required = self.required[group]
+            load_max = self.load_max[group]
+            rows.append({
+                "census": int(self.census[group[0]]),
+                "scenarios": len(group),
+                "required_min": int(required.min()),
+                "required_median": float(np.median(required)),
+                "required_max": int(required.max()),
+                "short_share": float(self.short[group].mean()),
+                "load_max_median": float(np.median(load_max)),
+                "load_max_worst": float(load_max.max()),
+            })
+        return rows
+
+    def format_curve(self):
+        lines = [f"{'Census':>6}  {'Nurses min':>10}  {'median':>6}  {'max':>4}  "
+                 f"{'Short':>6}  {'Peak load':>9}  {'worst':>6}"]
+        for row in self.curve():
+            lines.append(
+                f"{row['census']:>6}  {row['required_min']:>10}  {row['required_median']:>6g}  "
+                f"{row['required_max']:>4}  {row['short_share']:>6.0%}  "
+                f"{row['load_max_median']:>9.1f}  {row['load_max_worst']:>6.1f}")
+        return "\n".join(lines)
+
+
+def sweep(census, acuity_mixes=None, ratios=None, skill_mixes=None,
+          acuity_weights=None, skill_factors=None, skill_minimums=None,
+          eligibility=None):
+    # census is a list of patient counts; acuity_mixes and skill_mixes lists
+    # of (High, Moderate, Low) and (Senior, Intermediate, Junior) shares
+    # (normalized, so 20/50/30 works as well as 0.2/0.5/0.3); ratios a list
+    # of (High, Moderate, Low) patients per nurse. Returns a Sweep over every
+    # combination.
+    acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+    skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+    skill_minimums = {**DEFAULT_SKILL_MINIMUMS, **(skill_minimums or {})}
+    eligibility = {**ACUITY_ELIGIBILITY, **(eligibility or {})}
+
+    census = np.asarray(census, dtype=np.int64).reshape(-1)
+    if len(census) == 0:
+        raise ValueError("At least one census is needed")
+    if (census < 0).any():
+        raise ValueError("Census cannot be negative")
+    mixes = normalized_rows(acuity_mixes or DEFAULT_ACUITY_MIXES, "acuity mix", 3)
+    skills = normalized_rows(skill_mixes or DEFAULT_SKILL_MIXES, "skill mix", 3)
+    ratios = np.asarray(ratios or DEFAULT_RATIOS, dtype=float).reshape(-1, 3)
+    if len(ratios) == 0 or (ratios <= 0).any():
+        raise ValueError("Ratios must be positive numbers")
+    factors = np.array([skill_factors[s] for s in SKILL_LEVELS], dtype=float)
+    if (factors <= 0).any():
+        raise ValueError("Skill factors must be positive")
+    weights = np.array([acuity_weights[a] for a in ACUITY_CATEGORIES], dtype=float)
+
+    # One index per dimension for every scenario, census varying slowest
+    c, m, r, s = (index.ravel() for index in np.indices(
+        (len(census), len(mixes), len(ratios), len(skills))))
+    total = census[c]
+    ratio = ratios[r]
+    patients = apportion(total, mixes[m])
+    # Ratios are whole patients per nurse, so the small tolerance only
+    # absorbs float error in the sum
+    required = np.ceil((patients / ratio).sum(axis=1) - 1e-9).astype(np.int64)
+    staff = apportion(required, skills[s])
+
+    # Acuities with a restricted skill list need enough eligible nurses for
+    # their own patients at their own ratio
+    shortfall = np.zeros_like(patients)
+    for a, acuity in enumerate(ACUITY_CATEGORIES):
+        allowed = [SKILL_LEVELS.index(skill) for skill in eligibility[acuity]]
+        if len(allowed) == len(SKILL_LEVELS):
+            continue
+        needed = np.ceil(patients[:, a] / ratio[:, a] - 1e-9).astype(np.int64)
+        shortfall[:, a] = np.maximum(needed - staff[:, allowed].sum(axis=1), 0)
+    minimums = np.array([skill_minimums.get(skill, 0) for skill in SKILL_LEVELS])
+    # A ward with no patients needs nobody, minimums included
+    under_minimum = np.where(required[:, None] > 0, np.maximum(minimums - staff, 0), 0)
+
+    workload = patients @ weights
+    capacity = staff @ factors
+    scaled = np.divide(workload, capacity, out=np.zeros_like(workload), where=capacity > 0)
+    # Smallest and largest skill factor actually on duty (1.0 on an empty
+    # roster, whose loads are zero anyway)
+    present = staff > 0
+    lowest = np.where(present, factors, np.inf).min(axis=1)
+    highest = np.where(present, factors, 0.0).max(axis=1)
+    lowest[~present.any(axis=1)] = 1.0
+    nurses = np.maximum(required, 1)
+    return Sweep(
+        census=total,
+        acuity_mix=mixes[m],
+        ratio=ratio,
+        skill_mix=skills[s],
+        patients=patients,
+        required=required,
+        staff=staff,
+        shortfall=shortfall,
+        under_minimum=under_minimum,
+        short=(shortfall.sum(axis=1) + under_minimum.sum(axis=1)) > 0,
+        patients_per_nurse=total / nurses,
+        load_mean=workload / nurses,
+        load_min=scaled * lowest,
+        load_max=scaled * highest,
+    )
+
+
+def write_sweep(result, path, curve=False):
+    # All scenarios (or with curve=True the staffing curve) as CSV, or as
+    # JSON lines for a .jsonl / .ndjson path; returns the row count
+    rows = result.curve() if curve else result.to_rows()
+    fields = CURVE_FIELDS if curve else FIELDS
+    count = 0
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        with open(path, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row, separators=(',', ':')))
+                f.write("\n")
+                count += 1
+        return count
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+from .cache import plan_key
+from .engine import plan_ward
+from .hospital import PLANNING_ERRORS
+from .wardfile import ward_spec
+
+# Local allocation service: a small asyncio HTTP/JSON server so many ward
+# terminals can share one planner.
+#
+#   POST /plan    body: a ward object as in a ward file (see wardfile.py),
+#                 with "nurses" (roster files aren't read); returns the
+#                 plan as WardPlan.to_dict() gives it
+#   GET  /stats   request, cache and queue counters
+#   GET  /health  {"status": "ok"}
+#
+# Plans are keyed with cache.plan_key. A key planned recently is served
+# from memory, and requests for a key that is being planned wait for that
+# one solve instead of starting their own. Small balanced wards are planned
+# on the event loop (well under a millisecond); optimal and contiguous
+# plans and big wards go to a process pool. Back-pressure: at most
+# max_pending pool solves are queued or running, and at most
+# max_connections clients are connected; beyond either the service answers
+# 503 with Retry-After rather than queueing without bound.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Wards bigger than this go to the pool even in balanced mode
+INLINE_PATIENTS = 200
+MAX_BODY = 1 << 20
+MAX_CONNECTIONS = 1024
+CACHE_ENTRIES = 1024
+# A connection that sends nothing for this long is closed
+IDLE_TIMEOUT = 30.0
+RETRY_AFTER = 1
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large",
+           431: "Request Header Fields Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+# Keys that only label a plan; they don't change the allocation, aren't
+# keyed and are set on every response
+LABELS = ("ward", "shift", "notes")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def request_spec(data):
+    # plan_ward keyword arguments for a POST /plan body; ward_spec checks
+    # the types of its structured keys
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    if "nurses" not in data:
+        raise ValueError("Request is missing 'nurses'")
+    return ward_spec({key: value for key, value in data.items() if key != "roster"})
+
+
+def spec_key(spec):
+    return plan_key(spec["nurses"], spec["total_patients"], spec["ratio"],
+                    spec["acuity_counts"], spec["tasks"], spec["acuity_weights"],
+                    spec["skill_factors"], spec["mode"], layout=spec["layout"],
+                    beds=spec["beds"])
+
+
+def solve(spec):
+    # Runs inline or in a pool worker; a dict pickles far smaller than a
+    # WardPlan
+    return plan_ward(**spec).to_dict()
+
+
+async def read_request(reader):
+    # (method, path, body, keep_alive), or None when the client closed the
+    # connection between requests
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Request headers are too large")
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Send a Content-Length instead of a chunked body")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Bad Content-Length")
+    if length > MAX_BODY or length < 0:
+        raise HTTPError(413, f"Request body is over {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return method, target.split("?", 1)[0], body, keep_alive
+
+
+def encode_response(status, payload, keep_alive=True):
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: " + ("keep-alive" if keep_alive else "close")]
+    if status == 503:
+        head.append(f"Retry-After: {RETRY_AFTER}")
+    return ("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body
+
+
+class PlanService:
+    def __init__(self, workers=None, max_pending=None, max_connections=MAX_CONNECTIONS,
+                 cache_entries=CACHE_ENTRIES):
+        # workers=0 plans everything on the event loop (for debugging)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(1, self.workers) * 16
+        self.max_connections = max_connections
+        self.cache_entries = cache_entries
+        self.results = OrderedDict()
+        self.inflight = {}
+        self.pool = None
+        self.server = None
+        self.pending = 0
+        self.connections = 0
+        self.started = time.monotonic()
+        self.counts = {"requests": 0, "planned": 0, "offloaded": 0, "cache_hits": 0,
+                       "coalesced": 0, "rejected": 0, "errors": 0}
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        if self.workers:
+            # Deferred like in hospital.py; started up front so the first
+            # heavy request doesn't pay for the workers starting
+            from concurrent.futures import ProcessPoolExecutor
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self.handle, host, port,
+                                                 backlog=self.max_connections)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    def stats(self):
+        return {**self.counts, "pending": self.pending, "inflight": len(self.inflight),
+                "connections": self.connections, "cached_plans": len(self.results),
+                "workers": self.workers, "max_pending": self.max_pending,
+                "uptime": round(time.monotonic() - self.started, 1)}
+
+    # Connections
+
+    async def handle(self, reader, writer):
+        if self.connections >= self.max_connections:
+            self.counts["rejected"] += 1
+            writer.write(encode_response(503, {"error": "Too many connections"}, False))
+            await self._close(writer)
+            return
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as e:
+                    # The rest of the request is unread, so the connection
+                    # can't be reused
+                    self.counts["errors"] += 1
+                    writer.write(encode_response(e.status, {"error": str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                self.counts["requests"] += 1
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception as e:
+                    # A body that gets past validation but still breaks the
+                    # planner costs its client a 500, not the connection
+                    print(f"serve: error: {method} {path} failed: {e!r}", file=sys.stderr)
+                    status, payload = 500, {"error": "Request failed"}
+                if status >= 400:
+                    self.counts["errors" if status != 503 else "rejected"] += 1
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            await self._close(writer)
+
+    async def _close(self, writer):
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def dispatch(self, method, path, body):
+        if path == "/plan":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            return await self.plan(body)
+        if path in ("/stats", "/health"):
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, self.stats() if path == "/stats" else {"status": "ok"}
+        return 404, {"error": f"No such endpoint: {path}"}
+
+    # Planning
+
+    async def plan(self, body):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, {"error": "Request body must be JSON"}
+        try:
+            spec = request_spec(data)
+            key = spec_key(spec)
+        except PLANNING_ERRORS as e:
+            return 400, {"error": str(e)}
+
+        result = self.results.get(key)
+        if result is not None:
+            self.results.move_to_end(key)
+            self.counts["cache_hits"] += 1
+        elif key in self.inflight:
+            self.counts["coalesced"] += 1
+            result = await asyncio.shield(self.inflight[key])
+        else:
+            result = await self._solve(key, spec)
+        status, payload = result
+        if status != 200:
+            return status, payload
+        return 200, {**payload, **{label: spec[label] for label in LABELS}}
+
+    async def _solve(self, key, spec):
+        heavy = spec["mode"] != "balanced" or len(spec["beds"] or ()) > INLINE_PATIENTS \
+            or int(spec["total_patients"]) > INLINE_PATIENTS
+        if heavy and self.pool is not None:
+            if self.pending >= self.max_pending:
+                return 503, {"error": "Planner is busy, retry shortly"}
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.inflight[key] = future
+            self.pending += 1
+            self.counts["offloaded"] += 1
+            try:
+                result = await self._outcome(loop.run_in_executor(self.pool, solve, spec))
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            finally:
+                self.pending -= 1
+                del self.inflight[key]
+            future.set_result(result)
+        else:
+            # Nothing else runs while this does, so no request can join it
+            result = await self._outcome(None, spec)
+        if result[0] == 200:
+            self.results[key] = result
+            while len(self.results) > self.cache_entries:
+                self.results.popitem(last=False)
+        return result
+
+    async def _outcome(self, job, spec=None):
+        # (status, payload) of a solve, whether run inline (job is None) or
+        # awaited from the pool
+        self.counts["planned"] += 1
+        try:
+            plan = solve(spec) if job is None else await job
+        except PLANNING_ERRORS as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"serve: error: planning failed: {e!r}", file=sys.stderr)
+            return 500, {"error": "Planning failed"}
+        return 200, plan
+
+
+async def run_service(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None, **options):
+    service = PlanService(**options)
+    address = await service.start(host, port)
+    if ready is not None:
+        ready(address)
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None, **options):
+    # Blocks until interrupted; ready(address) is called once listening
+    asyncio.run(run_service(host, port, ready, **options))
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+from .constants import ACUITY_CATEGORIES, ACUITY_CODES, ACUITY_WEIGHTS
+
+# Embedded history of rosters and allocations. One row per bed per shift
+# (plus one bedless row for a nurse who had no patients) with the day and
+# acuity code copied onto it, so workload questions such as "High acuity
+# patient-shifts per nurse over the last 30 days" are answered from a single
+# covering index range scan however many years are stored.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nurses (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    skill TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rosters (
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    nurse_id INTEGER NOT NULL REFERENCES nurses(id),
+    PRIMARY KEY (name, position)
+);
+CREATE TABLE IF NOT EXISTS shifts (
+    id INTEGER PRIMARY KEY,
+    ward TEXT NOT NULL,
+    shift TEXT NOT NULL DEFAULT '',
+    day TEXT NOT NULL,
+    planned_at TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    total_patients INTEGER NOT NULL,
+    ratio INTEGER NOT NULL,
+    safe INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    shift_id INTEGER NOT NULL REFERENCES shifts(id) ON DELETE CASCADE,
+    nurse_id INTEGER NOT NULL REFERENCES nurses(id),
+    day TEXT NOT NULL,
+    bed INTEGER,
+    acuity INTEGER
+);
+CREATE INDEX IF NOT EXISTS shifts_day ON shifts(day);
+CREATE INDEX IF NOT EXISTS shifts_ward_day ON shifts(ward, day);
+CREATE INDEX IF NOT EXISTS assignments_shift ON assignments(shift_id);
+CREATE INDEX IF NOT EXISTS assignments_nurse_day ON assignments(nurse_id, day);
+CREATE INDEX IF NOT EXISTS assignments_acuity_day ON assignments(acuity, day, nurse_id);
+"""
+
+# How far back fairness looks by default
+HISTORY_DAYS = 30
+# SQLite's default limit on bound parameters is 999 on older builds
+MAX_PARAMS = 900
+
+
+def default_history_path():
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "ward_planner", "history.db")
+
+
+def day_window(days, until=None):
+    # The inclusive ISO date range of the `days` days ending on `until`
+    until = until or date.today()
+    if isinstance(until, datetime):
+        until = until.date()
+    return (until - timedelta(days=days - 1)).isoformat(), until.isoformat()
+
+
+class Store:
+    def __init__(self, path):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.ids = {}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def nurse_ids(self, nurses):
+        # name -> id for every nurse, adding new names and updating skills
+        # in one statement; ids already seen are served from memory
+        self.conn.executemany(
+            "INSERT INTO nurses (name, skill) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET skill = excluded.skill "
+            "WHERE skill != excluded.skill",
+            [(n['name'], n['skill']) for n in nurses])
+        missing = list({n['name'] for n in nurses if n['name'] not in self.ids})
+        for start in range(0, len(missing), MAX_PARAMS):
+            chunk = missing[start:start + MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            self.ids.update((name, nurse_id) for nurse_id, name in self.conn.execute(
+                f"SELECT id, name FROM nurses WHERE name IN ({marks})", chunk))
+        return self.ids
+
+    def _names(self, nurse_ids):
+        names = {nurse_id: name for name, nurse_id in self.ids.items()}
+        missing = [i for i in nurse_ids if i not in names]
+        for start in range(0, len(missing), MAX_PARAMS):
+            chunk = missing[start:start + MAX_PARAMS]
+            marks = ",".join("?" * len(chunk))
+            for nurse_id, name in self.conn.execute(
+                    f"SELECT id, name FROM nurses WHERE id IN ({marks})", chunk):
+                names[nurse_id] = name
+                self.ids[name] = nurse_id
+        return names
+
+    # Rosters
+
+    def save_roster(self, name, nurses):
+        with self.conn:
+            ids = self.nurse_ids(nurses)
+            self.conn.execute("DELETE FROM rosters WHERE name = ?", (name,))
+            self.conn.executemany(
+                "INSERT INTO rosters (name, position, nurse_id) VALUES (?, ?, ?)",
+                [(name, i, ids[n['name']]) for i, n in enumerate(nurses)])
+
+    def load_roster(self, name):
+        return [{"name": nurse, "skill": skill} for nurse, skill in self.conn.execute(
+            "SELECT n.name, n.skill FROM rosters r JOIN nurses n ON n.id = r.nurse_id "
+            "WHERE r.name = ? ORDER BY r.position", (name,))]
+
+    def rosters(self):
+        return [name for name, in self.conn.execute(
+            "SELECT DISTINCT name FROM rosters ORDER BY name")]
+
+    # Allocations
+
+    def _assignment_rows(self, plan):
+        # (nurse name, bed, acuity code) per assignment, read straight off
+        # the arrays when the plan is still compact
+        if plan.compact is not None and plan._allocation is None:
+            compact = plan.compact
+            nurses = compact.nurses
+            busy = set(compact.assignment)
+            rows = [(nurses[n].name, bed, code) for n, bed, code in
+                    zip(compact.assignment, compact.patients.ids, compact.patients.acuity)
+                    if n >= 0]
+            rows.extend((nurse.name, None, None) for i, nurse in enumerate(nurses)
+                        if i not in busy)
+            return [nurse.as_dict() for nurse in nurses], rows
+        rows = []
+        for name, entry in plan.allocation.items():
+            if not entry['patients']:
+                rows.append((name, None, None))
+            for patient in entry['patients']:
+                rows.append((name, patient['id'], ACUITY_CODES[patient['acuity']]))
+        return [entry['nurse'] for entry in plan.allocation.values()], rows
+
+    def _insert_plan(self, plan, day, planned_at):
+        nurses, assignments = self._assignment_rows(plan)
+        ids = self.nurse_ids(nurses)
+        cursor = self.conn.execute(
+            "INSERT INTO shifts (ward, shift, day, planned_at, mode, total_patients, ratio, safe) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (plan.ward, plan.shift, day, planned_at, plan.mode, plan.total_patients,
+             plan.ratio, int(plan.safe)))
+        shift_id = cursor.lastrowid
+        rows = [(shift_id, ids[name], day, bed, code) for name, bed, code in assignments]
+        self.conn.executemany(
+            "INSERT INTO assignments (shift_id, nurse_id, day, bed, acuity) VALUES (?, ?, ?, ?, ?)",
+            rows)
+        return shift_id
+
+    def record_plans(self, plans, day=None, planned_at=None):
+        # All plans in one transaction; returns their shift ids
+        day = (day or date.today()).isoformat()
+        planned_at = (planned_at or datetime.now()).isoformat(timespec='seconds')
+        with self.conn:
+            return [self._insert_plan(plan, day, planned_at) for plan in plans]
+
+    def record_plan(self, plan, day=None, planned_at=None):
+        return self.record_plans([plan], day, planned_at)[0]
+
+    def delete_shift(self, shift_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM assignments WHERE shift_id = ?", (shift_id,))
+            self.conn.execute("DELETE FROM shifts WHERE id = ?", (shift_id,))
+
+    # Workload queries
+
+    def acuity_counts(self, acuity="High", days=HISTORY_DAYS, until=None):
+        # {nurse name: patient-shifts of this acuity} over the window
+        start, end = day_window(days, until)
+        counts = dict(self.conn.execute(
+            "SELECT nurse_id, COUNT(*) FROM assignments "
+            "WHERE acuity = ? AND day BETWEEN ? AND ? GROUP BY nurse_id",
+            (ACUITY_CODES[acuity], start, end)).fetchall())
+        names = self._names(counts)
+        return {names[nurse_id]: count for nurse_id, count in counts.items()}
+
+    def workload(self, days=HISTORY_DAYS, until=None, acuity_weights=None):
+        # {nurse name: {"shifts", "patients": {acuity: n}, "load"}} over the
+        # window, load being the acuity-weighted patient-shifts
+        acuity_weights = {**ACUITY_WEIGHTS, **(acuity_weights or {})}
+        start, end = day_window(days, until)
+        stats = {}
+        for acuity_code in range(len(ACUITY_CATEGORIES)):
+            for nurse_id, count in self.conn.execute(
+                    "SELECT nurse_id, COUNT(*) FROM assignments "
+                    "WHERE acuity = ? AND day BETWEEN ? AND ? GROUP BY nurse_id",
+                    (acuity_code, start, end)):
+                entry = stats.setdefault(nurse_id, {"shifts": 0, "patients": {}, "load": 0.0})
+                acuity = ACUITY_CATEGORIES[acuity_code]
+                entry["patients"][acuity] = count
+                entry["load"] += count * acuity_weights[acuity]
+        for nurse_id, shifts in self.conn.execute(
+                "SELECT a.nurse_id, COUNT(DISTINCT a.shift_id) FROM shifts s "
+                "JOIN assignments a ON a.shift_id = s.id "
+                "WHERE s.day BETWEEN ? AND ? GROUP BY a.nurse_id", (start, end)):
+            stats.setdefault(nurse_id, {"shifts": 0, "patients": {}, "load": 0.0})["shifts"] = shifts
+        names = self._names(stats)
+        return {names[nurse_id]: entry for nurse_id, entry in stats.items()}
+
+    def recent_load(self, nurses=None, days=HISTORY_DAYS, until=None, acuity_weights=None):
+        # {nurse name: weighted load per shift worked} over the window, what
+        # plan_ward takes as history=. Per shift, so a nurse isn't spared
+        # heavy patients just for having worked fewer shifts. Without nurses
+        # everyone with history is included; with them, anyone without
+        # history gets 0.0.
+        stats = self.workload(days, until, acuity_weights)
+        load = {name: entry["load"] / entry["shifts"] if entry["shifts"] else 0.0
+                for name, entry in stats.items()}
+        if nurses is None:
+            return load
+        return {n['name']: load.get(n['name'], 0.0) for n in nurses}
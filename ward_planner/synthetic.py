@@ -0,0 +1,59 @@
+import random
+
+from .constants import ACUITY_CATEGORIES, SKILL_LEVELS, TASKS
+
+# Synthetic rosters and wards for benchmarks and simulations. Everything is
+# driven by a seeded random.Random, so the same seed gives the same site.
+
+SKILL_MIX = {"Senior": 0.25, "Intermediate": 0.45, "Junior": 0.30}
+ACUITY_MIX = {"High": 0.2, "Moderate": 0.5, "Low": 0.3}
+WARD_BEDS = 30
+WARD_RATIO = 6
+
+
+def synthetic_nurses(count, rng=None, prefix="Nurse"):
+    rng = rng or random.Random(0)
+    weights = [SKILL_MIX[s] for s in SKILL_LEVELS]
+    skills = rng.choices(SKILL_LEVELS, weights, k=count)
+    return [{"name": f"{prefix} {i + 1:05d}", "skill": skill} for i, skill in enumerate(skills)]
+
+
+def synthetic_acuity(beds, rng=None):
+    rng = rng or random.Random(0)
+    codes = rng.choices(ACUITY_CATEGORIES, [ACUITY_MIX[a] for a in ACUITY_CATEGORIES], k=beds)
+    return {acuity: codes.count(acuity) for acuity in ACUITY_CATEGORIES}
+
+
+def synthetic_ward(name, beds=WARD_BEDS, ratio=WARD_RATIO, rng=None, staffing=1.0):
+    # plan_ward keyword arguments for one ward; staffing scales the nurse
+    # count relative to what the ratio needs (below 1.0 gives unsafe wards)
+    rng = rng or random.Random(0)
+    nurses = max(1, round(-(-beds // ratio) * staffing))
+    return {
+        "ward": name,
+        "nurses": synthetic_nurses(nurses, rng, prefix=f"{name} Nurse"),
+        "total_patients": beds,
+        "ratio": ratio,
+        "acuity_counts": synthetic_acuity(beds, rng),
+        "tasks": rng.sample(TASKS, rng.randint(1, len(TASKS))),
+    }
+
+
+def synthetic_site(total_beds, ward_beds=WARD_BEDS, ratio=WARD_RATIO, seed=0):
+    # Wards of ward_beds each (the last one takes the remainder) adding up
+    # to total_beds
+    rng = random.Random(seed)
+    wards = []
+    remaining = total_beds
+    while remaining > 0:
+        beds = min(ward_beds, remaining)
+        wards.append(synthetic_ward(f"W{len(wards) + 1:03d}", beds, ratio, rng))
+        remaining -= beds
+    return wards
+
+
+def write_synthetic_roster(path, count, seed=0):
+    with open(path, 'w', newline='') as f:
+        for nurse in synthetic_nurses(count, random.Random(seed)):
+            f.write(f"{nurse['name']},{nurse['skill']}\n")
+    return path
@@ -0,0 +1,122 @@
+import heapq
+
+from .constants import (ACUITY_CATEGORIES, CARE_MINUTES_PER_LOAD, DEFAULT_TASK_MINUTES,
+                        SHIFT_MINUTES, SKILL_FACTORS, SKILL_LEVELS, TASK_ELIGIBILITY,
+                        TASK_MINUTES)
+
+# Task allocation, run once patients are placed. Every selected task becomes
+# one or more instances with a duration and the skill levels allowed to do
+# it, and the instances are packed onto the time nurses have left after
+# patient care, longest first (LPT): each goes to the eligible nurse with the
+# most time left. One heap per skill level makes that pick O(log N), so a few
+# hundred instances per ward cost well under a millisecond.
+#
+# A task is a name (one instance, minutes and skills from the defaults in
+# constants) or a dict overriding any of them:
+#   {"name": "Wound dressings", "count": 4, "minutes": 15}
+#   {"name": "Obs round", "minutes": 5, "per": "patient"}    # one per patient
+#   {"name": "Neuro obs", "minutes": 10, "per": "High"}      # one per High patient
+#   {"name": "Bloods", "skills": ["Senior", "Intermediate"]}
+
+
+def task_name(task):
+    return task if isinstance(task, str) else task.get('name', '')
+
+
+def expand_tasks(tasks, acuity_counts=None):
+    # (name, minutes, skill levels) for every instance, in the order given
+    acuity_counts = acuity_counts or {}
+    instances = []
+    for task in tasks:
+        if isinstance(task, str):
+            task = {"name": task}
+        if not isinstance(task, dict) or not isinstance(task.get('name', ''), str):
+            raise ValueError(f"A task must be a name or an object with a name, not {task!r}")
+        name = task.get('name', '').strip()
+        if not name:
+            raise ValueError("Every task needs a name")
+
+        minutes = float(task.get('minutes', TASK_MINUTES.get(name, DEFAULT_TASK_MINUTES)))
+        if minutes < 0:
+            raise ValueError(f"{name}: minutes cannot be negative")
+        skills = tuple(task.get('skills') or TASK_ELIGIBILITY.get(name) or SKILL_LEVELS)
+        unknown = [s for s in skills if s not in SKILL_LEVELS]
+        if unknown:
+            raise ValueError(f"{name}: unknown skill level {unknown[0]}")
+
+        per = task.get('per')
+        if per is None:
+            count = int(task.get('count', 1))
+        elif per == "patient":
+            count = sum(int(acuity_counts.get(a) or 0) for a in ACUITY_CATEGORIES)
+        elif per in ACUITY_CATEGORIES:
+            count = int(acuity_counts.get(per) or 0)
+        else:
+            raise ValueError(f"{name}: 'per' must be 'patient' or an acuity, not {per!r}")
+        if count < 0:
+            raise ValueError(f"{name}: count cannot be negative")
+        instances.extend([(name, minutes, skills)] * count)
+    return instances
+
+
+def spare_minutes(skills, loads, skill_factors=None, shift_minutes=SHIFT_MINUTES,
+                  care_minutes=CARE_MINUTES_PER_LOAD):
+    # Shift time left after patient care for each nurse; skill factors scale
+    # care time the way they scale load in the allocator
+    skill_factors = {**SKILL_FACTORS, **(skill_factors or {})}
+    return [shift_minutes - load * care_minutes / skill_factors[skill]
+            for skill, load in zip(skills, loads)]
+
+
+def pack_tasks(skills, loads, tasks, acuity_counts=None, skill_factors=None,
+               shift_minutes=SHIFT_MINUTES, care_minutes=CARE_MINUTES_PER_LOAD):
+    # skills and loads are per nurse, in seniority order. Returns
+    # ({nurse index: [task names]}, task minutes per nurse, spare minutes per
+    # nurse after tasks; negative is time over the shift, warnings). A task
+    # nobody on duty may do goes to whoever has the most time, as with
+    # acuity, and is named in a warning.
+    spare = spare_minutes(skills, loads, skill_factors, shift_minutes, care_minutes)
+    minutes = [0.0] * len(skills)
+    assigned = {}
+    warnings = []
+    if not skills:
+        return assigned, minutes, spare, warnings
+
+    # Max-heaps on spare time per skill level (negated), seniority on ties
+    heaps = {skill: [] for skill in SKILL_LEVELS}
+    for order, skill in enumerate(skills):
+        heaps[skill].append((-spare[order], order))
+    for heap in heaps.values():
+        heapq.heapify(heap)
+    on_duty = [skill for skill in SKILL_LEVELS if heaps[skill]]
+
+    # Longest first; among equal lengths the more restricted task first, so
+    # it still finds an eligible nurse with time
+    instances = expand_tasks(tasks, acuity_counts)
+    instances.sort(key=lambda t: (-t[1], len(t[2])))
+    uncovered = {}
+    for name, length, allowed in instances:
+        eligible = [skill for skill in allowed if heaps[skill]]
+        if not eligible:
+            uncovered[name] = (allowed, uncovered.get(name, (None, 0))[1] + 1)
+            eligible = on_duty
+        skill = min(eligible, key=lambda s: heaps[s][0])
+        order = heaps[skill][0][1]
+        assigned.setdefault(order, []).append(name)
+        minutes[order] += length
+        spare[order] -= length
+        heapq.heapreplace(heaps[skill], (-spare[order], order))
+    for name, (allowed, count) in uncovered.items():
+        what = name if count == 1 else f"{name} ×{count}"
+        warnings.append(f"No {' or '.join(allowed)} nurse on duty for {what}; "
+                        f"given to whoever had the most time")
+    return assigned, minutes, spare, warnings
+
+
+def task_summary(names):
+    # ["IV meds", "IV meds", "Bed baths"] -> "IV meds ×2, Bed baths"
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    return ", ".join(name if count == 1 else f"{name} ×{count}"
+                     for name, count in counts.items())
@@ -0,0 +1,141 @@
+import json
+import os
+from datetime import date
+
+from .roster import load_roster
+
+# A ward input file is a JSON object such as:
+#
+#   {"ward": "A1", "total_patients": 28, "ratio": 6,
+#    "nurses": [{"name": "Ann", "skill": "Senior"}, ...],
+#    "acuity": {"High": 5, "Moderate": 14, "Low": 9},
+#    "tasks": ["Wound dressings", "IV meds"], "notes": "..."}
+#
+# "acuity", "tasks" and "notes" are optional. "ward" defaults to the file name.
+# A task is a name or an object giving its minutes, how many ("count", or
+# "per": "patient" / an acuity) and who may do it, e.g.
+#   {"name": "Obs round", "minutes": 5, "per": "patient"},
+#   {"name": "IV meds", "count": 6, "skills": ["Senior", "Intermediate"]}
+# (see tasks.py).
+# Instead of "nurses", "roster" can name a roster file (see roster.py)
+# relative to the ward file.
+# "mode" picks the allocator ("balanced", "optimal" or "contiguous").
+# "beds" lists the occupied beds by id with their acuity, in place of the
+# "acuity" counts, and "layout" the ward's bays in walking order:
+#   "beds": {"1": "High", "2": "Low", "5": "Moderate", ...},
+#   "layout": {"Bay A": [1, 2, 3, 4, 5, 6], "Bay B": [7, 8, 9, 10, 11, 12]}
+# "contiguous" gives each nurse one unbroken run of beds along that walk,
+# and any plan with a layout reports how scattered each nurse's beds are
+# (see geography.py).
+# Workload weights can be overridden with
+#   "weights": {"acuity": {"High": 4}, "skill": {"Junior": 0.5}}
+#
+# A file can plan several shifts of the same ward with a "shifts" list; each
+# entry names its "shift" and overrides any of the keys above, e.g.
+#   "shifts": [{"shift": "Mon-Day"}, {"shift": "Mon-Night", "ratio": 8}]
+
+
+# A rota file (for `python -m ward_planner rota`) takes the same ward, nurses
+# or roster, total_patients, acuity and tasks keys, plus
+#   "start": "2026-11-02", "days": 28,
+#   "ratios": {"Day": 5, "Evening": 6, "Night": 8},
+#   "skill_minimums": {"Night": {"Senior": 1, "Intermediate": 2}},
+#   "max_shifts_per_week": 5, "max_consecutive": 5
+# all optional except total_patients.
+
+
+def file_nurses(data, path):
+    if "nurses" in data:
+        return data["nurses"]
+    if "roster" in data:
+        return load_roster(os.path.join(os.path.dirname(path), data["roster"]))
+    raise ValueError("Ward file is missing 'nurses' or 'roster'")
+
+
+# The JSON type each structured key must have when given
+FIELD_TYPES = {"nurses": (list, "a list"), "tasks": (list, "a list"),
+               "acuity": (dict, "an object"), "beds": (dict, "an object"),
+               "layout": (dict, "an object"), "weights": (dict, "an object")}
+
+
+def check_types(data, path=""):
+    # A wrong-shaped key fails here, naming the file, rather than as an
+    # AttributeError deep in the planner
+    where = f" in {os.path.basename(path)}" if path else ""
+    for key, (kind, what) in FIELD_TYPES.items():
+        if data.get(key) is not None and not isinstance(data[key], kind):
+            raise ValueError(f"'{key}'{where} must be {what}")
+    for key in ("acuity", "skill"):
+        value = (data.get("weights") or {}).get(key)
+        if value is not None and not isinstance(value, dict):
+            raise ValueError(f"'weights.{key}'{where} must be an object")
+
+
+def ward_spec(data, path=""):
+    if not isinstance(data, dict):
+        raise ValueError("Ward file must contain a JSON object")
+    for key in ("total_patients", "ratio"):
+        if key not in data:
+            raise ValueError(f"Ward file is missing '{key}'")
+    check_types(data, path)
+
+    nurses = file_nurses(data, path)
+    weights = data.get("weights") or {}
+
+    return {
+        "ward": data.get("ward") or os.path.splitext(os.path.basename(path))[0],
+        "shift": data.get("shift", ""),
+        "nurses": nurses,
+        "total_patients": data["total_patients"],
+        "ratio": data["ratio"],
+        "acuity_counts": data.get("acuity"),
+        "tasks": data.get("tasks") or [],
+        "notes": data.get("notes", ""),
+        "acuity_weights": weights.get("acuity"),
+        "skill_factors": weights.get("skill"),
+        "mode": data.get("mode", "balanced"),
+        "layout": data.get("layout"),
+        "beds": data.get("beds"),
+    }
+
+
+def load_ward_specs(path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    shifts = data.get("shifts") if isinstance(data, dict) else None
+    if not shifts:
+        return [ward_spec(data, path)]
+    # Each shift inherits everything it doesn't override from the ward
+    base = {k: v for k, v in data.items() if k != "shifts"}
+    return [ward_spec({**base, **shift}, path) for shift in shifts]
+
+
+def load_rota_spec(path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Rota file must contain a JSON object")
+    if "total_patients" not in data:
+        raise ValueError("Rota file is missing 'total_patients'")
+
+    start = data.get("start")
+    return {
+        "ward": data.get("ward") or os.path.splitext(os.path.basename(path))[0],
+        "nurses": file_nurses(data, path),
+        "total_patients": data["total_patients"],
+        "acuity_counts": data.get("acuity"),
+        "tasks": data.get("tasks", []),
+        "start": date.fromisoformat(start) if start else None,
+        "days": data.get("days", 28),
+        "ratios": data.get("ratios"),
+        "skill_minimums": data.get("skill_minimums"),
+        "max_shifts_per_week": data.get("max_shifts_per_week", 5),
+        "max_consecutive": data.get("max_consecutive", 5),
+    }
+
+
+def iter_ward_files(directory):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            yield os.path.join(directory, name)